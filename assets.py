@@ -0,0 +1,75 @@
+# Images for the display, loaded once and kept in RAM
+#
+# Images are looked up by name, in this order:
+#  - the IMAGES of a frozen images module (setup/build-image-byte-array.py --module)
+#  - name.bin, made from name.pbm by setup/build-image-byte-array.py, already in
+#    the display's MONO_VLSB format so blitting it is a straight copy
+#  - name.pbm itself, blitted as MONO_HLSB and converted on every blit
+# Returns None when none of them is there.
+import framebuf
+
+try:
+    from images import IMAGES
+except ImportError:
+    IMAGES = {}
+
+MAGIC = b"MV"
+
+
+class Image(framebuf.FrameBuffer):
+    # width/height let SSD1306.blit send only the area the image covers
+    def __init__(self, buffer, width, height, format=framebuf.MONO_VLSB):
+        self.width = width
+        self.height = height
+        self.buffer = buffer
+        self.format = format
+        super().__init__(buffer, width, height, format)
+
+
+def read_bin(path):
+    with open(path, "rb") as f:
+        head = f.read(6)
+        if head[:2] != MAGIC:
+            raise ValueError(path + " is not an image from build-image-byte-array.py")
+        width = head[2] | head[3] << 8
+        height = head[4] | head[5] << 8
+        buffer = bytearray(width * ((height + 7) // 8))
+        f.readinto(buffer)
+    return Image(buffer, width, height)
+
+
+# Binary PBM with the header main.py has always expected: magic, comment, size
+def read_pbm(path):
+    with open(path, "rb") as f:
+        f.readline()  # number
+        f.readline()  # Creator
+        width, height = (int(v) for v in f.readline().split())
+        buffer = bytearray(f.read())
+    return Image(buffer, width, height, framebuf.MONO_HLSB)
+
+
+cache = {}
+
+
+def load(name):
+    image = cache.get(name)
+    if image is None:
+        if name in IMAGES:
+            width, height, data = IMAGES[name]
+            image = Image(bytearray(data), width, height)
+        else:
+            for read, ext in ((read_bin, ".bin"), (read_pbm, ".pbm")):
+                try:
+                    image = read(name + ext)
+                    break
+                except OSError:
+                    pass
+            else:
+                return None
+        cache[name] = image
+    return image
+
+
+# Free an image that won't be needed again, like the boot logo
+def drop(name):
+    cache.pop(name, None)
@@ -0,0 +1,202 @@
+# Where the flight on screen is now, between polls
+#
+# Each poll gives the flight's position, track and ground speed at the time in
+# its row. From that the position is carried forward in a straight line at a
+# constant speed, so distance, bearing and the time until it passes closest to
+# home can be updated every second without asking fr24 again. A new position
+# from a poll replaces the estimate, how far off the estimate was is kept in
+# drift. The per second work is all integers (metres, mm/s, tenths of a
+# second) sized to stay in MicroPython's small ints, the Pico has no FPU, and
+# locate(), measure() and write() leave their results in attributes rather
+# than tuples, so the display can update every second without allocating.
+#
+# With DUAL_CORE, update() runs on the network core while the display core
+# reads. update() only publishes a new fix, in one assignment, and every reader
+# works from the one fix it took at the start, so neither sees the other half done.
+import math
+from array import array
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from time import monotonic
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+# Feed row fields
+ROW_LAT = 1
+ROW_LON = 2
+ROW_TRACK = 3
+ROW_SPEED = 5  # knots
+ROW_TIME = 10
+
+UDEG_M = 1113  # metres per 10000 microdegrees of latitude
+KNOT_MM_S = 514  # mm/s per knot
+MAX_AGE = 300  # s, stop carrying a position forward after this long
+
+# sin() of whole degrees 0..90, times 16384
+SIN = array("h", [int(math.sin(math.radians(d)) * 16384 + 0.5) for d in range(91)])
+
+
+def isin(deg):
+    deg %= 360
+    if deg <= 90:
+        return SIN[deg]
+    if deg <= 180:
+        return SIN[180 - deg]
+    if deg <= 270:
+        return -SIN[deg - 180]
+    return -SIN[360 - deg]
+
+
+def icos(deg):
+    return isin(deg + 90)
+
+
+def isqrt(n):
+    if n < 2:
+        return n
+    x = n
+    y = (x + 1) >> 1
+    while y < x:
+        x = y
+        y = (x + n // x) >> 1
+    return x
+
+
+# Bearing in whole degrees (0 north, 90 east) of a point east, north of here
+def bearing(east, north):
+    ax = abs(east)
+    ay = abs(north)
+    if not ax and not ay:
+        return 0
+    # atan of the smaller over the bigger, 0..45 degrees in tenths:
+    # 45r + 15.6r(1 - r), within a degree
+    if ax <= ay:
+        r = (ax << 10) // ay
+    else:
+        r = (ay << 10) // ax
+    a = (450 * r + (156 * r * (1024 - r) >> 10)) >> 10
+    if ax > ay:
+        a = 900 - a
+    if north < 0:
+        a = 1800 - a
+    if east < 0:
+        a = 3600 - a
+    return (a + 5) // 10 % 360
+
+
+# Tenths of a second from a fix to ticks now, up to MAX_AGE
+def fix_age(fix, now):
+    age = ticks_diff(now, fix[6]) // 100
+    if age > MAX_AGE * 10:
+        age = MAX_AGE * 10
+    return age
+
+
+class DeadReckoner:
+    # home is (lat, lon, altitude)
+    def __init__(self, home):
+        self.home_lat = int(home[0] * 1000000)
+        self.home_lon = int(home[1] * 1000000)
+        # east-west metres shrink with latitude, times 16384
+        self.lon_scale = int(math.cos(math.radians(home[0])) * 16384 + 0.5)
+        # (flight_id, row time, east m, north m, east mm/s, north mm/s, ticks of the fix)
+        self.fix = None
+        self.drift = 0  # m between the estimate and the last new position
+        self.visible = False  # the display is showing the flight, so the line can be drawn
+        # set by locate() and measure()
+        self.east = 0
+        self.north = 0
+        self.distance = 0
+        self.heading = 0
+        self.eta = -1
+
+    def clear(self):
+        self.fix = None
+        self.visible = False
+
+    # Take the position from a poll, only a row newer than the last one changes anything
+    def update(self, flight_id, row, now=None):
+        if now is None:
+            now = ticks_ms()
+        fix = self.fix
+        at = row[ROW_TIME] or 0
+        if fix and fix[0] == flight_id and at == fix[1]:
+            return
+        north = (int(row[ROW_LAT] * 1000000) - self.home_lat) * UDEG_M // 10000
+        east = ((int(row[ROW_LON] * 1000000) - self.home_lon) * UDEG_M // 10000) * self.lon_scale >> 14
+        track = int(row[ROW_TRACK] or 0)
+        speed = (int(row[ROW_SPEED] or 0) * KNOT_MM_S) >> 6
+        v_east = speed * isin(track) >> 8
+        v_north = speed * icos(track) >> 8
+        if fix and fix[0] == flight_id:
+            # the new position is at its row time, which the old estimate can be taken to
+            fixed = fix[6] + (at - fix[1]) * 1000
+            if ticks_diff(now, fixed) < 0:
+                fixed = now
+            age = fix_age(fix, fixed)
+            e = fix[2] + fix[4] * age // 10000
+            n = fix[3] + fix[5] * age // 10000
+            self.drift = isqrt((e - east) ** 2 + (n - north) ** 2)
+        else:
+            fixed = now
+            self.drift = 0
+        self.fix = (flight_id, at, east, north, v_east, v_north, fixed)
+
+    # Work out east and north, in m from home, at ticks now, from fix or the last one
+    def locate(self, now=None, fix=None):
+        if fix is None:
+            fix = self.fix
+        if now is None:
+            now = ticks_ms()
+        age = fix_age(fix, now)
+        self.east = fix[2] + fix[4] * age // 10000
+        self.north = fix[3] + fix[5] * age // 10000
+
+    # (east, north) in m from home at ticks now
+    def position(self, now=None):
+        self.locate(now)
+        return self.east, self.north
+
+    # Work out distance in m, heading (the bearing from home) in degrees and eta,
+    # the seconds until the flight is closest to home, -1 if that's behind it
+    def measure(self, now=None):
+        fix = self.fix
+        self.locate(now, fix)
+        east = self.east
+        north = self.north
+        self.distance = isqrt((east // 10) * (east // 10) + (north // 10) * (north // 10)) * 10
+        v_east = fix[4] // 100  # dm/s
+        v_north = fix[5] // 100
+        speed2 = v_east * v_east + v_north * v_north
+        self.eta = -1
+        if speed2 >= 100:
+            # time of the closest point of a straight line: -(position . velocity) / speed^2
+            dot = -(east * v_east + north * v_north)
+            if dot > 0:
+                self.eta = dot // (speed2 // 10)
+        self.heading = bearing(east, north)
+
+    # "12.3km 245 1:05", fits one display line, written into a screentext.TextLine
+    def write(self, text, now=None):
+        self.measure(now)
+        distance = self.distance
+        text.clear()
+        text.number(distance // 1000)
+        text.add(b".")
+        text.number(distance // 100 % 10)
+        text.add(b"km ")
+        text.number(self.heading)
+        if self.eta < 0:
+            text.add(b" past")
+            return
+        text.add(b" ")
+        text.number(self.eta // 60)
+        text.add(b":")
+        text.number(self.eta % 60, 2)
@@ -0,0 +1,146 @@
+# Display lines of flights seen recently, so a flight that comes back isn't looked up again
+#
+# Entries are kept by fr24 flight ID, and optionally by a second key (main.py uses
+# the registration and route) for when the same flight shows up under a new ID.
+# The least recently used entries go first once the cache is over max_bytes, and
+# entries older than ttl seconds are dropped when they are next looked at.
+#
+# With a path, save() writes the entries to flash, and load() reads them back
+# after a reboot. To spare the flash, save() only writes when something was
+# added, and at most every save_period seconds.
+import json
+import os
+from time import time
+
+ENTRY_BYTES = 64  # rough cost of an entry besides its text
+
+
+class DetailsCache:
+    def __init__(self, max_bytes=4096, ttl=3600, path=None, save_period=1800):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.save_period = save_period
+        self.entries = {}  # flight_id: (lines, alias, expires, size)
+        self.aliases = {}  # alias: flight_id
+        self.order = []  # flight IDs, least recently used first
+        self.bytes = 0
+        self.changed = False
+        self.saved = time()
+        self.hits = 0
+        self.alias_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Lines for a flight, None when it isn't cached or has expired
+    def get(self, flight_id, alias=None):
+        key = flight_id
+        if key not in self.entries and alias:
+            key = self.aliases.get(alias)
+        entry = self.entries.get(key) if key else None
+        if entry and entry[2] < time():
+            self.remove(key)
+            entry = None
+        if not entry:
+            self.misses += 1
+            return None
+        if key == flight_id:
+            self.hits += 1
+        else:
+            self.alias_hits += 1
+        self.order.remove(key)
+        self.order.append(key)
+        return entry[0]
+
+    # Whether get() would find the flight, without counting it as a hit or a miss
+    def has(self, flight_id, alias=None):
+        key = flight_id if flight_id in self.entries else self.aliases.get(alias) if alias else None
+        entry = self.entries.get(key) if key else None
+        return bool(entry) and entry[2] >= time()
+
+    def put(self, flight_id, lines, alias=None, ttl=None):
+        if flight_id in self.entries:
+            self.remove(flight_id)
+        size = ENTRY_BYTES + len(flight_id) + sum(len(line) for line in lines)
+        if alias:
+            size += len(alias)
+            old = self.aliases.get(alias)
+            if old in self.entries:
+                self.remove(old)
+            self.aliases[alias] = flight_id
+        self.entries[flight_id] = (lines, alias, time() + (ttl or self.ttl), size)
+        self.order.append(flight_id)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.order) > 1:
+            self.remove(self.order[0])
+            self.evictions += 1
+        self.changed = True
+
+    def remove(self, flight_id):
+        lines, alias, expires, size = self.entries.pop(flight_id)
+        self.order.remove(flight_id)
+        if alias and self.aliases.get(alias) == flight_id:
+            del self.aliases[alias]
+        self.bytes -= size
+
+    def report(self):
+        return (
+            "Details cache: "
+            + str(len(self.entries))
+            + " flights, "
+            + str(self.bytes)
+            + " bytes, "
+            + str(self.hits)
+            + " hits, "
+            + str(self.alias_hits)
+            + " by registration, "
+            + str(self.misses)
+            + " misses, "
+            + str(self.evictions)
+            + " evicted"
+        )
+
+    # Write the entries to flash if any were added and the last save is save_period ago,
+    # force skips the wait. Returns True when it wrote, a failed write is tried
+    # again after another save_period.
+    def save(self, force=False):
+        if not self.path or not self.changed:
+            return False
+        now = time()
+        if not force and now - self.saved < self.save_period:
+            return False
+        # what's left of the ttl is kept rather than the time, the clock may not
+        # be set after a reboot
+        rows = []
+        for flight_id in self.order:
+            lines, alias, expires, size = self.entries[flight_id]
+            if expires > now:
+                rows.append([flight_id, alias, int(expires - now), list(lines)])
+        tmp = self.path + ".tmp"
+        self.saved = now
+        try:
+            with open(tmp, "w") as f:
+                json.dump(rows, f)
+            os.rename(tmp, self.path)
+        except OSError as e:
+            print("Can't save the details cache: " + str(e))
+            return False
+        self.changed = False
+        return True
+
+    # Read back what save() wrote, returns how many entries it restored
+    def load(self):
+        if not self.path:
+            return 0
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        n = 0
+        for flight_id, alias, left, lines in rows:
+            if left > 0:  # else it ran out as it was saved
+                self.put(flight_id, tuple(lines), alias, left)
+                n += 1
+        self.changed = False
+        return n
@@ -4,6 +4,23 @@
 secrets = {
     "ssid": "wifi network",
     "password": "wifi password",
+    # optional, a fixed address instead of DHCP: ip, netmask, gateway, DNS server
+    # "ifconfig": ["192.168.1.60", "255.255.255.0", "192.168.1.1", "192.168.1.1"],
     # area to search for flights: top latitude, bottom latitude, left longitude, right longitude (so this example is central London)
     "bounds_box": "51.6,51.4,-0.3,-0.1",
+    # optional, several areas to watch instead of bounds_box, each a "box" like it or a
+    # "polygon" of [lat, lon] corners, the highest priority one with a flight in it is
+    # shown (see zones.py for the other settings a zone can have)
+    # "zones": [
+    #     {"name": "London", "box": "51.6,51.4,-0.3,-0.1", "priority": 1},
+    #     {"name": "Heathrow", "polygon": [[51.48, -0.5], [51.48, -0.4], [51.46, -0.4], [51.46, -0.5]],
+    #      "priority": 2, "max_alt": 5000, "label": "LHR"},
+    # ],
+    # optional, where you are: "lat,lon" or "lat,lon,altitude in m", the flight closest
+    # to it is shown (defaults to the middle of bounds_box)
+    # "home": "51.5,-0.2,20",
+    # optional, where to send fr24 requests (defaults to https://data-live.flightradar24.com)
+    # "fr24_url": "http://192.168.1.10:8024",
+    # optional, a proxy/server.py on the LAN to ask instead of fr24
+    # "proxy_url": "http://192.168.1.10:8024",
 }
@@ -0,0 +1,250 @@
+# The flights of one search result in columns, to pick the one closest to home
+#
+# read() streams the feed response straight into the table with jsonstream, the
+# response is never decoded into a dict of row lists. Positions, altitudes and
+# speeds go to arrays, one entry per flight, which the ranking loop reads, the
+# few short text fields main.py shows to one fixed bytearray. All of it is
+# allocated once for `size` flights, and row(i) puts a feed row back together
+# only for the flights that need one: the one shown and the next few. Ranking uses a
+# flat earth around home (degrees of longitude shrunk by cos(latitude)), which
+# within a search box of a few tens of km is within a fraction of a percent of
+# the great-circle distance, and costs no trig per flight. The flight picked
+# gets the exact great-circle distance and elevation angle for the log.
+import math
+from array import array
+
+from jsonstream import ANY, extract
+
+# Feed row fields
+ROW_LAT = 1
+ROW_LON = 2
+ROW_TRACK = 3
+ROW_ALT = 4  # feet
+ROW_SPEED = 5  # knots
+ROW_AIRCRAFT_CODE = 8
+ROW_REGISTRATION = 9
+ROW_TIME = 10
+ROW_ORIGIN = 11
+ROW_DESTINATION = 12
+ROW_NUMBER = 13
+ROW_GROUND = 14
+ROW_CALLSIGN = 16
+ROW_AIRLINE = 18
+ROW_SIZE = 19
+
+# The text fields kept, each cut to TEXT_SIZE bytes
+TEXT_FIELDS = (ROW_AIRCRAFT_CODE, ROW_REGISTRATION, ROW_ORIGIN, ROW_DESTINATION, ROW_NUMBER, ROW_CALLSIGN, ROW_AIRLINE)
+TEXT_SIZE = 8
+# Everything read from a feed row, the lat of a row comes first and starts a flight
+FEED_PATHS = tuple(
+    (ANY, f) for f in (ROW_LAT, ROW_LON, ROW_TRACK, ROW_ALT, ROW_SPEED, ROW_TIME, ROW_GROUND) + TEXT_FIELDS
+)
+
+EARTH_RADIUS = 6371000  # m
+DEG_M = 111320  # m per degree of latitude
+FOOT = 0.3048
+
+
+# home is "lat,lon" or "lat,lon,altitude in m"
+def parse_home(home):
+    values = [float(v) for v in home.split(",")]
+    if len(values) == 2:
+        values.append(0)
+    return tuple(values[:3])
+
+
+# Middle of a BOUNDS_BOX string "top,bottom,left,right", for when home isn't set
+def box_centre(bounds):
+    top, bottom, left, right = (float(v) for v in bounds.split(","))
+    return ((top + bottom) / 2, (left + right) / 2, 0)
+
+
+# Great-circle distance in m and elevation angle in degrees of a point at alt m
+def distance_elevation(home, lat, lon, alt):
+    lat0 = math.radians(home[0])
+    lat1 = math.radians(lat)
+    a = (
+        math.sin((lat1 - lat0) / 2) ** 2
+        + math.cos(lat0) * math.cos(lat1) * math.sin(math.radians(lon - home[1]) / 2) ** 2
+    )
+    angle = 2 * math.asin(min(math.sqrt(a), 1))
+    distance = EARTH_RADIUS * angle
+    # elevation over the horizon of home, with the earth curving away under the plane
+    r0 = EARTH_RADIUS + home[2]
+    r1 = EARTH_RADIUS + alt
+    elevation = math.atan2(r1 * math.cos(angle) - r0, r1 * math.sin(angle))
+    return distance, math.degrees(elevation)
+
+
+class FlightTable:
+    def __init__(self, size=100):
+        self.size = size
+        self.count = 0
+        self.lat = array("f", [0] * size)
+        self.lon = array("f", [0] * size)
+        self.track = array("h", [0] * size)
+        self.alt = array("i", [0] * size)
+        self.speed = array("i", [0] * size)
+        self.time = array("I", [0] * size)
+        self.ground = bytearray(size)
+        self.text = bytearray(size * len(TEXT_FIELDS) * TEXT_SIZE)
+        self.text_len = bytearray(size * len(TEXT_FIELDS))
+        self.ids = [None] * size
+        self._slot = -1  # the flight read() is filling
+
+    # Fill the table from a feed response stream (anything with readinto), returns
+    # how many flights it has. Reading stops once the table is full.
+    def read(self, stream, bufsize=256):
+        last = self.count
+        self.count = 0
+        self._slot = -1
+        extract(stream, FEED_PATHS, bufsize, 16, self._field)
+        self._forget(last)
+        return self.count
+
+    # jsonstream each() for FEED_PATHS. A row counts once it's long enough to have
+    # ROW_GROUND, a shorter one is overwritten by the next.
+    def _field(self, path, value):
+        flight_id = path[0]
+        field = path[1]
+        if field == ROW_LAT:
+            if self.count == self.size:
+                return True  # full, stop reading
+            self._slot = self.count
+            self.ids[self._slot] = flight_id
+        elif self._slot < 0 or flight_id != self.ids[self._slot]:
+            return False  # a row without a lat
+        self._set(self._slot, field, value)
+        if field == ROW_GROUND:
+            self.count = self._slot + 1
+        return False
+
+    # Fill the table from a decoded feed response, returns how many flights it has
+    def load(self, feed):
+        last = self.count
+        n = 0
+        for flight_id, row in feed.items():
+            # everything but "version", "full_count" and "stats" is a flight
+            if n == self.size or not isinstance(row, list) or len(row) <= ROW_GROUND:
+                continue
+            self.ids[n] = flight_id
+            for _, field in FEED_PATHS:
+                if field < len(row):
+                    self._set(n, field, row[field])
+            n += 1
+        self.count = n
+        self._forget(last)
+        return n
+
+    # Let go of the IDs of flights no longer in the table
+    def _forget(self, last):
+        for i in range(self.count, max(last, self._slot + 1)):
+            self.ids[i] = None
+
+    def _set(self, i, field, value):
+        if field == ROW_LAT:
+            self.lat[i] = value or 0
+        elif field == ROW_LON:
+            self.lon[i] = value or 0
+        elif field == ROW_TRACK:
+            self.track[i] = int(value or 0)
+        elif field == ROW_ALT:
+            self.alt[i] = int(value or 0)
+        elif field == ROW_SPEED:
+            self.speed[i] = int(value or 0)
+        elif field == ROW_TIME:
+            self.time[i] = int(value or 0)
+        elif field == ROW_GROUND:
+            self.ground[i] = 1 if value else 0
+        else:
+            slot = i * len(TEXT_FIELDS) + TEXT_FIELDS.index(field)
+            text = self.text
+            at = slot * TEXT_SIZE
+            n = 0
+            if isinstance(value, str):
+                for c in value.encode():
+                    if n == TEXT_SIZE:
+                        break
+                    if 0x80 <= c < 0xC0:
+                        continue  # the rest of a UTF-8 character
+                    text[at + n] = c if c < 0x80 else 0x3F  # ? for anything but ASCII
+                    n += 1
+            self.text_len[slot] = n
+
+    # The feed row of flight i, with the fields kept and None for the others
+    def row(self, i):
+        row = [None] * ROW_SIZE
+        row[ROW_LAT] = self.lat[i]
+        row[ROW_LON] = self.lon[i]
+        row[ROW_TRACK] = self.track[i]
+        row[ROW_ALT] = self.alt[i]
+        row[ROW_SPEED] = self.speed[i]
+        row[ROW_TIME] = self.time[i]
+        row[ROW_GROUND] = self.ground[i]
+        slot = i * len(TEXT_FIELDS)
+        for field in TEXT_FIELDS:
+            at = slot * TEXT_SIZE
+            row[field] = str(self.text[at : at + self.text_len[slot]], "ascii")
+            slot += 1
+        return row
+
+    # Index of the flight closest to home, -1 if none qualifies. by is "distance"
+    # (along the ground) or "elevation" (highest in the sky seen from home).
+    # Flights outside min_alt..max_alt feet, or on the ground unless ground is
+    # True, are left out.
+    def nearest(self, home, by="distance", min_alt=0, max_alt=100000, ground=False):
+        best = self.ranked(home, by, min_alt, max_alt, ground, 1)
+        return best[0] if best else -1
+
+    # Indices of the n flights closest to home, closest first, same options as nearest().
+    # With masks (one per flight, see zones.py) only the flights with bit set count.
+    def ranked(self, home, by="distance", min_alt=0, max_alt=100000, ground=False, n=1, masks=None, bit=0):
+        lat0 = home[0]
+        lon0 = home[1]
+        alt0 = home[2] / FOOT
+        shrink = math.cos(math.radians(lat0))
+        scale = DEG_M / FOOT  # feet per degree
+        bend = DEG_M / (2 * EARTH_RADIUS)  # the earth curving away, per degree
+        lat = self.lat
+        lon = self.lon
+        alts = self.alt
+        best = []  # (score, i), smallest first
+        for i in range(self.count):
+            alt = alts[i]
+            if alt < min_alt or alt > max_alt or (self.ground[i] and not ground):
+                continue
+            if masks is not None and not masks[i] & bit:
+                continue
+            dy = lat[i] - lat0
+            dx = (lon[i] - lon0) * shrink
+            d2 = dx * dx + dy * dy
+            if by == "elevation":
+                # minus the tangent of the elevation angle, smaller is higher in the sky
+                d = math.sqrt(d2)
+                if d:
+                    score = d * bend - (alt - alt0) / (d * scale)
+                else:
+                    score = -1e30  # straight overhead
+            else:
+                score = d2
+            if len(best) < n or score < best[-1][0]:
+                j = len(best)
+                while j and best[j - 1][0] > score:
+                    j -= 1
+                best.insert(j, (score, i))
+                if len(best) > n:
+                    best.pop()
+        return [i for score, i in best]
+
+    # Time of the newest row, fr24's clock in seconds since the epoch, 0 if there's none
+    def newest(self):
+        newest = 0
+        times = self.time
+        for i in range(self.count):
+            if times[i] > newest:
+                newest = times[i]
+        return newest
+
+    # Exact (distance in m, elevation in degrees) of flight i
+    def position(self, i, home):
+        return distance_elevation(home, self.lat[i], self.lon[i], self.alt[i] * FOOT)
@@ -0,0 +1,205 @@
+# Log of the flights seen, in a folder of append-only segment files on flash
+#
+# Each segment holds up to a flash sector's worth of records (SECTOR_SIZE bytes)
+# and is named by its number, counting up. Records are only ever added to the
+# end of the newest segment, a full one is followed by a new file, and once
+# there are more than capacity records' worth of segments the oldest file is
+# deleted. Nothing is ever written in the middle of a file, which on littlefs
+# would copy the rest of the file to new blocks, and there's no header to
+# rewrite: where the log is up to comes from the file names and sizes.
+#
+# A record is the fr24 flight ID, callsign, aircraft type, origin and destination
+# (space padded ASCII), the closest distance seen in 10 m (uint16) and the fr24
+# time of the sighting (uint32), all little endian.
+#
+# New records wait in a RAM buffer and are appended in one write when they fill
+# the segment, when the first of them has waited flush_period seconds (checked
+# by tick()) or on flush(). While a record is still in the buffer its distance
+# can be brought down by closer(). Queries read the files a few records at a
+# time, then the buffer.
+import os
+import struct
+from time import time
+
+RECORD_SIZE = 32
+SECTOR_SIZE = 4096
+RECORD_FORMAT = "<8s8s4s3s3sHI"
+
+# Feed row fields
+ROW_AIRCRAFT_CODE = 8
+ROW_TIME = 10
+ROW_ORIGIN = 11
+ROW_DESTINATION = 12
+ROW_CALLSIGN = 16
+
+
+def field(value, width):
+    value = (value or "").encode()[:width]
+    return value + b" " * (width - len(value))
+
+
+def text(value):
+    return value.decode().rstrip()
+
+
+class FlightHistory:
+    def __init__(self, path, capacity=2048, flush_period=900):
+        self.path = path
+        self.flush_period = flush_period
+        self.per_sector = SECTOR_SIZE // RECORD_SIZE
+        self.segments = max(2, capacity // self.per_sector)  # files kept
+        self.capacity = self.segments * self.per_sector
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass  # it's there already
+        self.numbers = sorted(int(name) for name in os.listdir(path) if name.isdigit())
+        if self.numbers:
+            self.filled = os.stat(self._segment(self.numbers[-1]))[6] // RECORD_SIZE
+        else:
+            self.numbers = [0]
+            self.filled = 0  # records in the newest segment
+        if self.filled >= self.per_sector:
+            self._next_segment()
+        self.used = (len(self.numbers) - 1) * self.per_sector + self.filled
+        self._pending = bytearray(SECTOR_SIZE)
+        self._count = 0  # records in _pending
+        self._since = 0  # time the first record in _pending was added
+        self._buf = bytearray(RECORD_SIZE * 16)
+
+    def _segment(self, number):
+        return self.path + "/" + str(number)
+
+    # Log a newly seen flight from its search result row, distance in m. A flight
+    # that's back while its record is still buffered isn't logged twice.
+    def add(self, flight_id, row, distance=0):
+        if self.closer(flight_id, distance, self._count):
+            return
+        if self.filled + self._count >= self.per_sector:
+            return  # the last flush failed and the buffer is full, tick() tries again
+        struct.pack_into(
+            RECORD_FORMAT,
+            self._pending,
+            self._count * RECORD_SIZE,
+            field(flight_id, 8),
+            field(row[ROW_CALLSIGN], 8),
+            field(row[ROW_AIRCRAFT_CODE], 4),
+            field(row[ROW_ORIGIN], 3),
+            field(row[ROW_DESTINATION], 3),
+            min(int(distance) // 10, 0xFFFF),
+            row[ROW_TIME] or 0,
+        )
+        if not self._count:
+            self._since = time()
+        self._count += 1
+        if self.filled + self._count >= self.per_sector:
+            self.flush()
+
+    # The flight may have come closer than when it was logged, distance in m.
+    # Looks through the last `look` buffered records, False if it isn't there.
+    def closer(self, flight_id, distance, look=1):
+        key = field(flight_id, 8)
+        for i in range(self._count - 1, max(self._count - look, 0) - 1, -1):
+            at = i * RECORD_SIZE
+            if self._pending[at : at + 8] == key:
+                distance = min(int(distance) // 10, 0xFFFF)
+                if distance < struct.unpack_from("<H", self._pending, at + 26)[0]:
+                    struct.pack_into("<H", self._pending, at + 26, distance)
+                return True
+        return False
+
+    # Call now and then, writes the buffered records once they've waited flush_period
+    def tick(self):
+        if self._count and time() - self._since >= self.flush_period:
+            self.flush()
+
+    # Append the buffered records to the newest segment, False when flash
+    # can't be written (they stay buffered for the next try)
+    def flush(self):
+        if not self._count:
+            return True
+        try:
+            with open(self._segment(self.numbers[-1]), "ab") as f:
+                f.write(memoryview(self._pending)[: self._count * RECORD_SIZE])
+        except OSError as e:
+            print("Flight history not saved: " + str(e))
+            return False
+        self.filled += self._count
+        self._count = 0
+        if self.filled >= self.per_sector:
+            self._next_segment()
+        self.used = (len(self.numbers) - 1) * self.per_sector + self.filled
+        return True
+
+    # Start a new segment, deleting the oldest when there are too many. The new
+    # file is made by its first flush.
+    def _next_segment(self):
+        self.numbers.append(self.numbers[-1] + 1)
+        self.filled = 0
+        while len(self.numbers) > self.segments:
+            try:
+                os.remove(self._segment(self.numbers[0]))
+            except OSError:
+                pass  # gone already
+            self.numbers.pop(0)
+
+    def close(self):
+        self.flush()
+
+    # Every logged record, oldest first, as
+    # (flight_id, callsign, type, origin, destination, distance in m, time)
+    def records(self):
+        buf = self._buf
+        per_buf = len(buf) // RECORD_SIZE
+        for number in self.numbers:
+            try:
+                f = open(self._segment(number), "rb")
+            except OSError:
+                continue  # the newest isn't made until its first flush
+            with f:
+                while True:
+                    n = f.readinto(buf) // RECORD_SIZE
+                    for i in range(n):
+                        yield self._record(buf, i)
+                    if n < per_buf:
+                        break
+        for i in range(self._count):
+            yield self._record(self._pending, i)
+
+    def _record(self, buf, i):
+        fid, callsign, kind, origin, destination, distance, at = struct.unpack_from(RECORD_FORMAT, buf, i * RECORD_SIZE)
+        return text(fid), text(callsign), text(kind), text(origin), text(destination), distance * 10, at
+
+    # Flights seen in each hour of the day (UTC), 24 counts, since the time given
+    def per_hour(self, since=0):
+        hours = [0] * 24
+        for record in self.records():
+            at = record[6]
+            if at >= since:
+                hours[at // 3600 % 24] += 1
+        return hours
+
+    # The n most common aircraft types, as (type, flights)
+    def top_types(self, n=5, since=0):
+        return self._top(lambda r: r[2], n, since)
+
+    # The n most common routes, as ("COK-BLR", flights)
+    def top_routes(self, n=5, since=0):
+        return self._top(lambda r: r[3] + "-" + r[4], n, since)
+
+    def _top(self, key, n, since):
+        counts = {}
+        for record in self.records():
+            if record[6] >= since:
+                k = key(record)
+                counts[k] = counts.get(k, 0) + 1
+        return sorted(counts.items(), key=lambda kv: -kv[1])[:n]
+
+
+# A history, or None when its folder can't be made
+def open_history(path, capacity=2048, flush_period=900):
+    try:
+        return FlightHistory(path, capacity, flush_period)
+    except OSError as e:
+        print("No flight history: " + str(e))
+        return None
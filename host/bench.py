@@ -0,0 +1,208 @@
+# Benchmarks for the board code, run on the host against the data/ fixtures
+#
+#   parse     json.loads of a whole details response vs jsonstream.extract
+#   display   SPI traffic and frame rate of the scroll loop on the fake bus, and
+#             the time to draw a frame of text vs blitting its pre-rendered strip
+#   images    loading and blitting the plane animation, PBM vs compiled .bin
+#   latency   from the stand-in first serving a new flight to main drawing it
+#
+# Times are host times, only the ratios carry over to the board. Allocation is
+# measured with tracemalloc, i.e. CPython's heap, again only as a comparison.
+# That the display path allocates nothing is a test, host/test_render.py.
+#
+#   python host/bench.py [--out bench_output.txt] [parse display images latency]
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+from standin import DATA, EMPTY_FEED, StandIn, fixture_details, make_feed  # noqa: E402
+
+lines = []
+
+
+def report(text=""):
+    print(text)
+    lines.append(text)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def peak_alloc(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_parse(main, repeat=20):
+    import jsonstream
+
+    report("parse: details response -> displayed fields")
+    report("  %-26s %8s %12s %12s %18s" % ("fixture", "bytes", "json.loads", "extract", "peak extract/full"))
+    for name in sorted(os.listdir(DATA)):
+        with open(os.path.join(DATA, name), "rb") as f:
+            raw = f.read()
+        if b'"identification"' not in raw:
+            continue
+
+        def full():
+            return main.parse_details_json(json.loads(raw))
+
+        def streamed():
+            return main.parse_details_json(jsonstream.extract(io.BytesIO(raw), main.DETAILS_PATHS))
+
+        with redirect_stdout(io.StringIO()):
+            assert full() == streamed()
+            t_full = timed(full, repeat)
+            t_stream = timed(streamed, repeat)
+            p_full = peak_alloc(full)
+            p_stream = peak_alloc(streamed)
+        report(
+            "  %-26s %8d %9.2f ms %9.2f ms %6d/%d B"
+            % (name, len(raw), t_full * 1000, t_stream * 1000, p_stream, p_full)
+        )
+
+
+def bench_display(main, frames=200):
+    from marquee import Strip
+
+    oled = main.oled
+    spi = main.spi
+    line = "Bengaluru Kempegowda International - Cochin International"
+    report("display: SSD1306 on the fake SPI bus")
+
+    oled.fill(0)
+    oled.show()
+    spi.reset_counts()
+    oled.fill(1)
+    oled.show()
+    report("  full frame       %4d bytes in %d transactions" % (spi.bytes, spi.transactions))
+
+    def run(draw):
+        oled.fill(0)
+        oled.show()
+        spi.reset_counts()
+        start = time.perf_counter()
+        for i in range(frames):
+            oled.fill_rect(0, 16, 128, 16, 0)
+            draw(i)
+            oled.show()
+        took = time.perf_counter() - start
+        return spi.bytes / frames, spi.transactions / frames, frames / took
+
+    # the drawing alone, without sending the frame, across the whole scroll
+    def drawn(draw):
+        count = 160 + len(line) * 8
+        start = time.perf_counter()
+        for i in range(count):
+            oled.fill_rect(0, 16, 128, 16, 0)
+            draw(i)
+        return (time.perf_counter() - start) / count
+
+    strip = Strip(len(line))
+    strip.set(line)
+    draw_times = []
+    for name, draw in (
+        ("text per frame", lambda i: oled.text(line, 128 - i, 16)),
+        ("strip blit", lambda i: oled.blit(strip, 128 - i, 16)),
+    ):
+        per_frame, transactions, fps = run(draw)
+        draw_times.append(drawn(draw))
+        report(
+            "  %-16s %4d bytes in %d transactions per frame, %6.0f fps, drawing %6.1f us"
+            % (name, per_frame, transactions, fps, draw_times[-1] * 1e6)
+        )
+    report("  strip drawing speedup %.1fx" % (draw_times[0] / draw_times[1]))
+
+
+def bench_images(main, frames=50):
+    import assets
+
+    oled = main.oled
+    report("images: plane animation frame, 128x64")
+    for name, read in (("plane-icon.pbm", assets.read_pbm), ("plane-icon.bin", assets.read_bin)):
+        t_load = timed(lambda: read(name), 20)
+        image = read(name)
+        start = time.perf_counter()
+        for i in range(frames):
+            oled.blit(image, 128 - i, 0)
+        t_blit = (time.perf_counter() - start) / frames
+        report("  %-16s load %6.2f ms, blit %6.2f ms" % (name, t_load * 1000, t_blit * 1000))
+
+
+def bench_latency(main, polls=3):
+    details = fixture_details()
+    flight_id = next(iter(details))
+    feeds = [EMPTY_FEED] * polls + [make_feed([flight_id], details)]
+    standin = StandIn(feeds, details).start()
+    main.fr24.close()
+    main.fr24.host, main.fr24.port = "127.0.0.1", standin.server.server_port
+    main.fr24.tls = False
+    main.fr24.addr = None
+
+    drawn = []
+    draw_details = main.draw_details
+
+    def watch(oled, long_line=-1):
+        if main.view.flight_id == flight_id and not drawn:
+            drawn.append(time.monotonic())
+        draw_details(oled, long_line)
+
+    main.draw_details = watch
+    with redirect_stdout(io.StringIO()):
+        harness.run_main(main, polls + 3, period=1)
+    main.draw_details = draw_details
+    standin.stop()
+
+    report("latency: new flight served -> drawn on the display (1 s polls)")
+    served = standin.first_served(flight_id)
+    if served is None or not drawn:
+        report("  flight never drawn")
+        return
+    report(
+        "  %.0f ms, %d requests over %d connection(s)"
+        % ((drawn[0] - served) * 1000, len(standin.log), standin.connections)
+    )
+
+
+BENCHES = {
+    "parse": bench_parse,
+    "display": bench_display,
+    "images": bench_images,
+    "latency": bench_latency,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benches", nargs="*", default=list(BENCHES), help=", ".join(BENCHES))
+    parser.add_argument("--out", help="also write the results to this file")
+    args = parser.parse_args()
+
+    root = os.getcwd()
+    harness.install({"fr24_url": "http://127.0.0.1:9"})
+    with redirect_stdout(io.StringIO()):
+        board = harness.load_main(PAUSE_BETWEEN_LINE_SCROLLING=0, ADAPTIVE_POLLING=False)
+    for name in args.benches:
+        BENCHES[name](board)
+        report()
+
+    if args.out:
+        with open(os.path.join(root, args.out), "w") as f:
+            f.write("\n".join(lines))
+
+
+main()
@@ -0,0 +1,181 @@
+# Host stand-in for the MicroPython framebuf module, in pure Python
+#
+# Supports the monochrome formats this project uses (MONO_VLSB for the display
+# and strips, MONO_HLSB/MONO_HMSB for the images). Pixels end up exactly where
+# the real module puts them, except that text() draws made-up 8x8 glyphs rather
+# than the real font: same size and spacing, different shapes. The methods take
+# the arguments of MicroPython v1.19.1, the firmware in setup/, so code that
+# needs a later version fails here too (blit() has no palette, rect() no fill).
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+MVLSB = MONO_VLSB
+
+_MONO = (MONO_VLSB, MONO_HLSB, MONO_HMSB)
+
+
+def _glyph(ch):
+    # 8 column bytes, bit 0 at the top, blank last column like the real font
+    code = ord(ch)
+    if code == 32 or code < 32 or code > 126:
+        return (0,) * 8
+    seed = (code * 2654435761) & 0xFFFFFFFF
+    cols = []
+    for i in range(7):
+        seed = (seed * 1103515245 + 12345) & 0xFFFFFFFF
+        cols.append((seed >> 16) & 0x7F)
+    return tuple(cols) + (0,)
+
+
+_FONT = {chr(c): _glyph(chr(c)) for c in range(32, 127)}
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in _MONO:
+            raise ValueError("only monochrome formats are supported on the host")
+        self._fb_buf = buffer
+        self._fb_w = width
+        self._fb_h = height
+        self._fb_format = format
+        self._fb_stride = stride or width
+
+    def _index(self, x, y):
+        if self._fb_format == MONO_VLSB:
+            return (y >> 3) * self._fb_stride + x, 1 << (y & 7)
+        row = (self._fb_stride + 7) >> 3
+        if self._fb_format == MONO_HLSB:
+            return y * row + (x >> 3), 0x80 >> (x & 7)
+        return y * row + (x >> 3), 1 << (x & 7)
+
+    def _get(self, x, y):
+        i, bit = self._index(x, y)
+        return 1 if self._fb_buf[i] & bit else 0
+
+    def _set(self, x, y, c):
+        i, bit = self._index(x, y)
+        if c:
+            self._fb_buf[i] |= bit
+        else:
+            self._fb_buf[i] &= ~bit & 0xFF
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._fb_w and 0 <= y < self._fb_h):
+            return None
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self._fb_w, self._fb_h, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self._fb_w)
+        y1 = min(y + h, self._fb_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        buf = self._fb_buf
+        if self._fb_format == MONO_VLSB:
+            stride = self._fb_stride
+            for page in range(y0 >> 3, ((y1 - 1) >> 3) + 1):
+                top = max(y0 - page * 8, 0)
+                bottom = min(y1 - page * 8, 8)
+                mask = ((1 << bottom) - 1) & ~((1 << top) - 1)
+                base = page * stride
+                for i in range(base + x0, base + x1):
+                    if c:
+                        buf[i] |= mask
+                    else:
+                        buf[i] &= ~mask & 0xFF
+            return
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                self._set(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c):
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            if x >= self._fb_w:
+                break
+            if x > -8:
+                for col, bits in enumerate(_FONT.get(ch, _FONT[" "])):
+                    if bits and 0 <= x + col < self._fb_w:
+                        for row in range(8):
+                            if bits >> row & 1:
+                                self.pixel(x + col, y + row, c)
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1):
+        sw = fbuf._fb_w
+        sh = fbuf._fb_h
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + sw, self._fb_w)
+        y1 = min(y + sh, self._fb_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if (
+            key == -1
+            and self._fb_format == MONO_VLSB
+            and fbuf._fb_format == MONO_VLSB
+            and y0 == y
+            and not y & 7
+            and not (y1 - y0) & 7
+        ):
+            # page aligned, whole bytes can be copied
+            for page in range((y1 - y0) >> 3):
+                dst = ((y >> 3) + page) * self._fb_stride
+                src = page * fbuf._fb_stride - x
+                self._fb_buf[dst + x0 : dst + x1] = fbuf._fb_buf[src + x0 : src + x1]
+            return
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                c = fbuf._get(xx - x, yy - y)
+                if c != key:
+                    self._set(xx, yy, c)
+
+    def scroll(self, xstep, ystep):
+        w = self._fb_w
+        h = self._fb_h
+        old = [[self._get(xx, yy) for xx in range(w)] for yy in range(h)]
+        for yy in range(h):
+            for xx in range(w):
+                sx = xx - xstep
+                sy = yy - ystep
+                if 0 <= sx < w and 0 <= sy < h:
+                    self._set(xx, yy, old[sy][sx])
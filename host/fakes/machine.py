@@ -0,0 +1,103 @@
+# Host stand-in for the MicroPython machine module
+#
+# SPI and I2C record what is sent through them, so benchmarks and tests can count
+# bus transactions and bytes per frame. They also count the buffers they were
+# handed for the first time: a driver that builds a new buffer for each write
+# shows up there, one that reuses its buffers doesn't.
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, id=0, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = value or 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        self.mode = mode
+        if value is not None:
+            self._value = value
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+
+class Bus:
+    def __init__(self):
+        self.seen = {}  # id -> buffer, kept so the id can't be reused
+        self.reset_counts()
+
+    def reset_counts(self):
+        self.inits = 0
+        self.transactions = 0
+        self.bytes = 0
+        self.new_buffers = 0
+
+    def record(self, buf):
+        self.transactions += 1
+        self.bytes += len(buf)
+        if id(buf) not in self.seen:
+            self.seen[id(buf)] = buf
+            self.new_buffers += 1
+
+
+class SPI(Bus):
+    def __init__(self, id=0, baudrate=1000000, **kwargs):
+        super().__init__()
+        self.id = id
+        self.baudrate = baudrate
+
+    def init(self, baudrate=None, **kwargs):
+        self.inits += 1
+        if baudrate:
+            self.baudrate = baudrate
+
+    def write(self, buf):
+        self.record(buf)
+
+    def deinit(self):
+        pass
+
+
+class I2C(Bus):
+    def __init__(self, id=0, **kwargs):
+        super().__init__()
+        self.id = id
+
+    def writeto(self, addr, buf):
+        self.record(buf)
+
+    def writevto(self, addr, bufs):
+        self.transactions += 1
+        for buf in bufs:
+            self.bytes += len(buf)
+            if id(buf) not in self.seen:
+                self.seen[id(buf)] = buf
+                self.new_buffers += 1
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def unique_id():
+    return b"\x00host\x00\x00\x00"
@@ -0,0 +1,75 @@
+# Host stand-in for the MicroPython network module
+#
+# WLAN connects straight away unless given a script: a list of statuses that
+# status() steps through after connect(), e.g. [STAT_CONNECTING, STAT_GOT_IP].
+# drop() makes it lose the link, scan() lists the access points in WLAN.aps.
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+
+class WLAN:
+    script = None
+    # (ssid, bssid, channel, rssi, security, hidden)
+    aps = [(b"host", b"\x02host\x01", 6, -60, 3, False), (b"host", b"\x02host\x02", 11, -75, 3, False)]
+
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._status = STAT_IDLE
+        self._script = None
+        self.connect_calls = []
+        self.settings = {"channel": 6, "bssid": b"\x02host\x01", "ssid": ""}
+        self._ifconfig = ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def active(self, active=None):
+        if active is None:
+            return self._active
+        self._active = active
+        if not active:
+            self._status = STAT_IDLE
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        self.connect_calls.append((ssid, key, bssid))
+        self.settings["ssid"] = ssid
+        self._script = list(WLAN.script) if WLAN.script else [STAT_GOT_IP]
+        self._status = STAT_CONNECTING
+
+    def drop(self):
+        self._status = STAT_CONNECT_FAIL
+        self._script = None
+
+    def scan(self):
+        return list(WLAN.aps)
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+        self._script = None
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -60
+        if self._script:
+            self._status = self._script.pop(0)
+        if self._status == STAT_GOT_IP and self._ifconfig[0] == "0.0.0.0":
+            self._ifconfig = ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+        return self._status
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        self._ifconfig = tuple(config)
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self.settings.get(args[0])
+        self.settings.update(kwargs)
@@ -0,0 +1,41 @@
+# Host stand-in for MicroPython's urequests, on top of urllib
+import json as _json
+import urllib.request
+
+
+class Response:
+    def __init__(self, raw):
+        self.raw = raw
+        self.status_code = raw.status
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self.raw.read()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode()
+
+    def json(self):
+        return _json.loads(self.content)
+
+    def close(self):
+        self.raw.close()
+
+
+def request(method, url, data=None, json=None, headers={}):
+    if json is not None:
+        data = _json.dumps(json).encode()
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    return Response(urllib.request.urlopen(req))
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
@@ -0,0 +1,27 @@
+# Host stand-in for MicroPython's utime, the ticks_* and sleep_* extras over CPython's time
+from time import *  # noqa: F401,F403
+import time as _time
+
+
+def ticks_ms():
+    return _time.perf_counter_ns() // 1000000
+
+
+def ticks_us():
+    return _time.perf_counter_ns() // 1000
+
+
+def ticks_diff(a, b):
+    return a - b
+
+
+def ticks_add(a, b):
+    return a + b
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
@@ -0,0 +1,89 @@
+# Run the board code on the host
+#
+# install() puts the fake MicroPython modules in host/fakes first on the path,
+# adds MicroPython's extras to the time module, writes a code_secrets module
+# and moves into a scratch folder laid out like the board's flash. load_main()
+# then imports main.py without starting its loop, with the display on a fake
+# SPI bus, so its functions and tasks can be driven from a script.
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HOST)
+FAKES = os.path.join(HOST, "fakes")
+
+SECRETS = {
+    "ssid": "host",
+    "password": "host",
+    "bounds_box": "13.3,12.6,77.3,78.0",
+}
+
+
+def install(secrets=None, board=None):
+    for path in (ROOT, FAKES):
+        if path in sys.path:
+            sys.path.remove(path)
+    sys.path[:0] = [FAKES, ROOT]
+
+    import utime
+
+    for name in ("ticks_ms", "ticks_us", "ticks_diff", "ticks_add", "sleep_ms", "sleep_us"):
+        setattr(time, name, getattr(utime, name))
+
+    module = types.ModuleType("code_secrets")
+    module.secrets = dict(SECRETS, **(secrets or {}))
+    sys.modules["code_secrets"] = module
+
+    # the board keeps everything in one folder, images and tables included
+    if board is None:
+        board = tempfile.mkdtemp(prefix="board-")
+        assets = os.path.join(ROOT, "assets")
+        for name in os.listdir(assets):
+            shutil.copy(os.path.join(assets, name), board)
+    os.chdir(board)
+    return board
+
+
+# Import main.py as a module (its boot sequence only runs as __main__),
+# overrides replace its settings, e.g. PAUSE_BETWEEN_LINE_SCROLLING=0. The
+# _INSTRUMENT switch is a const the board compiles away, so instrument=True
+# switches it on in the source before it's run.
+def load_main(instrument=False, **overrides):
+    sys.modules.pop("main", None)
+    if instrument:
+        path = os.path.join(ROOT, "main.py")
+        with open(path) as f:
+            source = f.read()
+        assert "_INSTRUMENT = const(0)" in source
+        source = source.replace("_INSTRUMENT = const(0)", "_INSTRUMENT = const(1)", 1)
+        main = types.ModuleType("main")
+        main.__file__ = path
+        sys.modules["main"] = main
+        exec(compile(source, path, "exec"), main.__dict__)
+    else:
+        import main
+
+    for name, value in overrides.items():
+        setattr(main, name, value)
+    main.wifi.wait(1000)  # connected like after boot
+    return main
+
+
+# Run main's tasks for a number of seconds
+def run_main(main, seconds, period=None):
+    import tasks
+
+    if period is None:
+        period = main.scheduler.next_delay if main.ADAPTIVE_POLLING else main.QUERY_DELAY
+
+    async def go():
+        try:
+            await tasks.asyncio.wait_for(main.main_loop(period), seconds)
+        except tasks.asyncio.TimeoutError:
+            pass
+
+    tasks.asyncio.run(go())
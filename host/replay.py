@@ -0,0 +1,79 @@
+# Replay a sequence of fr24 responses through main.py on the host
+#
+# Serves feed responses from a local stand-in (by default: an empty sky, then
+# the flights saved in data/ one after the other) and runs main's tasks against
+# it with the display on a fake SPI bus, printing main's log as it goes.
+#
+#   python host/replay.py --seconds 30
+#   python host/replay.py --feed feed1.json --feed feed2.json --dual
+#   python host/replay.py --instrument
+#   python host/replay.py --proxy --dual    # through proxy/server.py, long polling
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+sys.path.insert(0, os.path.join(harness.ROOT, "proxy"))
+from standin import EMPTY_FEED, StandIn, fixture_details, make_feed, read_json  # noqa: E402
+
+
+def default_feeds(details):
+    feeds = [EMPTY_FEED]
+    for flight_id in details:
+        feeds += [make_feed([flight_id], details)] * 3
+    return feeds + [EMPTY_FEED]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--feed", action="append", help="feed response to serve, in order (repeatable)")
+    parser.add_argument("--query-delay", type=float, default=2)
+    parser.add_argument("--pause", type=float, default=0.5, help="PAUSE_BETWEEN_LINE_SCROLLING")
+    parser.add_argument("--adaptive", action="store_true", help="use the adaptive poll schedule")
+    parser.add_argument("--dual", action="store_true", help="run the network side on a second thread")
+    parser.add_argument("--chunked", action="store_true", help="send chunked responses")
+    parser.add_argument("--proxy", action="store_true", help="go through a proxy/server.py in front of the stand-in")
+    parser.add_argument("--instrument", action="store_true", help="time each stage, see instrument.py")
+    args = parser.parse_args()
+
+    details = fixture_details()
+    feeds = [read_json(path) for path in args.feed] if args.feed else default_feeds(details)
+    standin = StandIn(feeds, details, args.chunked).start()
+    if args.proxy:
+        from server import Proxy
+
+        proxy = Proxy(standin.url, interval=args.query_delay).start()
+        harness.install({"fr24_url": "http://127.0.0.1:9", "proxy_url": proxy.url})
+    else:
+        harness.install({"fr24_url": standin.url})
+    main = harness.load_main(
+        instrument=args.instrument,
+        QUERY_DELAY=args.query_delay,
+        PAUSE_BETWEEN_LINE_SCROLLING=args.pause,
+        ADAPTIVE_POLLING=args.adaptive,
+        DUAL_CORE=args.dual,
+    )
+    if args.adaptive:
+        # built when main was imported, with its own QUERY_DELAY
+        main.scheduler = main.PollScheduler(main.BOUNDS_BOX, main.HOME, args.query_delay, 1, args.query_delay * 8)
+    main.spi.reset_counts()
+    period = main.proxy_delay if args.proxy and args.dual else None
+    harness.run_main(main, args.seconds, period)
+    if args.proxy:
+        proxy.stop()
+    standin.stop()
+
+    print("---")
+    print("requests served: " + str(len(standin.log)) + " over " + str(standin.connections) + " connection(s)")
+    if args.proxy:
+        print("proxy: " + str(proxy.device_requests) + " display requests, " + str(proxy.bytes_served) + " bytes served")
+    print("SPI: " + str(main.spi.transactions) + " transactions, " + str(main.spi.bytes) + " bytes")
+    if args.instrument:
+        import instrument
+
+        print("stages min/avg/max: " + instrument.line())
+
+
+main()
@@ -0,0 +1,178 @@
+# Replay a day of traffic against the fixed and the adaptive poll schedules and
+# compare how many requests each makes with how many flights it never saw, and
+# for how long the display showed another flight than the nearest (or one that
+# had left, or none while there was one). Every poll goes through a FlightTable
+# of --limit rows the way main.py's does, the display shows the nearest of them.
+#
+# Traffic is either made up (flights crossing the box at random, busier in the
+# day than at night) or replayed from a recording: a JSON lines file of
+# {"t": epoch seconds, "feed": <feed.js response>} taken every few seconds.
+#
+#   python host/simulate_polling.py
+#   python host/simulate_polling.py --replay feeds.jsonl
+import argparse
+import bisect
+import json
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from flighttable import FlightTable, box_centre  # noqa: E402
+from pollschedule import KNOT_DEG_S, PollScheduler, parse_bounds  # noqa: E402
+
+# How often the display is checked against the traffic between polls, in seconds
+CHECK_PERIOD = 5
+
+# Flights an hour for each hour of the day
+HOURLY_TRAFFIC = (2, 1, 1, 1, 2, 6, 14, 22, 26, 24, 20, 18, 18, 18, 20, 22, 24, 26, 24, 20, 16, 10, 6, 3)
+
+
+class MadeUpTraffic:
+    def __init__(self, box, hours, seed):
+        rng = random.Random(seed)
+        self.box = box
+        self.flights = []
+        top, bottom, left, right = box
+        t = 0.0
+        end = hours * 3600
+        while t < end:
+            rate = HOURLY_TRAFFIC[int(t // 3600) % 24] / 3600
+            t += rng.expovariate(rate)
+            # enter on one edge, head for a point on another
+            a = self.edge_point(rng)
+            b = self.edge_point(rng)
+            track = math.degrees(math.atan2((b[1] - a[1]) * math.cos(math.radians(a[0])), b[0] - a[0])) % 360
+            speed = rng.uniform(140, 480)
+            self.flights.append(("%08x" % len(self.flights), t, a[0], a[1], track, speed))
+        self.ids = [f[0] for f in self.flights]
+
+    def edge_point(self, rng):
+        top, bottom, left, right = self.box
+        side = rng.randrange(4)
+        if side == 0:
+            return top, rng.uniform(left, right)
+        if side == 1:
+            return bottom, rng.uniform(left, right)
+        if side == 2:
+            return rng.uniform(bottom, top), left
+        return rng.uniform(bottom, top), right
+
+    def feed(self, t):
+        top, bottom, left, right = self.box
+        response = {"full_count": 10000, "version": 4}
+        for flight_id, t0, lat0, lon0, track, speed in self.flights:
+            if t0 > t:
+                break
+            dt = t - t0
+            rad = math.radians(track)
+            lat = lat0 + speed * KNOT_DEG_S * math.cos(rad) * dt
+            lon = lon0 + speed * KNOT_DEG_S * math.sin(rad) * dt / math.cos(math.radians(lat0))
+            if bottom - 1e-9 <= lat <= top + 1e-9 and left - 1e-9 <= lon <= right + 1e-9:
+                response[flight_id] = ["", lat, lon, round(track), 12000, round(speed), "", "", "A20N", "", int(t),
+                                       "COK", "BLR", "6E1", 0, 0, "IGO1", 0, "IGO"]
+        return response
+
+
+class RecordedTraffic:
+    def __init__(self, path):
+        self.times = []
+        self.feeds = []
+        ids = set()
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.times.append(record["t"])
+                    self.feeds.append(record["feed"])
+                    ids.update(k for k in record["feed"] if k not in ("version", "full_count", "stats"))
+        self.ids = sorted(ids)
+        self.start = self.times[0]
+        self.end = self.times[-1]
+
+    def feed(self, t):
+        i = bisect.bisect_right(self.times, self.start + t) - 1
+        return self.feeds[max(i, 0)]
+
+
+# ID of the flight nearest home in a feed response, None in an empty box
+def nearest(table, response, home):
+    table.load(response)
+    i = table.nearest(home)
+    return table.ids[i] if i >= 0 else None
+
+
+# (requests, flights never seen, seconds the display was wrong) for a schedule:
+# next_delay(table, ranked) gets the table of each poll and the flights in it
+# nearest first
+def simulate(traffic, duration, next_delay, limit, home):
+    table = FlightTable(limit)
+    truth = FlightTable(1000)
+    seen = set()
+    requests = 0
+    wrong = 0
+    t = 0.0
+    while t < duration:
+        table.load(traffic.feed(t))
+        requests += 1
+        seen.update(table.ids[: table.count])
+        ranked = table.ranked(home, n=table.count)
+        shown = table.ids[ranked[0]] if ranked else None
+        delay = next_delay(table, ranked)
+        check = t
+        while check < min(t + delay, duration):
+            if nearest(truth, traffic.feed(check), home) != shown:
+                wrong += min(CHECK_PERIOD, t + delay - check)
+            check += CHECK_PERIOD
+        t += delay
+    return requests, len(set(traffic.ids) - seen), wrong
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bounds", default="13.3,12.6,77.3,78.0")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replay", help="JSON lines file of recorded feeds")
+    parser.add_argument("--limit", type=int, default=50, help="FLIGHT_LIMIT, flights per feed request")
+    parser.add_argument("--delay", type=int, default=25, help="QUERY_DELAY")
+    parser.add_argument("--fixed", type=int, nargs="*", default=[40, 60], help="other fixed delays to compare")
+    parser.add_argument("--min-delay", type=int, default=5)
+    parser.add_argument("--max-delay", type=int, default=120, help="MAX_QUERY_DELAY")
+    args = parser.parse_args()
+
+    if args.replay:
+        traffic = RecordedTraffic(args.replay)
+        duration = traffic.end - traffic.start
+    else:
+        traffic = MadeUpTraffic(parse_bounds(args.bounds), args.hours, args.seed)
+        duration = args.hours * 3600
+    print(str(len(traffic.ids)) + " flights over " + str(round(duration / 3600, 1)) + " hours")
+
+    home = box_centre(args.bounds)
+    results = []
+    for delay in [args.delay] + args.fixed:
+        fixed = lambda table, ranked, delay=delay: delay  # noqa: E731
+        results.append(("fixed " + str(delay) + "s", simulate(traffic, duration, fixed, args.limit, home)))
+
+    for max_delay in sorted({args.delay, args.max_delay // 2, args.max_delay}):
+        scheduler = PollScheduler(args.bounds, home, args.delay, args.min_delay, max_delay)
+
+        def adaptive(table, ranked):
+            return scheduler.update(table, ranked, table.newest())  # like main.poll()
+
+        name = "adaptive, max " + str(scheduler.max_delay) + "s"
+        if scheduler.max_delay != max_delay:
+            name += " (" + str(max_delay) + ")"
+        results.append((name, simulate(traffic, duration, adaptive, args.limit, home)))
+
+    print("%-24s %8s %14s %16s" % ("", "requests", "missed", "display wrong"))
+    for name, (requests, missed, wrong) in results:
+        print(
+            "%-24s %8d %5d (%4.1f%%) %7d s (%4.1f%%)"
+            % (name, requests, missed, 100 * missed / max(len(traffic.ids), 1), wrong, 100 * wrong / duration)
+        )
+
+
+main()
@@ -0,0 +1,144 @@
+# Local stand-in for the fr24 endpoints main.py uses
+#
+# feed.js requests are answered with the given feed responses in turn (the last
+# one keeps being served), clickhandler requests with the details response of
+# the flight asked for. Everything served is logged with the time it was sent.
+# status answers the feed with another HTTP status instead, like 429 or 503,
+# and with drop set each connection is closed after one response without a
+# word, the way a server drops an idle keep-alive connection.
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+EMPTY_FEED = {"full_count": 11947, "version": 4}
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+# The flight details saved in data/, keyed by flight ID
+def fixture_details():
+    details = {}
+    for name in sorted(os.listdir(DATA)):
+        doc = read_json(os.path.join(DATA, name))
+        if "identification" in doc:
+            details[doc["identification"]["id"]] = doc
+    return details
+
+
+def fixture_feed():
+    return read_json(os.path.join(DATA, "flight-overhead.json"))
+
+
+# A feed response showing the given flight IDs, using the row from
+# data/flight-overhead.json with the route and type of each flight's details
+def make_feed(flight_ids, details=None):
+    template = next(v for k, v in fixture_feed().items() if k not in EMPTY_FEED)
+    feed = dict(EMPTY_FEED)
+    for flight_id in flight_ids:
+        row = list(template)
+        doc = (details or {}).get(flight_id)
+        if doc:
+            row[8] = doc["aircraft"]["model"]["code"]
+            row[9] = doc["aircraft"].get("registration") or ""
+            row[11] = doc["airport"]["origin"]["code"]["iata"]
+            row[12] = doc["airport"]["destination"]["code"]["iata"]
+            row[13] = doc["identification"]["number"]["default"] or ""
+            row[16] = doc["identification"]["callsign"]
+            row[18] = (doc["airline"]["code"] or {}).get("icao") or row[16][:3]
+        feed[flight_id] = row
+    return feed
+
+
+class StandIn:
+    def __init__(self, feeds=None, details=None, chunked=False):
+        self.feeds = [f if isinstance(f, bytes) else json.dumps(f).encode() for f in (feeds or [EMPTY_FEED])]
+        self.details = {k: v if isinstance(v, bytes) else json.dumps(v).encode() for k, v in (details or {}).items()}
+        self.chunked = chunked
+        self.status = 200
+        self.drop = False
+        self.feed_index = 0
+        self.log = []  # (time, path, body)
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def next_feed(self):
+        with self.lock:
+            body = self.feeds[min(self.feed_index, len(self.feeds) - 1)]
+            self.feed_index += 1
+        return body
+
+    # Time the first feed listing flight_id was sent, None if it hasn't been
+    def first_served(self, flight_id):
+        key = ('"' + flight_id + '"').encode()
+        for t, path, body in self.log:
+            if "feed.js" in path and key in body:
+                return t
+        return None
+
+    def feed_requests(self):
+        return sum(1 for _, path, _ in self.log if "feed.js" in path)
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                standin.connections += 1
+                super().setup()
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status = 200
+                if "feed.js" in self.path:
+                    body = standin.next_feed()
+                    status = standin.status
+                elif "clickhandler" in self.path:
+                    flight_id = self.path.rsplit("flight=", 1)[-1]
+                    body = standin.details.get(flight_id)
+                    if body is None:
+                        self.send_error(404)
+                        return
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if standin.chunked:
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for i in range(0, len(body), 1024):
+                        chunk = body[i : i + 1024]
+                        self.wfile.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                with standin.lock:
+                    standin.log.append((time.monotonic(), self.path, body))
+                if standin.drop:
+                    self.close_connection = True
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:" + str(self.server.server_port)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,162 @@
+# deadreckon.py's integer maths against the math module
+#
+# The board works in integers: a sine table, Newton's square root, a rational
+# atan for the bearing and metres from microdegrees. Each is checked against
+# the float version within the error the live position line can carry:
+#
+#   sine/cosine   1/16384, the table's rounding
+#   isqrt         exact
+#   bearing       1 degree
+#   position      0.15% of the distance flown, for the rounded mm/s per knot,
+#                 plus 0.05% of the distance from home, for the rounded metres
+#                 per degree, plus 2 m
+#   distance      the same plus 25 m, it's worked out in whole decametres
+#   ETA           1% plus 2 s, it's whole seconds rounded down, plus the time
+#                 to fly 0.2% of the distance from home: the velocity in dm/s
+#                 is about that far off, and the closest point moves with it
+#
+#   python -m pytest host/test_deadreckon.py
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+from deadreckon import MAX_AGE, DeadReckoner, bearing, icos, isin, isqrt  # noqa: E402
+from screentext import TextLine  # noqa: E402
+
+HOME = (12.95, 77.66, 0)
+M_DEG = 111320  # metres per degree of latitude
+KNOT_M_S = 1852 / 3600
+T0 = 1000000  # ticks of the first fix
+
+
+def row(lat, lon, track, speed, at=1687066373):
+    return ["", lat, lon, track, 30000, speed, "", "", "A20N", "", at]
+
+
+# Metres east and north of home, flat earth
+def metres(lat, lon):
+    return (lon - HOME[1]) * M_DEG * math.cos(math.radians(HOME[0])), (lat - HOME[0]) * M_DEG
+
+
+def test_sine_table():
+    for deg in range(-720, 721):
+        assert isin(deg) / 16384 == pytest.approx(math.sin(math.radians(deg)), abs=1 / 16384)
+        assert icos(deg) / 16384 == pytest.approx(math.cos(math.radians(deg)), abs=1 / 16384)
+
+
+def test_isqrt():
+    rng = random.Random(1)
+    numbers = list(range(1000)) + [rng.randrange(1 << 40) for _ in range(2000)]
+    numbers += [n * n + d for n in (1 << 15, 99991, 1 << 20) for d in (-1, 0, 1)]
+    for n in numbers:
+        assert isqrt(n) == math.isqrt(n)
+
+
+def angle_error(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def test_bearing():
+    rng = random.Random(2)
+    points = [(rng.randint(-100000, 100000), rng.randint(-100000, 100000)) for _ in range(5000)]
+    points += [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-5, 5), (100000, 1), (1, -100000)]
+    for east, north in points:
+        assert angle_error(bearing(east, north), math.degrees(math.atan2(east, north)) % 360) <= 1
+    assert bearing(0, 0) == 0
+
+
+def flights(count):
+    rng = random.Random(3)
+    for _ in range(count):
+        lat = HOME[0] + rng.uniform(-0.4, 0.4)
+        lon = HOME[1] + rng.uniform(-0.4, 0.4)
+        yield row(lat, lon, rng.randrange(360), rng.randrange(80, 520))
+
+
+# Where r is t seconds after its fix, the float way
+def moved(r, t):
+    east, north = metres(r[1], r[2])
+    speed = r[5] * KNOT_M_S
+    track = math.radians(r[3])
+    return east + speed * math.sin(track) * t, north + speed * math.cos(track) * t
+
+
+@pytest.mark.parametrize("t", [0, 1, 30, 120, MAX_AGE])
+def test_position_distance_heading_and_eta(t):
+    for r in flights(300):
+        reckoner = DeadReckoner(HOME)
+        reckoner.update("30c44fdc", r, T0)
+        reckoner.measure(T0 + t * 1000)
+        east, north = moved(r, t)
+        distance = math.hypot(east, north)
+        error = r[5] * KNOT_M_S * t * 0.0015 + distance * 0.0005 + 2
+        assert reckoner.east == pytest.approx(east, abs=error)
+        assert reckoner.north == pytest.approx(north, abs=error)
+        assert reckoner.distance == pytest.approx(distance, abs=error + 25)
+        if distance > 500:  # the bearing of a point a few metres off is anything
+            assert angle_error(reckoner.heading, math.degrees(math.atan2(east, north)) % 360) <= 1
+        # the time of the closest point, -(p . v) / |v|^2
+        speed = r[5] * KNOT_M_S
+        track = math.radians(r[3])
+        ve, vn = speed * math.sin(track), speed * math.cos(track)
+        eta = -(east * ve + north * vn) / (ve * ve + vn * vn)
+        if eta > 2:
+            assert reckoner.eta == pytest.approx(eta, rel=0.01, abs=2 + distance * 0.002 / speed)
+        elif eta < -2:
+            assert reckoner.eta == -1
+
+
+def test_position_stops_after_max_age():
+    r = row(12.95, 77.66, 90, 400)
+    reckoner = DeadReckoner(HOME)
+    reckoner.update("30c44fdc", r, T0)
+    assert reckoner.position(T0 + MAX_AGE * 1000) == reckoner.position(T0 + MAX_AGE * 5000)
+
+
+# A position t seconds along r's track and then north m further north, as a row
+def row_at(r, t, north=0):
+    east, north_of_home = moved(r, t)
+    lat = HOME[0] + (north_of_home + north) / M_DEG
+    lon = HOME[1] + east / (M_DEG * math.cos(math.radians(HOME[0])))
+    return row(lat, lon, r[3], r[5], r[10] + t)
+
+
+def test_drift_is_how_far_off_the_estimate_was():
+    r = row(12.9, 77.6, 45, 450)
+    reckoner = DeadReckoner(HOME)
+    reckoner.update("30c44fdc", r, T0)
+    assert reckoner.drift == 0
+    # 20 s later by its row time, where the estimate has it, the poll came 5 s late
+    reckoner.update("30c44fdc", row_at(r, 20), T0 + 25000)
+    assert reckoner.drift <= 10
+    # 20 s after that and 1 km north of the track
+    reckoner.update("30c44fdc", row_at(r, 40, 1000), T0 + 45000)
+    assert reckoner.drift == pytest.approx(1000, abs=10)
+    # the same row again changes nothing, another flight starts over
+    reckoner.update("30c44fdc", row_at(r, 40, 1000), T0 + 50000)
+    assert reckoner.drift == pytest.approx(1000, abs=10)
+    reckoner.update("30df3cc8", r, T0 + 50000)
+    assert reckoner.drift == 0
+
+
+def test_write():
+    reckoner = DeadReckoner(HOME)
+    # 10 km south of home heading north at 360 knots: 10.0km, bearing 180, 54 s
+    reckoner.update("30c44fdc", row(HOME[0] - 10000 / M_DEG, HOME[1], 0, 360), T0)
+    text = TextLine(16)
+    reckoner.write(text, T0)
+    assert bytes(text.buf[: text.n]) == b"10.0km 180 0:54"
+    # once it's gone by
+    reckoner.write(text, T0 + 60000)
+    assert bytes(text.buf[: text.n]).endswith(b" past")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,171 @@
+# detailscache.py's eviction, aliases, expiry and saving to flash, on a clock the
+# tests move by hand
+#
+#   python -m pytest host/test_detailscache.py
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+import detailscache  # noqa: E402
+from detailscache import ENTRY_BYTES, DetailsCache  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000]
+    monkeypatch.setattr(detailscache, "time", lambda: now[0])
+    return now
+
+
+def lines(flight_id):
+    return ("Flight " + flight_id, "BLR-COK")
+
+
+def size(flight_id, alias=None):
+    return ENTRY_BYTES + len(flight_id) + sum(len(line) for line in lines(flight_id)) + len(alias or "")
+
+
+def test_least_recently_used_goes_first(clock):
+    cache = DetailsCache(max_bytes=3 * size("flight-a"))
+    for flight_id in ("flight-a", "flight-b", "flight-c"):
+        cache.put(flight_id, lines(flight_id))
+    assert cache.bytes == 3 * size("flight-a")
+    assert cache.get("flight-a") == lines("flight-a")  # a is the most recent now
+    cache.put("flight-d", lines("flight-d"))
+    assert cache.get("flight-b") is None
+    assert [cache.has(f) for f in ("flight-a", "flight-c", "flight-d")] == [True, True, True]
+    assert cache.evictions == 1
+    assert cache.order == ["flight-c", "flight-a", "flight-d"]
+
+
+def test_one_entry_is_kept_even_over_max_bytes(clock):
+    cache = DetailsCache(max_bytes=10)
+    cache.put("flight-a", lines("flight-a"))
+    cache.put("flight-b", lines("flight-b"))
+    assert list(cache.entries) == ["flight-b"]
+    assert cache.bytes == size("flight-b")
+
+
+def test_put_again_replaces(clock):
+    cache = DetailsCache()
+    cache.put("flight-a", ("old",), "VT-ABC")
+    cache.put("flight-a", lines("flight-a"), "VT-ABC")
+    assert cache.get("flight-a") == lines("flight-a")
+    assert cache.bytes == size("flight-a", "VT-ABC")
+    assert cache.order == ["flight-a"]
+
+
+def test_alias_finds_the_flight_under_a_new_id(clock):
+    cache = DetailsCache()
+    cache.put("flight-a", lines("flight-a"), "VT-ABC BLR-COK")
+    assert cache.has("flight-z", "VT-ABC BLR-COK")
+    assert cache.get("flight-z", "VT-ABC BLR-COK") == lines("flight-a")
+    assert cache.get("flight-z") is None
+    assert (cache.hits, cache.alias_hits, cache.misses) == (0, 1, 1)
+    # the new ID with the same alias takes the old one's place
+    cache.put("flight-z", lines("flight-z"), "VT-ABC BLR-COK")
+    assert list(cache.entries) == ["flight-z"]
+    assert cache.aliases == {"VT-ABC BLR-COK": "flight-z"}
+    assert cache.bytes == size("flight-z", "VT-ABC BLR-COK")
+
+
+def test_evicting_an_entry_drops_its_alias(clock):
+    cache = DetailsCache(max_bytes=size("flight-a", "VT-ABC"))
+    cache.put("flight-a", lines("flight-a"), "VT-ABC")
+    cache.put("flight-b", lines("flight-b"))
+    assert cache.aliases == {}
+    assert cache.get("flight-c", "VT-ABC") is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = DetailsCache(ttl=600)
+    cache.put("flight-a", lines("flight-a"))
+    cache.put("flight-b", lines("flight-b"), ttl=60)
+    clock[0] += 60
+    assert cache.has("flight-b")
+    clock[0] += 1
+    assert not cache.has("flight-b")
+    assert "flight-b" in cache.entries  # has() leaves it, get() drops it
+    assert cache.get("flight-b") is None
+    assert list(cache.entries) == ["flight-a"]
+    assert cache.bytes == size("flight-a")
+    clock[0] += 540
+    assert cache.get("flight-a") is None
+    assert cache.bytes == 0 and cache.order == []
+
+
+def test_save_waits_for_a_change_and_the_period(clock, tmp_path):
+    path = str(tmp_path / "details.json")
+    cache = DetailsCache(path=path, save_period=1800)
+    assert not cache.save(force=True)  # nothing added
+    cache.put("flight-a", lines("flight-a"))
+    assert not cache.save()
+    clock[0] += 1800
+    assert cache.save()
+    assert not cache.save(force=True)  # nothing added since
+    assert os.listdir(str(tmp_path)) == ["details.json"]  # the tmp file was renamed
+
+
+def test_save_and_load_keep_what_is_left_of_the_ttl(clock, tmp_path):
+    path = str(tmp_path / "details.json")
+    cache = DetailsCache(ttl=600, path=path)
+    cache.put("flight-a", lines("flight-a"), "VT-ABC")
+    cache.put("flight-b", lines("flight-b"), ttl=100)
+    cache.put("flight-c", lines("flight-c"), ttl=10)
+    clock[0] += 10  # flight-c runs out as it's saved
+    assert cache.save(force=True)
+    with open(path) as f:
+        assert json.load(f) == [
+            ["flight-a", "VT-ABC", 590, list(lines("flight-a"))],
+            ["flight-b", None, 90, list(lines("flight-b"))],
+        ]
+    # after a reboot, with the clock anywhere
+    clock[0] = 5
+    loaded = DetailsCache(ttl=600, path=path)
+    assert loaded.load() == 2
+    assert not loaded.changed
+    assert loaded.order == ["flight-a", "flight-b"]
+    assert loaded.get("flight-x", "VT-ABC") == lines("flight-a")
+    clock[0] += 91
+    assert loaded.get("flight-b") is None
+    assert loaded.get("flight-a") == lines("flight-a")
+
+
+def test_failed_save_keeps_the_old_file(clock, tmp_path, monkeypatch):
+    path = str(tmp_path / "details.json")
+    cache = DetailsCache(path=path)
+    cache.put("flight-a", lines("flight-a"))
+    assert cache.save(force=True)
+    cache.put("flight-b", lines("flight-b"))
+
+    def rename(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(detailscache.os, "rename", rename)
+    with redirect_stdout(io.StringIO()) as out:
+        assert not cache.save(force=True)
+    assert "Can't save" in out.getvalue()
+    assert cache.changed  # tried again later
+    assert DetailsCache(path=path).load() == 1
+
+
+@pytest.mark.parametrize("content", [None, "", "[[", "{}"])
+def test_load_without_a_good_file(tmp_path, content):
+    path = str(tmp_path / "details.json")
+    if content is not None:
+        with open(path, "w") as f:
+            f.write(content)
+    assert DetailsCache(path=path).load() == 0
+    assert DetailsCache().load() == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,143 @@
+# FlightTable against json.load and a plain sort, on the data/ feed fixtures and
+# feeds made from them
+#
+# read() streams a feed with jsonstream's each(), the table it fills must hold
+# what json.load finds, and ranked() must order the flights the way sorting
+# every row by its great-circle distance or elevation angle does.
+#
+#   python -m pytest host/test_flighttable.py
+import glob
+import io
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+from flighttable import FOOT, ROW_GROUND, TEXT_FIELDS, TEXT_SIZE, FlightTable, distance_elevation  # noqa: E402
+
+HOME = (12.95, 77.66, 900)
+BOUNDS = (13.3, 12.6, 77.3, 78.0)  # top, bottom, left, right
+
+
+def feed_fixtures():
+    feeds = []
+    for path in sorted(glob.glob(os.path.join(harness.ROOT, "data", "*.json"))):
+        with open(path, "rb") as f:
+            raw = f.read()
+        if b'"full_count"' in raw:
+            feeds.append(raw)
+    return feeds
+
+
+FEEDS = feed_fixtures()
+
+
+# A feed like the fixtures with count flights spread over the box, the fixtures'
+# rows for the text fields
+def made_feed(count, seed):
+    rng = random.Random(seed)
+    rows = [row for feed in FEEDS for row in json.loads(feed).values() if isinstance(row, list)]
+    feed = {"full_count": 11947, "version": 4}
+    for n in range(count):
+        row = list(rng.choice(rows))
+        row[1] = round(rng.uniform(BOUNDS[1], BOUNDS[0]), 4)
+        row[2] = round(rng.uniform(BOUNDS[2], BOUNDS[3]), 4)
+        row[3] = rng.randrange(360)
+        row[4] = rng.choice([0, 0, rng.randrange(100, 3000), rng.randrange(3000, 41000)])
+        row[5] = rng.randrange(0, 520)
+        row[14] = 1 if not row[4] and rng.random() < 0.8 else 0
+        feed["%08x" % (0x30000000 + n)] = row
+    feed["stats"] = {"total": {"ads-b": count}}
+    return json.dumps(feed).encode()
+
+
+def flights_of(raw):
+    return {k: v for k, v in json.loads(raw).items() if isinstance(v, list) and len(v) > ROW_GROUND}
+
+
+def text(value):
+    return value.encode("ascii", "replace")[:TEXT_SIZE].decode() if isinstance(value, str) else ""
+
+
+ALL_FEEDS = FEEDS + [made_feed(n, n) for n in (0, 1, 5, 40, 200)]
+
+
+@pytest.mark.parametrize("raw", ALL_FEEDS)
+@pytest.mark.parametrize("bufsize", [16, 64, 256])
+def test_read_keeps_what_json_load_finds(raw, bufsize):
+    expected = flights_of(raw)
+    table = FlightTable(250)
+    assert table.read(io.BytesIO(raw), bufsize) == len(expected)
+    assert table.ids[: table.count] == list(expected)
+    for i, (flight_id, row) in enumerate(expected.items()):
+        got = table.row(i)
+        assert got[1] == pytest.approx(row[1], abs=1e-4)
+        assert got[2] == pytest.approx(row[2], abs=1e-4)
+        assert got[3:6] == row[3:6]
+        assert got[10] == row[10]
+        assert got[14] == (1 if row[14] else 0)
+        for field in TEXT_FIELDS:
+            assert got[field] == text(row[field])
+    # the same table from the decoded feed
+    loaded = FlightTable(250)
+    loaded.load(json.loads(raw))
+    assert [loaded.row(i) for i in range(loaded.count)] == [table.row(i) for i in range(table.count)]
+
+
+def test_read_stops_when_full_and_forgets_old_ids():
+    raw = made_feed(40, 1)
+    table = FlightTable(10)
+    assert table.read(io.BytesIO(raw)) == 10
+    assert table.ids == list(flights_of(raw))[:10]
+    assert table.read(io.BytesIO(made_feed(3, 2))) == 3
+    assert table.ids[3:] == [None] * 7
+
+
+# The plain way: every row that qualifies, sorted by its exact distance or elevation
+def reference(raw, by, min_alt, max_alt, ground):
+    scored = []
+    for i, row in enumerate(flights_of(raw).values()):
+        if row[4] < min_alt or row[4] > max_alt or (row[14] and not ground):
+            continue
+        distance, elevation = distance_elevation(HOME, row[1], row[2], row[4] * FOOT)
+        scored.append((distance if by == "distance" else -elevation, i))
+    scored.sort()
+    return scored
+
+
+@pytest.mark.parametrize("raw", ALL_FEEDS)
+@pytest.mark.parametrize(
+    "by, min_alt, max_alt, ground",
+    [
+        ("distance", 0, 100000, False),
+        ("distance", 0, 100000, True),
+        ("elevation", 0, 100000, False),
+        ("distance", 2000, 30000, False),
+    ],
+)
+def test_ranking_matches_a_sort(raw, by, min_alt, max_alt, ground):
+    table = FlightTable(250)
+    table.read(io.BytesIO(raw))
+    scored = reference(raw, by, min_alt, max_alt, ground)
+    ranked = table.ranked(HOME, by, min_alt, max_alt, ground, n=len(scored) + 1)
+    assert sorted(ranked) == sorted(i for _, i in scored)
+    # the table's flat earth may swap two flights less than 0.5% (or 0.01 degrees) apart
+    score = dict((i, s) for s, i in scored)
+    for a, b in zip(ranked, ranked[1:]):
+        if by == "distance":
+            assert score[a] <= score[b] * 1.005
+        else:
+            assert score[a] <= score[b] + 0.01
+    # and a few nearest are the first few of the full ranking
+    assert table.ranked(HOME, by, min_alt, max_alt, ground, n=3) == ranked[:3]
+    assert table.nearest(HOME, by, min_alt, max_alt, ground) == (ranked[0] if ranked else -1)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
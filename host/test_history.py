@@ -0,0 +1,171 @@
+# history.py's segment files in a temp folder: rolling over to a new segment,
+# deleting the oldest, and reading the records back across them and the buffer
+#
+#   python -m pytest host/test_history.py
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+import history  # noqa: E402
+from history import RECORD_SIZE, SECTOR_SIZE, FlightHistory, open_history  # noqa: E402
+
+PER_SECTOR = SECTOR_SIZE // RECORD_SIZE
+T0 = 1687066373
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000]
+    monkeypatch.setattr(history, "time", lambda: now[0])
+    return now
+
+
+def row(n):
+    r = [""] * 19
+    r[8] = "A20N"
+    r[10] = T0 + n * 60
+    r[11] = "BLR"
+    r[12] = "COK"
+    r[16] = "IGO%d" % n
+    return r
+
+
+def flight_id(n):
+    return "%08x" % (0x30000000 + n)
+
+
+def record(n, distance=0):
+    return flight_id(n), "IGO%d" % n, "A20N", "BLR", "COK", distance, T0 + n * 60
+
+
+def log(path, ns, capacity=3 * PER_SECTOR):
+    h = FlightHistory(path, capacity)
+    for n in ns:
+        h.add(flight_id(n), row(n), n * 10)
+    return h
+
+
+def segments(path):
+    return sorted((int(name), os.path.getsize(os.path.join(path, name))) for name in os.listdir(path))
+
+
+def test_buffered_until_a_segment_fills(tmp_path):
+    path = str(tmp_path / "history")
+    h = log(path, range(PER_SECTOR - 1))
+    assert segments(path) == []
+    assert list(h.records()) == [record(n, n * 10) for n in range(PER_SECTOR - 1)]
+    h.add(flight_id(PER_SECTOR - 1), row(PER_SECTOR - 1))
+    # a whole sector in one write, and the next segment is made by its first flush
+    assert segments(path) == [(0, SECTOR_SIZE)]
+    assert (h.numbers, h.filled, h.used) == ([0, 1], 0, PER_SECTOR)
+    h.add(flight_id(PER_SECTOR), row(PER_SECTOR))
+    assert h.close() is None
+    assert segments(path) == [(0, SECTOR_SIZE), (1, RECORD_SIZE)]
+
+
+def test_oldest_segment_deleted_past_the_capacity(tmp_path):
+    path = str(tmp_path / "history")
+    count = 4 * PER_SECTOR + 5
+    h = log(path, range(count))
+    h.flush()
+    # three segments kept, the newest part filled; the first two went
+    assert [number for number, size in segments(path)] == [2, 3, 4]
+    assert segments(path)[-1] == (4, 5 * RECORD_SIZE)
+    assert h.used == 2 * PER_SECTOR + 5
+    assert list(h.records()) == [record(n, n * 10) for n in range(2 * PER_SECTOR, count)]
+
+
+@pytest.mark.parametrize("count", [0, 5, PER_SECTOR, PER_SECTOR + 1, 3 * PER_SECTOR - 1, 3 * PER_SECTOR + 7])
+def test_read_back_after_a_reboot(tmp_path, count):
+    path = str(tmp_path / "history")
+    h = log(path, range(count))
+    h.close()
+    expected = list(h.records())
+    again = FlightHistory(path, 3 * PER_SECTOR)
+    assert again.numbers[: len(h.numbers)] == h.numbers[: len(again.numbers)]
+    assert (again.filled, again.used) == (h.filled, h.used)
+    assert list(again.records()) == expected
+    # and goes on where it was, the buffered records last, the oldest segment
+    # going if that fills one
+    for n in range(count, count + 3):
+        again.add(flight_id(n), row(n), n * 10)
+    expected += [record(n, n * 10) for n in range(count, count + 3)]
+    assert list(again.records()) == expected[len(expected) - again.used - again._count :]
+    again.close()
+    assert list(FlightHistory(path, 3 * PER_SECTOR).records()) == list(again.records())
+
+
+def test_reads_a_few_records_at_a_time_across_segments(tmp_path):
+    path = str(tmp_path / "history")
+    h = log(path, range(2 * PER_SECTOR + 20))
+    h.flush()
+    for n in range(2 * PER_SECTOR + 20, 2 * PER_SECTOR + 23):
+        h.add(flight_id(n), row(n), n * 10)
+    h._buf = bytearray(RECORD_SIZE * 3)  # 128 isn't a multiple of 3
+    assert list(h.records()) == [record(n, n * 10) for n in range(2 * PER_SECTOR + 23)]
+
+
+def test_a_flight_back_while_buffered_is_logged_once(tmp_path):
+    h = log(str(tmp_path / "history"), [1, 2])
+    h.add(flight_id(1), row(1), 5)  # closer
+    h.add(flight_id(2), row(2), 500)  # further off
+    assert list(h.records()) == [record(1, 0), record(2, 20)]
+    h.add(flight_id(1), row(1), 0)
+    assert len(list(h.records())) == 2
+
+
+def test_tick_flushes_after_the_period(tmp_path, clock):
+    path = str(tmp_path / "history")
+    h = FlightHistory(path, flush_period=900)
+    h.add(flight_id(1), row(1))
+    clock[0] += 899
+    h.tick()
+    assert segments(path) == []
+    clock[0] += 1
+    h.tick()
+    assert segments(path) == [(0, RECORD_SIZE)]
+
+
+def test_failed_flush_keeps_the_records(tmp_path, monkeypatch):
+    path = str(tmp_path / "history")
+    h = log(path, [1, 2])
+    real_open = open
+
+    def full(name, mode="r"):
+        if "a" in mode:
+            raise OSError(28, "No space left on device")
+        return real_open(name, mode)
+
+    monkeypatch.setattr(history, "open", full, raising=False)
+    with redirect_stdout(io.StringIO()) as out:
+        assert not h.flush()
+    assert "not saved" in out.getvalue()
+    monkeypatch.undo()
+    assert h.flush()
+    assert list(FlightHistory(path).records()) == [record(1, 10), record(2, 20)]
+
+
+def test_counts(tmp_path):
+    h = log(str(tmp_path / "history"), range(70))
+    assert sum(h.per_hour()) == 70
+    assert sum(h.per_hour(since=T0 + 60 * 60)) == 10
+    assert h.top_types() == [("A20N", 70)]
+    assert h.top_routes(1) == [("BLR-COK", 70)]
+
+
+def test_no_folder(tmp_path):
+    with open(str(tmp_path / "file"), "w") as f:
+        f.write("x")
+    with redirect_stdout(io.StringIO()):
+        assert open_history(str(tmp_path / "file" / "history")) is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,138 @@
+# HTTPClient against the stand-in server in host/standin.py
+#
+#   python -m pytest host/test_httpclient.py
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+import jsonstream  # noqa: E402
+from httpclient import HTTPClient, HTTPError  # noqa: E402
+from standin import StandIn, fixture_details, make_feed  # noqa: E402
+
+FEED = "/zones/fcgi/feed.js?bounds=13.3,12.6,77.3,78.0"
+DETAILS = fixture_details()
+FLIGHT_ID = sorted(DETAILS)[0]
+
+
+@pytest.fixture(params=[False, True], ids=["content-length", "chunked"])
+def standin(request):
+    standin = StandIn([make_feed([FLIGHT_ID], DETAILS)], DETAILS, chunked=request.param).start()
+    yield standin
+    standin.stop()
+
+
+def details_path(flight_id=FLIGHT_ID):
+    return "/clickhandler/?version=1.5&notrail=true&flight=" + flight_id
+
+
+def test_body_and_json(standin):
+    client = HTTPClient(standin.url)
+    reply = client.get(details_path())
+    assert reply.status == 200
+    assert reply.read() == standin.details[FLIGHT_ID]
+    reply.close()
+    assert client.get(FEED).json() == json.loads(standin.feeds[0])
+
+
+def test_keeps_the_connection_alive(standin):
+    client = HTTPClient(standin.url)
+    for _ in range(5):
+        reply = client.get(FEED)
+        reply.read()
+        reply.close()
+    assert client.connects == 1
+    assert standin.connections == 1
+
+
+def test_readinto_in_small_pieces(standin):
+    client = HTTPClient(standin.url)
+    reply = client.get(details_path())
+    body = bytearray()
+    buf = bytearray(7)
+    while True:
+        n = reply.readinto(buf)
+        if not n:
+            break
+        body += buf[:n]
+    assert bytes(body) == standin.details[FLIGHT_ID]
+
+
+def test_body_left_unread_is_skipped(standin):
+    client = HTTPClient(standin.url)
+    paths = (("identification", "id"),)
+    for _ in range(3):
+        # extract stops reading once it has the ID, close() skips the rest
+        reply = client.get(details_path())
+        assert jsonstream.extract(reply, paths) == {"identification": {"id": FLIGHT_ID}}
+        reply.close()
+    # a new request closes an unread response by itself
+    client.get(details_path())
+    assert client.get(FEED).json() == json.loads(standin.feeds[0])
+    assert client.connects == 1
+
+
+def test_server_dropping_the_connection(standin):
+    standin.drop = True
+    client = HTTPClient(standin.url)
+    for _ in range(3):
+        reply = client.get(FEED)
+        assert reply.json() == json.loads(standin.feeds[0])
+        reply.close()
+    assert client.connects == 3
+    assert standin.feed_index == 3
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_error_status_raises(standin, status):
+    client = HTTPClient(standin.url)
+    standin.status = status
+    with pytest.raises(HTTPError) as error:
+        client.get(FEED)
+    assert error.value.status == status
+    assert isinstance(error.value, OSError)
+    # the error body was skipped, the connection is still good
+    standin.status = 200
+    assert client.get(FEED).json() == json.loads(standin.feeds[0])
+    assert client.connects == 1
+
+
+def test_not_found(standin):
+    client = HTTPClient(standin.url)
+    with pytest.raises(HTTPError) as error:
+        client.get(details_path("nosuchid"))
+    assert error.value.status == 404
+    assert client.get(FEED).status == 200
+
+
+def test_connection_refused():
+    standin = StandIn().start()
+    url = standin.url
+    standin.stop()
+    client = HTTPClient(url)
+    with pytest.raises(OSError):
+        client.get(FEED)
+    assert client.sock is None
+
+
+def test_read_until_close():
+    class Server(io.BytesIO):
+        def makefile(self, mode):
+            return self
+
+    client = HTTPClient("http://example")
+    client.sock = client.stream = Server(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\n\r\nno length here")
+    client.stream.write = lambda data: len(data)  # the request goes nowhere
+    reply = client.get("/")
+    assert reply.will_close
+    assert reply.read() == b"no length here"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,173 @@
+# jsonstream.extract() against json.load, on the data/ fixtures and a few edge cases
+#
+# Every scalar of every fixture is asked for and must come back the way json.load
+# reads it, whatever size the chunks arrive in.
+#
+#   python -m pytest host/test_jsonstream.py
+import glob
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+import jsonstream  # noqa: E402
+from jsonstream import ANY, extract  # noqa: E402
+
+FIXTURES = sorted(glob.glob(os.path.join(harness.ROOT, "data", "*.json")))
+CHUNKS = (1, 2, 3, 7, 64, 256, 4096)
+
+
+# Stream that hands out at most `chunk` bytes per readinto, like a socket
+class Chunked:
+    def __init__(self, data, chunk):
+        self.data = data
+        self.at = 0
+        self.chunk = chunk
+
+    def readinto(self, buf):
+        n = min(len(buf), self.chunk, len(self.data) - self.at)
+        buf[:n] = self.data[self.at : self.at + n]
+        self.at += n
+        return n
+
+
+# (path, value) of every scalar in a decoded document
+def leaves(node, path=()):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from leaves(value, path + (key,))
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            yield from leaves(value, path + (i,))
+    else:
+        yield path, node
+
+
+# The sparse copy extract() should return for these leaves
+def sparse(pairs):
+    result = {}
+    for path, value in pairs:
+        node = result
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return result
+
+
+def run(data, paths, chunk=4096, bufsize=256, max_str=96, each=None):
+    return extract(Chunked(data, chunk), paths, bufsize, max_str, each)
+
+
+@pytest.mark.parametrize("chunk", CHUNKS)
+@pytest.mark.parametrize("fixture", FIXTURES, ids=os.path.basename)
+def test_fixture_matches_json_load(fixture, chunk):
+    with open(fixture, "rb") as f:
+        data = f.read()
+    pairs = list(leaves(json.loads(data)))
+    paths = tuple(path for path, _ in pairs)
+    assert run(data, paths, chunk, max_str=len(data)) == sparse(pairs)
+
+
+@pytest.mark.parametrize("bufsize", (1, 5, 256))
+def test_read_buffer_sizes(bufsize):
+    with open(FIXTURES[0], "rb") as f:
+        data = f.read()
+    pairs = list(leaves(json.loads(data)))[:40]
+    paths = tuple(path for path, _ in pairs)
+    assert run(data, paths, bufsize=bufsize, max_str=len(data)) == sparse(pairs)
+
+
+@pytest.mark.parametrize("chunk", CHUNKS)
+def test_escapes(chunk):
+    doc = {
+        "quote": 'say "hi"',
+        "slashes": "a\\b/c",
+        "controls": "tab\there\nnew line\r\x08\x0c",
+        "latin": "Zürich Flughafen",
+        "cjk": "東京",
+        "mixed": "abé中A",
+    }
+    data = json.dumps(doc, ensure_ascii=True).encode()  # every non-ASCII as \uXXXX
+    paths = tuple((key,) for key in doc)
+    assert run(data, paths, chunk) == doc
+    data = json.dumps(doc, ensure_ascii=False).encode()  # raw UTF-8
+    assert run(data, paths, chunk) == doc
+
+
+def test_surrogate_pair_halves_become_question_marks():
+    assert run(b'{"a": "x\\ud83d\\ude00y"}', (("a",),)) == {"a": "x??y"}
+
+
+def test_long_strings_are_cut_on_a_character():
+    doc = {"a": "é" * 10}  # 2 bytes each
+    assert run(json.dumps(doc, ensure_ascii=False).encode(), (("a",),), max_str=7) == {"a": "é" * 3}
+
+
+def test_path_that_is_a_prefix_of_another():
+    data = json.dumps(
+        {"aircraft": {"model": {"code": "A20N", "codes": ["x"], "text": "Airbus"}}, "air": 1, "aircraft2": 2}
+    ).encode()
+    paths = (
+        ("aircraft", "model"),  # ends on an object, skipped
+        ("aircraft", "model", "code"),
+        ("air",),  # a key that's the start of another key
+        ("aircraft2",),
+    )
+    for chunk in CHUNKS:
+        assert run(data, paths, chunk) == {"aircraft": {"model": {"code": "A20N"}}, "air": 1, "aircraft2": 2}
+
+
+def test_missing_paths_and_literals():
+    data = b'{"t": true, "f": false, "n": null, "i": -12, "x": 1.5e3, "e": [], "o": {}}'
+    paths = (("t",), ("f",), ("n",), ("i",), ("x",), ("e", 0), ("o", "k"), ("gone",))
+    assert run(data, paths) == {"t": True, "f": False, "n": None, "i": -12, "x": 1500.0}
+
+
+def test_stops_reading_once_everything_is_found():
+    data = b'{"a": 1, "b": {"c": 2}, "rest": [' + b"0, " * 1000 + b"0]}"
+    stream = Chunked(data, 16)
+    assert extract(stream, (("a",), ("b", "c")), bufsize=16) == {"a": 1, "b": {"c": 2}}
+    assert stream.at < 64
+
+
+def test_any_hands_values_to_each():
+    with open(FIXTURES[0], "rb") as f:
+        data = f.read()
+    doc = json.loads(data)
+    seen = []
+    result = run(
+        data,
+        (("identification", "id"), ("trail", ANY, "lat")),
+        chunk=7,
+        each=lambda path, value: seen.append((path[1], value)) and False,
+    )
+    assert result == {"identification": {"id": doc["identification"]["id"]}}
+    assert seen == [(i, point["lat"]) for i, point in enumerate(doc["trail"])]
+
+
+def test_each_returning_true_stops_the_wildcard_only():
+    data = b'{"trail": [{"lat": 1}, {"lat": 2}, {"lat": 3}], "identification": {"id": "x"}}'
+    seen = []
+
+    def each(path, value):
+        seen.append(value)
+        return len(seen) == 2
+
+    assert run(data, (("trail", ANY, "lat"), ("identification", "id")), each=each) == {"identification": {"id": "x"}}
+    assert seen == [1, 2]
+
+
+def test_bad_json_raises():
+    parser = jsonstream.KeyPathExtractor((("a",),))
+    with pytest.raises(ValueError):
+        parser.feed(b'{"a" 1}')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
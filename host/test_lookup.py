@@ -0,0 +1,119 @@
+# lookup.py's binary search against a dict, and main.py's flights from the tables
+#
+#   python -m pytest host/test_lookup.py
+import io
+import os
+import random
+import struct
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+from lookup import LookupTable, open_table  # noqa: E402
+from standin import fixture_details, make_feed  # noqa: E402
+
+
+# A table in the format setup/build-lookup-tables.py writes
+def write_table(path, key_width, name_width, names):
+    records = sorted(
+        (code.encode().ljust(key_width), name.encode()[:name_width].ljust(name_width)) for code, name in names.items()
+    )
+    with open(path, "wb") as f:
+        f.write(b"LK" + struct.pack("<BBI", key_width, name_width, len(records)))
+        for key, name in records:
+            f.write(key + name)
+    return path
+
+
+def random_codes(rng, count, width):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    codes = set()
+    while len(codes) < count:
+        codes.add("".join(rng.choice(letters) for _ in range(rng.randint(1, width))))
+    return sorted(codes)
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 100, 1000])
+def test_binary_search_finds_what_a_dict_does(tmp_path, count):
+    rng = random.Random(count)
+    codes = random_codes(rng, count * 2, 4)
+    names = {code: "Name of " + code for code in codes[::2]}
+    table = LookupTable(write_table(str(tmp_path / "t.tbl"), 4, 16, names))
+    assert table.count == len(names)
+    # every code in the table, the first and last included, and every one between them
+    for code in codes:
+        assert table.get(code) == names.get(code)
+    for code in ("", None, "AAAAA", "0", "ZZZZ"):
+        assert table.get(code) == names.get(code)
+    table.close()
+
+
+def test_names_are_cut_to_the_width_and_unpadded(tmp_path):
+    table = LookupTable(write_table(str(tmp_path / "t.tbl"), 3, 8, {"COK": "Cochin International", "BLR": "Bengaluru"}))
+    assert table.get("COK") == "Cochin I"
+    assert table.get("BLR") == "Bengalur"
+    assert table.get("CO") is None
+    table.close()
+
+
+def test_not_a_table(tmp_path):
+    path = str(tmp_path / "plane-icon.bin")
+    with open(path, "wb") as f:
+        f.write(b"MV\x80\x00\x40\x00" + bytes(16))
+    with pytest.raises(ValueError):
+        LookupTable(path)
+    assert open_table(str(tmp_path / "missing.tbl")) is None
+
+
+@pytest.fixture
+def main(tmp_path):
+    with redirect_stdout(io.StringIO()):
+        main = harness.load_main()
+    rows = make_feed(list(fixture_details()), fixture_details())
+    main.airports = LookupTable(write_table(str(tmp_path / "a.tbl"), 3, 40, {"BLR": "Kempegowda", "COK": "Cochin"}))
+    main.airlines = LookupTable(write_table(str(tmp_path / "l.tbl"), 3, 32, {"IGO": "IndiGo"}))
+    main.aircraft = LookupTable(write_table(str(tmp_path / "c.tbl"), 4, 32, {"A20N": "Airbus A320neo"}))
+    yield main, rows
+    for table in (main.airports, main.airlines, main.aircraft):
+        table.close()
+
+
+def test_feed_row_with_every_code_in_the_tables(main):
+    main, rows = main
+    lines = main.parse_feed_row(rows["30c44fdc"])
+    assert lines
+    assert "Cochin" in " ".join(lines)
+    assert "IndiGo" in " ".join(lines)
+
+
+# a code the tables don't have means asking for the details, not showing the code
+@pytest.mark.parametrize("flight_id", ["30df3cc8", "30e0177c"])  # no A320 or IAD, no CCU
+def test_feed_row_with_a_code_missing_is_left_to_the_details(main, flight_id):
+    main, rows = main
+    assert main.parse_feed_row(rows[flight_id]) is False
+
+
+# a flight the tables know goes on the mini-map without a request for its trail,
+# MAP_TRAIL_REQUEST asks for it
+@pytest.mark.parametrize("trail_request", [False, True])
+def test_flight_from_the_tables_makes_no_request(main, trail_request):
+    main, rows = main
+    asked = []
+    main.get_flight_details = lambda *args: asked.append("details")
+    main.get_flight_trail = lambda flight_id: asked.append("trail")
+    main.MAP_TRAIL_REQUEST = trail_request
+    row = rows["30c44fdc"]
+    with redirect_stdout(io.StringIO()):
+        assert main.details("30c44fdc", row)
+    assert asked == (["trail"] if trail_request else [])
+    assert main.minimap.flight_id == "30c44fdc"
+    assert main.minimap.head == main.minimap.pixel(*main.minimap.metres(row[1], row[2]))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,135 @@
+# PollScheduler's predictions against flights moved on step by step
+#
+#   python -m pytest host/test_pollschedule.py
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+from flighttable import FlightTable  # noqa: E402
+from pollschedule import KNOT_DEG_S, PollScheduler  # noqa: E402
+
+BOUNDS = "13.3,12.6,77.3,78.0"
+HOME = (12.95, 77.65, 0)
+NOW = 1700000000
+
+
+def row(lat, lon, track, speed, age=0):
+    return ["", lat, lon, track, 30000, speed, "", "", "A20N", "", NOW - age, "BLR", "COK", "6E1", 0, 0, "IGO1", 0, "IGO"]
+
+
+def table(*rows):
+    flights = FlightTable(50)
+    flights.load({"%08x" % i: r for i, r in enumerate(rows)})
+    return flights
+
+
+def ranked(flights):
+    return flights.ranked(HOME, n=flights.count)
+
+
+# Where a row is t seconds on, flat earth around home like the scheduler
+def moved(r, t):
+    rad = math.radians(r[3])
+    lat = r[1] + r[5] * KNOT_DEG_S * math.cos(rad) * (t + NOW - r[10])
+    lon = r[2] + r[5] * KNOT_DEG_S * math.sin(rad) * (t + NOW - r[10]) / math.cos(math.radians(HOME[0]))
+    return lat, lon
+
+
+def distance2(lat, lon):
+    return (lat - HOME[0]) ** 2 + ((lon - HOME[1]) * math.cos(math.radians(HOME[0]))) ** 2
+
+
+def scheduler(base=600, max_delay=240):
+    return PollScheduler(BOUNDS, HOME, base, 1, max_delay)
+
+
+def test_poll_after_the_flight_shown_leaves():
+    r = row(12.95, 77.95, 90, 480)  # heading east, 0.05 degrees from the edge
+    schedule = scheduler()
+    delay = schedule.update(table(r), [0], NOW)
+    assert moved(r, delay - 2)[1] < 78.0 <= moved(r, delay)[1]
+    assert schedule.reason.startswith("exits in ")
+
+
+def test_row_age_counts():
+    fresh = scheduler().update(table(row(12.95, 77.95, 90, 480)), [0], NOW)
+    old = scheduler().update(table(row(12.95, 77.95, 90, 480, age=10)), [0], NOW)
+    assert fresh - old == pytest.approx(10, abs=1)
+
+
+@pytest.mark.parametrize(
+    "shown, other",
+    [
+        (row(12.96, 77.66, 0, 300), row(12.85, 77.66, 0, 450)),  # caught up from behind
+        (row(12.95, 77.66, 90, 400), row(13.05, 77.55, 180, 250)),  # one leaving, one coming in
+        (row(12.94, 77.64, 45, 200), row(13.1, 77.9, 225, 480, age=20)),  # head on, old row
+    ],
+)
+def test_closer_flight_matches_stepping(shown, other):
+    flights = table(shown, other)
+    order = ranked(flights)
+    assert order == [0, 1]
+    delay = scheduler().update(flights, order, NOW)
+    # the first second at which the other one is the nearer, stepping both along
+    t = 0
+    while distance2(*moved(other, t)) > distance2(*moved(shown, t)):
+        t += 1
+    assert delay == t or delay == t + 1
+
+
+def test_flight_leaving_before_it_gets_closer_is_ignored():
+    # a tall box: the flight shown heads north from home and stays in for 1374 s,
+    # the other one would be nearer after 774 s but leaves on the left in 21 s
+    schedule = PollScheduler("16.0,9.9,76.6,78.7", HOME, 3000, 1, 3000)
+    shown = row(12.95, 77.65, 0, 480)
+    other = row(12.95, 76.62, 270, 200)
+    flights = table(shown, other)
+    assert schedule.closer_time(flights, [0, 1], NOW, 3000) is None
+    assert schedule.update(flights, [0, 1], NOW) == 1375
+    assert schedule.reason == "exits in 1374s"
+    other[3] = 90  # the same one heading east comes closer long before it leaves
+    assert schedule.update(table(shown, other), [0, 1], NOW) < 1000
+    assert schedule.reason.startswith("closer in ")
+
+
+def test_no_closer_prediction_by_elevation():
+    flights = table(row(12.96, 77.66, 0, 300), row(12.85, 77.66, 0, 450))
+    schedule = scheduler()
+    schedule.update(flights, [0, 1], NOW, "elevation")
+    assert not schedule.reason.startswith("closer")
+
+
+def test_empty_box_backs_off_to_max():
+    schedule = scheduler(base=25, max_delay=120)
+    empty = table()
+    assert [schedule.update(empty, [], 0) for _ in range(5)] == [25, 50, 100, 120, 120]
+    # flights that aren't shown still mean the box isn't empty
+    schedule.update(table(row(12.95, 77.66, 0, 0)), [], NOW)
+    assert schedule.delay == 25
+
+
+def test_max_delay_is_cut_to_half_a_crossing():
+    schedule = PollScheduler("13.0,12.9,77.6,77.7", HOME, 25, 5, 240)
+    assert schedule.crossing_time == pytest.approx(0.1 / (480 * KNOT_DEG_S) * math.cos(math.radians(12.95)), rel=0.01)
+    assert schedule.max_delay == 25  # half of 44 s is less than the base delay
+    assert "back off to 25s" in schedule.limit()
+    assert scheduler(max_delay=120).max_delay == 600
+    assert PollScheduler(BOUNDS, HOME, 25, 5, 240).max_delay == 153
+
+
+def test_failed_request_retries_after_the_base_delay():
+    schedule = scheduler(base=25, max_delay=120)
+    for _ in range(4):
+        schedule.update(table(), [], 0)
+    assert schedule.retry() == 25
+    assert schedule.next_delay() == 25
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,168 @@
+# The display path allocates nothing once a flight is loaded
+#
+# main's render coroutines, scroll(), display_flight() and display_plane(), and
+# the pages display_flight() draws between scrolls, run
+# against a display that draws nothing, so only their own work is counted, and
+# with a sleep_ms() that doesn't wait. Allocation is measured with tracemalloc,
+# CPython's heap: the most the heap went up from the start to any show(), i.e.
+# in any frame, is compared with frames that do nothing but show().
+#
+#   python -m pytest host/test_render.py
+import io
+import os
+import sys
+import tracemalloc
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+from standin import fixture_details, make_feed  # noqa: E402
+
+harness.install({"fr24_url": "http://127.0.0.1:9"})
+import screentext  # noqa: E402
+
+
+# Stands in for the display, so the fake framebuf's own work doesn't show up.
+# Counts the strs handed to text() that aren't from screentext.CHARS, i.e. were
+# built to be drawn, and the most a frame took from the heap while tracing.
+class NullDisplay:
+    scrolling = False
+
+    def __init__(self, chars):
+        self.chars = set(id(c) for c in chars)
+        self.built = 0
+        self.frames = 0
+        self.start = 0  # the heap when tracing started
+        self.worst = 0
+
+    def fill(self, c):
+        pass
+
+    def fill_rect(self, x, y, w, h, c):
+        pass
+
+    def text(self, s, x, y, c=1):
+        if id(s) not in self.chars:
+            self.built += 1
+
+    def blit(self, fbuf, x, y, key=-1):
+        pass
+
+    def show(self):
+        if not tracemalloc.is_tracing():
+            return
+        self.worst = max(self.worst, tracemalloc.get_traced_memory()[1] - self.start)
+        self.frames += 1
+
+
+# What main's sleep_ms() gives the coroutines to await: an iterator that's done
+# already, so the await goes straight on without making anything
+class NoWait:
+    done = iter(())
+
+    def __await__(self):
+        return self.done
+
+
+NO_WAIT = NoWait()
+
+
+def sleep_ms(ms):
+    return NO_WAIT
+
+
+@pytest.fixture(scope="module")
+def main():
+    with redirect_stdout(io.StringIO()):
+        main = harness.load_main(PAUSE_BETWEEN_LINE_SCROLLING=0, PREFETCH_FLIGHTS=0)
+    main.sleep_ms = sleep_ms
+    details = fixture_details()
+    flight_id = next(iter(details))
+    with redirect_stdout(io.StringIO()):
+        lines = main.parse_details_json(details[flight_id])
+    row = make_feed([flight_id], details)[flight_id]
+    main.view.load(flight_id, lines)
+    main.marquee.reset(flight_id)
+    main.minimap.start(flight_id)
+    main.minimap.add(row[1], row[2])
+    # the live position works in metres and mm/s, small ints on the board but
+    # boxed by CPython over 256, so here the flight stands still over home
+    row = list(row)
+    row[1], row[2], row[5] = main.HOME[0], main.HOME[1], 0
+    main.reckoner.update(flight_id, row)
+    return main
+
+
+def run(coro):
+    try:
+        coro.send(None)
+    except StopIteration:
+        return
+    raise AssertionError("the coroutine waited")
+
+
+# The frames of the coroutine render() makes, traced after a first run that loads
+# what's kept between flights (images, strips)
+def traced(oled, render):
+    run(render(oled))
+    coro = render(oled)
+    tracemalloc.start()
+    oled.start = tracemalloc.get_traced_memory()[0]
+    run(coro)
+    tracemalloc.stop()
+    return oled
+
+
+# show() and nothing else, as many frames
+async def idle(oled, frames):
+    for _ in range(frames):
+        oled.show()
+
+
+# The still pages display_flight() draws, and the live position line, over and over
+async def pages(main, oled):
+    for i in range(200):
+        main.draw_details(oled, i % 4 - 1)
+        main.draw_map_page(oled)
+        main.draw_live(oled)
+
+
+RENDERS = {
+    "pages": lambda main: lambda oled: pages(main, oled),
+    "scroll": lambda main: lambda oled: main.scroll(oled, 1),
+    "display_flight": lambda main: main.display_flight,
+    "display_plane": lambda main: main.display_plane,
+}
+
+
+# Heap a new scroll() coroutine takes
+def coroutine_size(main):
+    oled = NullDisplay(())
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    coro = main.scroll(oled, 1)
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    coro.close()
+    return size
+
+
+@pytest.mark.parametrize("name", list(RENDERS))
+def test_render_allocates_nothing(main, name):
+    oled = traced(NullDisplay(screentext.CHARS), RENDERS[name](main))
+    assert oled.frames > 100
+    assert oled.built == 0, "the render path built strings"
+    base = traced(NullDisplay(()), lambda o: idle(o, oled.frames)).worst
+    # CPython boxes ints over 256 (32 B each), the ticks among them, where
+    # MicroPython keeps them in the pointer. The allowance is for two.
+    allowance = 2 * 32
+    if name == "display_flight":
+        # the coroutine of the line it scrolls, one a page, the same on the board,
+        # and its page loop's range iterator, which MicroPython doesn't make
+        allowance += coroutine_size(main) + sys.getsizeof(iter(range(5)))
+    assert oled.worst <= base + allowance, "a frame allocates %d B more than that" % (oled.worst - base - allowance)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,184 @@
+# The SSD1306 driver against the fake SPI and I2C buses in host/fakes/machine.py
+#
+# A frame must go out as one command transaction for the address window and one
+# data transaction, and once the same windows were sent before, without building
+# any new buffer.
+#
+#   python -m pytest host/test_ssd1306.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+from machine import I2C, SPI, Pin  # noqa: E402
+from marquee import Strip  # noqa: E402
+from minimap import MiniMap  # noqa: E402
+from ssd1306 import SSD1306_I2C, SSD1306_SPI  # noqa: E402
+
+
+# SPI bus that also notes D/C and CS for each write
+class Wire(SPI):
+    def __init__(self, dc, cs):
+        super().__init__(0)
+        self.dc = dc
+        self.cs = cs
+        self.writes = []
+
+    def write(self, buf):
+        super().write(buf)
+        self.writes.append((self.dc(), self.cs(), len(buf)))
+
+
+@pytest.fixture
+def oled():
+    dc = Pin(16)
+    cs = Pin(18)
+    spi = Wire(dc, cs)
+    oled = SSD1306_SPI(128, 64, spi, dc, Pin(17), cs)
+    spi.reset_counts()
+    spi.writes = []
+    return oled
+
+
+def test_full_frame_is_two_transactions(oled):
+    spi = oled.spi
+    oled.fill(1)
+    oled.show()
+    # the address window as commands (D/C low), then the whole buffer as data
+    assert spi.writes == [(0, 0, 6), (1, 0, 1024)]
+    assert oled.cs() == 1
+    assert spi.transactions == 2
+    assert spi.bytes == 6 + 1024
+
+
+def test_nothing_changed_sends_nothing(oled):
+    oled.show()
+    assert oled.spi.transactions == 0
+
+
+def test_only_the_changed_area_is_sent(oled):
+    spi = oled.spi
+    oled.text("abc", 10, 16)
+    oled.show()
+    assert spi.writes == [(0, 0, 6), (1, 0, 24)]
+    assert list(oled.window) == [0x21, 10, 33, 0x22, 2, 2]
+    # a window narrower than the display is one data write per page
+    spi.writes = []
+    oled.fill_rect(40, 4, 8, 20, 1)
+    oled.show()
+    assert spi.writes == [(0, 0, 6), (1, 0, 8), (1, 0, 8), (1, 0, 8)]
+
+
+def test_strip_blit_sends_its_area_only(oled):
+    strip = Strip(20)
+    strip.set("Cochin International")
+    oled.blit(strip, -30, 16)
+    oled.show()
+    assert oled.spi.writes == [(0, 0, 6), (1, 0, 128)]
+
+
+def test_map_blit_sends_the_map_columns_only(oled):
+    minimap = MiniMap((12.95, 77.66, 0), "13.3,12.6,77.3,78.0")
+    minimap.start("30c44fdc")
+    minimap.add(13.0, 77.7)
+    oled.show()
+    minimap.draw(oled, 128 - minimap.width, 0)
+    oled.show()
+    # the window, then each of the 8 pages 56 columns wide
+    assert oled.spi.writes == [(0, 0, 6)] + [(1, 0, 56)] * 8
+
+
+def test_frames_after_the_first_build_no_buffers(oled):
+    spi = oled.spi
+    strip = Strip(20)
+    strip.set("Cochin International")
+    frames = 0
+    for x in range(128, -160, -1):
+        oled.fill_rect(0, 16, 128, 8, 0)
+        oled.blit(strip, x, 16)
+        oled.show()
+        if x == 128:
+            spi.reset_counts()  # the first frame makes the slice it sends
+        else:
+            frames += 1
+    assert spi.transactions == 2 * frames
+    assert spi.new_buffers == 0
+    oled.fill_rect(90, 40, 10, 10, 1)
+    oled.show()
+    spi.reset_counts()
+    for _ in range(10):
+        oled.fill_rect(90, 40, 10, 10, 1)
+        oled.show()
+    assert spi.new_buffers == 0
+
+
+def test_commands_reuse_their_buffers(oled):
+    spi = oled.spi
+    oled.write_cmd(0xAF)
+    spi.reset_counts()
+    for cmd in (0xAE, 0xAF, 0xA6, 0xA7):
+        oled.write_cmd(cmd)
+    oled.poweroff()
+    oled.invert(1)
+    assert spi.transactions == 6
+    assert spi.new_buffers == 0
+
+
+def test_hardware_scroll_is_one_transaction(oled):
+    spi = oled.spi
+    oled.hw_scroll(2, 3)
+    oled.hw_scroll_stop()
+    spi.reset_counts()
+    spi.writes = []
+    oled.hw_scroll(2, 3, frames=5, left=False)
+    assert spi.writes == [(0, 0, 9)]
+    assert list(oled.scroll_cmds) == [0x2E, 0x27 - 1, 0, 2, 0, 3, 0, 0xFF, 0x2F]
+    assert spi.new_buffers == 0
+    # stopping rewrites the display RAM from the framebuffer: stop, window, data
+    oled.hw_scroll_stop()
+    assert spi.writes[1:] == [(0, 0, 1), (0, 0, 6), (1, 0, 1024)]
+
+
+def test_picture_scrolls_from_the_display_ram(oled):
+    spi = oled.spi
+    oled.text("KEEP", 0, 0)
+    oled.show()
+    before = bytes(oled.buffer)
+    spi.writes = []
+    picture = bytearray(b"\x18" * 512)
+    oled.hw_scroll_picture(picture, 4, 7, frames=2)
+    # window, the picture as it is, the scroll commands
+    assert spi.writes == [(0, 0, 6), (1, 0, 512), (0, 0, 9)]
+    assert list(oled.window) == [0x21, 0, 127, 0x22, 4, 7]
+    assert oled.scrolling
+    assert bytes(oled.buffer) == before
+    # a second picture stops the scroll before writing to the display RAM
+    spi.writes = []
+    oled.hw_scroll_picture(picture, 4, 7)
+    assert spi.writes[0] == (0, 0, 1)
+    # the next show() puts the framebuffer back
+    spi.writes = []
+    oled.show()
+    assert spi.writes == [(0, 0, 1), (0, 0, 6), (1, 0, 1024)]
+    assert not oled.scrolling
+
+
+def test_i2c_frame_is_two_transactions():
+    i2c = I2C(0)
+    oled = SSD1306_I2C(128, 32, i2c)
+    i2c.reset_counts()
+    oled.fill(1)
+    oled.show()
+    assert i2c.transactions == 2
+    assert i2c.bytes == 1 + 6 + 1 + 512
+    oled.fill(1)
+    oled.show()
+    assert i2c.new_buffers == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,192 @@
+# The main loop's tasks: the queues, the flight tracker and the renderer, and the
+# second core of run_dual() on a real thread
+#
+#   python -m pytest host/test_tasks.py
+import _thread
+import asyncio
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+import tasks  # noqa: E402
+from framebuf import MONO_VLSB, FrameBuffer  # noqa: E402
+from minimap import MiniMap  # noqa: E402
+from tasks import FlightTracker, Queue, RingBuffer, network_worker, renderer, wait_ms  # noqa: E402
+
+HOME = (12.95, 77.66, 0)
+BOUNDS = "13.3,12.6,77.3,78.0"
+
+
+def test_queue_drops_the_oldest_when_full():
+    queue = Queue(3)
+    for i in range(5):
+        queue.put(i)
+    assert [queue.get_nowait() for _ in range(3)] == [2, 3, 4]
+    assert queue.empty()
+
+
+def test_queue_get_waits_for_put():
+    async def scenario():
+        queue = Queue()
+        got = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not got.done()
+        queue.put("a")
+        return await asyncio.wait_for(got, 1)
+
+    assert asyncio.run(scenario()) == "a"
+
+
+def test_flight_tracker_loads_details_once_a_flight():
+    loaded = []
+
+    def details(flight_id, row):
+        loaded.append(flight_id)
+        return None if row == "broken" else [flight_id.upper()]
+
+    tracker = FlightTracker(details)
+    assert tracker.update(("a", 1)) == ("a", ["A"])
+    assert tracker.update(("a", 2)) == ("a", ["A"])
+    assert tracker.update(None) is None
+    assert tracker.update(("a", 3)) == ("a", ["A"])  # asked again after an empty sky
+    with redirect_stdout(io.StringIO()):
+        assert tracker.update(("b", "broken")) is False
+    assert tracker.update(("b", 4)) == ("b", ["B"])  # and again after it failed
+    assert loaded == ["a", "a", "b", "b"]
+
+
+def test_wait_ms_takes_off_the_time_spent(monkeypatch):
+    now = [10000]
+    monkeypatch.setattr(tasks, "ticks_ms", lambda: now[0])
+    assert wait_ms(25, 10000) == 25000
+    now[0] = 14000
+    assert wait_ms(25, 10000) == 21000
+    assert wait_ms(lambda: 3, 10000) == 0  # late, no waiting
+    now[0] = 10500
+    assert wait_ms(lambda: 1.5, 10000) == 1000
+
+
+def test_renderer_new_only_for_another_flight():
+    shown = []
+    flights = [("a", "A"), ("a", "A"), None, ("a", "A"), ("b", "B"), None, ("a", "A")]
+
+    async def render(flight, new):
+        shown.append((flight[0] if flight else None, new))
+        if len(shown) == len(flights):
+            raise asyncio.CancelledError
+
+    async def scenario():
+        queue = Queue(len(flights))
+        task = asyncio.create_task(renderer(queue, render))
+        for flight in flights:
+            queue.put(flight)
+            await asyncio.sleep(0)
+        try:
+            await asyncio.wait_for(task, 1)
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    # the same flight back after an empty poll doesn't fly the plane in again
+    assert shown == [("a", True), ("a", False), (None, False), ("a", False), ("b", True), (None, False), ("a", True)]
+
+
+# Run fn(*args) on its own thread, returns a list that has True in it once it's done
+def start(fn, *args):
+    done = []
+
+    def run():
+        try:
+            fn(*args)
+        except SystemExit:
+            pass
+        finally:
+            done.append(True)
+
+    _thread.start_new_thread(run, ())
+    return done
+
+
+# Everything read from ring until done, read as fast as it comes
+def drain(ring, done, timeout=10):
+    got = []
+    end = time.monotonic() + timeout
+    while not (done and ring.empty()):
+        assert time.monotonic() < end, "the other thread never finished"
+        if not ring.empty():
+            got.append(ring.get_nowait())
+    return got
+
+
+def test_ring_buffer_across_threads():
+    ring = RingBuffer(4)
+    count = 20000
+
+    def put():
+        for i in range(count):
+            ring.put(i)
+
+    got = drain(ring, start(put))
+    # the oldest are dropped when it's full, what's read is in order and ends with the last
+    assert got == sorted(set(got))
+    assert got[-1] == count - 1
+    assert ring.count == 0
+
+
+def test_network_worker_on_a_thread():
+    found = [("a", 1), ("a", 2), None, ("b", 3), ("c", 4), ("c", 5)]
+    polls = []
+    loaded = []
+
+    def poll():
+        polls.append(1)
+        return found[len(polls) - 1]
+
+    def details(flight_id, row):
+        loaded.append(flight_id)
+        return [flight_id.upper()]
+
+    def idle(ms):
+        assert ms == 0
+        if len(polls) == len(found):
+            raise SystemExit  # ends the worker's thread, like a reset would
+
+    ring = RingBuffer(len(found))
+    got = drain(ring, start(network_worker, poll, details, ring, 0, idle))
+    # details are loaded once a flight, the same flight comes again as it was
+    assert loaded == ["a", "b", "c"]
+    assert got == [("a", ["A"]), ("a", ["A"]), None, ("b", ["B"]), ("c", ["C"]), ("c", ["C"])]
+
+
+def test_map_loaded_on_another_thread_is_drawn_whole():
+    shown = MiniMap(HOME, BOUNDS)
+    loading = MiniMap(HOME, BOUNDS)
+    display = FrameBuffer(bytearray(1024), 128, 64, MONO_VLSB)
+
+    def load():
+        for n in range(300):
+            loading.start("%08x" % n)
+            loading.add(12.9 + n % 7 * 0.05, 77.4 + n % 5 * 0.1)
+            shown.take(loading)
+            shown.add(13.0, 77.7)
+
+    done = start(load)
+    draws = 0
+    while not done:
+        shown.draw(display, 128 - shown.width, 0)
+        draws += 1
+    assert draws
+    assert shown.flight_id == "0000012b"
+    assert shown.head == shown.pixel(*shown.metres(13.0, 77.7))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
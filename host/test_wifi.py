@@ -0,0 +1,158 @@
+# WiFi's state machine against the scripted fake WLAN in host/fakes/network.py
+#
+# Time is passed to step() by hand, so backoff and timeouts need no waiting.
+#
+#   python -m pytest host/test_wifi.py
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+import network  # noqa: E402
+from wifi import BACKOFF, CONNECTING, UP, WiFi  # noqa: E402
+
+FAIL = [network.STAT_CONNECTING, network.STAT_CONNECT_FAIL]
+BSSID = "02686f737401"  # the strongest of network.WLAN.aps
+
+
+def make(script=None, **options):
+    network.WLAN.script = script
+    wlan = network.WLAN(network.STA_IF)
+    return wlan, WiFi(wlan, "host", "secret", **options)
+
+
+# Step at now until the state machine leaves CONNECTING
+def settle(wifi, now):
+    for _ in range(10):
+        if wifi.step(now) != CONNECTING:
+            break
+    return wifi.state
+
+
+def test_connects_and_caches_the_access_point(tmp_path):
+    path = str(tmp_path / "wifi.json")
+    wlan, wifi = make(cache_path=path)
+    assert settle(wifi, 0) == UP
+    assert wlan.connect_calls == [("host", "secret", None)]
+    with open(path) as f:
+        assert json.load(f) == {"bssid": BSSID}
+
+
+def test_bssid_scan_waits_when_the_firmware_does_not_report_it(tmp_path):
+    path = str(tmp_path / "wifi.json")
+    wlan, wifi = make(cache_path=path, scan_after=30000)
+    del wlan.settings["bssid"]  # like config("bssid") on v1.19.1
+    scans = []
+    wlan.scan = lambda: scans.append(1) or list(network.WLAN.aps)
+    assert settle(wifi, 0) == UP
+    assert not scans  # connecting doesn't wait for a scan
+    wifi.step(29999)
+    assert not scans
+    wifi.step(30000)
+    wifi.step(60000)
+    assert scans == [1]
+    with open(path) as f:
+        assert json.load(f) == {"bssid": BSSID}
+
+
+def test_link_loss_reconnects():
+    wlan, wifi = make()
+    assert settle(wifi, 0) == UP
+    wlan.drop()
+    assert wifi.step(1000) == CONNECTING
+    assert wifi.link_losses == 1
+    assert settle(wifi, 1100) == UP
+    assert wifi.connects == 2
+    assert wifi.latency == 100
+
+
+def test_failed_request_with_the_link_up_is_not_a_reconnect():
+    wlan, wifi = make()
+    settle(wifi, 0)
+    assert wifi.failed(OSError(-2)) == "dns"
+    assert wifi.failed(OSError(110)) == "timeout"
+    assert wifi.state == UP
+    wlan.drop()
+    assert wifi.failed(OSError(113)) == "link"
+    assert wifi.state == CONNECTING
+
+
+def test_backoff_doubles_up_to_the_limit():
+    wlan, wifi = make(FAIL, min_backoff=1000, max_backoff=5000, reset_after=0)
+    now = 0
+    backoffs = []
+    for _ in range(5):
+        assert settle(wifi, now) == BACKOFF
+        backoffs.append(wifi.backoff)
+        assert wifi.step(now + wifi.backoff - 1) == BACKOFF  # not before it's due
+        now += wifi.backoff
+    assert backoffs == [1000, 2000, 4000, 5000, 5000]
+    assert wifi.failed_attempts == 5
+    network.WLAN.script = None
+    assert settle(wifi, now) == UP
+    assert wifi.failures == 0
+
+
+def test_connect_timeout():
+    wlan, wifi = make([network.STAT_CONNECTING] * 100, connect_timeout=15000)
+    assert wifi.step(0) == CONNECTING
+    assert wifi.step(15000) == CONNECTING
+    assert wifi.step(15001) == BACKOFF
+
+
+def test_radio_restarts_after_reset_after_failures():
+    wlan, wifi = make(FAIL, min_backoff=10, reset_after=3)
+    now = 0
+    for attempt in range(1, 7):
+        settle(wifi, now)
+        assert wifi.resets == attempt // 3
+        now += wifi.backoff
+    assert wlan.active()
+
+
+def test_cached_bssid_is_tried_first_only(tmp_path):
+    path = str(tmp_path / "wifi.json")
+    with open(path, "w") as f:
+        json.dump({"bssid": BSSID}, f)
+    wlan, wifi = make(FAIL, cache_path=path, min_backoff=10)
+    assert settle(wifi, 0) == BACKOFF
+    network.WLAN.script = None
+    assert settle(wifi, 10) == UP
+    # straight to the access point, then a normal connect after it failed
+    assert [call[2] for call in wlan.connect_calls] == [bytes.fromhex(BSSID), None]
+
+
+def test_cached_ifconfig_is_reused_and_dropped_on_failure(tmp_path):
+    path = str(tmp_path / "wifi.json")
+    ifconfig = ["192.168.1.77", "255.255.255.0", "192.168.1.1", "192.168.1.1"]
+    with open(path, "w") as f:
+        json.dump({"bssid": BSSID, "ifconfig": ifconfig}, f)
+    wlan, wifi = make(cache_path=path, reuse_ip=True)
+    assert settle(wifi, 0) == UP
+    assert wlan.ifconfig()[0] == "192.168.1.77"
+    assert wifi.resets == 0
+
+    # the same cache when the address doesn't work any more: the radio restarts
+    # to get back to DHCP, and the next attempt goes without the cache
+    wlan, wifi = make(FAIL, cache_path=path, reuse_ip=True, reset_after=0, min_backoff=10)
+    assert settle(wifi, 0) == BACKOFF
+    assert wifi.resets == 1
+    network.WLAN.script = None
+    assert settle(wifi, 10) == UP
+    assert wlan.connect_calls[-1][2] is None
+
+
+def test_static_ifconfig():
+    static = ("192.168.1.60", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+    wlan, wifi = make(static=static)
+    assert settle(wifi, 0) == UP
+    assert wlan.ifconfig() == static
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
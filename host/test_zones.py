@@ -0,0 +1,169 @@
+# zones.py's grid against testing every zone's polygon, on random zones, points
+# and segments
+#
+# ZoneIndex puts a point in the zones that cover its grid cell and tests it
+# against only the zones whose edge crosses the cell, which clips() decides.
+# Both must give what a plain winding number test over every zone gives, and
+# clips() what a separating axis test gives.
+#
+#   python -m pytest host/test_zones.py
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+harness.install()
+from flighttable import FlightTable  # noqa: E402
+from zones import MAX_ZONES, ZoneIndex, clips, parse_zones, union_bounds  # noqa: E402
+
+BOX = (13.3, 12.6, 77.3, 78.0)  # top, bottom, left, right
+
+
+# > 0 when c is left of the line from a to b, 0 on it
+def cross(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+# Whether p is inside the polygon, by the winding number
+def winding(polygon, p):
+    n = 0
+    a = polygon[-1]
+    for b in polygon:
+        if a[0] <= p[0] < b[0] and cross(a, b, p) > 0:
+            n += 1
+        elif b[0] <= p[0] < a[0] and cross(a, b, p) < 0:
+            n -= 1
+        a = b
+    return n != 0
+
+
+# Whether the segment touches the box: neither axis nor the segment's normal
+# separates them
+def touches(top, bottom, left, right, a, b):
+    if max(a[0], b[0]) < bottom or min(a[0], b[0]) > top:
+        return False
+    if max(a[1], b[1]) < left or min(a[1], b[1]) > right:
+        return False
+    sides = [cross(a, b, c) for c in ((top, left), (top, right), (bottom, left), (bottom, right))]
+    return not (min(sides) > 0 or max(sides) < 0)
+
+
+def point(rng, top=BOX[0], bottom=BOX[1], left=BOX[2], right=BOX[3]):
+    return rng.uniform(bottom, top), rng.uniform(left, right)
+
+
+# A zone's config: a box, or a polygon made star shaped around a point so it
+# doesn't cross itself, concave more often than not
+def zone_config(rng, i):
+    lat, lon = point(rng)
+    if rng.random() < 0.3:
+        h, w = rng.uniform(0.01, 0.3), rng.uniform(0.01, 0.3)
+        return {"name": "box %d" % i, "box": "%f,%f,%f,%f" % (lat + h, lat - h, lon - w, lon + w), "priority": i % 3}
+    corners = rng.randint(3, 12)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(corners))
+    polygon = []
+    for a in angles:
+        r = rng.uniform(0.02, 0.35)
+        polygon.append([lat + r * math.cos(a), lon + r * math.sin(a)])
+    return {"name": "polygon %d" % i, "polygon": polygon, "priority": i % 3}
+
+
+def random_zones(seed, count):
+    rng = random.Random(seed)
+    return parse_zones([zone_config(rng, i) for i in range(count)])
+
+
+def expected_mask(zones, lat, lon):
+    mask = 0
+    for zone in zones:
+        if winding(zone.polygon, (lat, lon)):
+            mask |= zone.bit
+    return mask
+
+
+def test_clips_matches_a_separating_axis_test():
+    rng = random.Random(1)
+    for _ in range(20000):
+        top, bottom = sorted(rng.uniform(0, 1) for _ in range(2))[::-1]
+        left, right = sorted(rng.uniform(0, 1) for _ in range(2))
+        a = (rng.uniform(-0.5, 1.5), rng.uniform(-0.5, 1.5))
+        kind = rng.random()
+        if kind < 0.1:
+            b = (a[0], rng.uniform(-0.5, 1.5))  # along a parallel
+        elif kind < 0.2:
+            b = (rng.uniform(-0.5, 1.5), a[1])  # along a meridian
+        elif kind < 0.25:
+            b = a
+        else:
+            b = (rng.uniform(-0.5, 1.5), rng.uniform(-0.5, 1.5))
+        assert clips(top, bottom, left, right, a[0], a[1], b[0], b[1]) == touches(top, bottom, left, right, a, b)
+        assert clips(top, bottom, left, right, b[0], b[1], a[0], a[1]) == touches(top, bottom, left, right, a, b)
+
+
+def test_clips_edges_and_corners():
+    # along a side, through two corners, ending on a side, missing it, across it, and
+    # just past the corner
+    assert clips(1, 0, 0, 1, 1, -1, 1, 2)
+    assert clips(1, 0, 0, 1, 2, -1, -1, 2)
+    assert clips(1, 0, 0, 1, 0.5, -1, 0.5, 0)
+    assert not clips(1, 0, 0, 1, 1.5, -1, 1.5, 2)
+    assert clips(1, 0, 0, 1, 2.1, -1, -1, 2.1)
+    assert not clips(1, 0, 0, 1, 2.1, 0, 0, 2.1)
+
+
+@pytest.mark.parametrize("seed, count", [(1, 1), (2, 3), (3, 8), (4, MAX_ZONES)])
+@pytest.mark.parametrize("grid", [1, 4, 16])
+def test_grid_matches_point_in_polygon(seed, count, grid):
+    zones = random_zones(seed, count)
+    index = ZoneIndex(zones, grid=grid)
+    rng = random.Random(seed * 100 + grid)
+    top, bottom, left, right = (float(v) for v in union_bounds(zones).split(","))
+    points = [point(rng, top, bottom, left, right) for _ in range(5000)]
+    # near each zone's corners, where the edges are
+    for zone in zones:
+        for lat, lon in zone.polygon:
+            points += [(lat + rng.uniform(-1e-3, 1e-3), lon + rng.uniform(-1e-3, 1e-3)) for _ in range(20)]
+    for lat, lon in points:
+        assert index.lookup(lat, lon) == expected_mask(zones, lat, lon), (lat, lon)
+    # and outside the box around them all
+    for lat, lon in ((top + 0.01, left), (bottom - 0.01, right), (top, left - 0.01), (bottom, right + 0.01)):
+        assert index.lookup(lat, lon) == 0
+
+
+def test_cells_covered_whole_are_inside():
+    zones = random_zones(5, 8)
+    index = ZoneIndex(zones)
+    rng = random.Random(5)
+    for cell in range(index.grid * index.grid):
+        if index.full[cell]:
+            row, col = divmod(cell, index.grid)
+            for _ in range(20):
+                lat = index.top - (row + rng.random()) * index.cell_lat
+                lon = index.left + (col + rng.random()) * index.cell_lon
+                assert expected_mask(zones, lat, lon) & index.full[cell] == index.full[cell]
+    assert any(index.full)
+
+
+def test_route_puts_a_table_in_its_zones():
+    zones = random_zones(6, 5)
+    index = ZoneIndex(zones, size=200)
+    rng = random.Random(6)
+    top, bottom, left, right = (float(v) for v in union_bounds(zones).split(","))
+    feed = {"full_count": 200, "version": 4}
+    for n in range(200):
+        lat, lon = point(rng, top + 0.05, bottom - 0.05, left - 0.05, right + 0.05)
+        feed["%08x" % n] = ["", lat, lon, 0, 3000, 200, "", "", "A20N", "", 1687066373, "BLR", "COK", "", 0]
+    table = FlightTable(200)
+    table.load(feed)
+    index.route(table)
+    for i in range(table.count):
+        assert index.masks[i] == expected_mask(zones, table.lat[i], table.lon[i])
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,229 @@
+# Small HTTP/1.1 client that keeps its connection open between requests
+#
+# urequests resolves the host, connects and does a TLS handshake for every
+# request, and the handshake is the slowest part of a poll on a Pico W. This
+# client resolves the host once, keeps the (TLS) connection alive between
+# requests and reconnects when the server has closed it in the meantime.
+# Bodies can be read a buffer at a time (readinto), Content-Length, chunked and
+# read-until-close bodies are all handled. A status other than 2xx raises
+# HTTPError, an error page is never handed on as JSON.
+import json
+import socket
+
+try:
+    import ssl
+except ImportError:
+    import ussl as ssl
+
+
+def wrap_tls(sock, host):
+    if hasattr(ssl, "SSLContext"):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        try:
+            context.check_hostname = False
+        except AttributeError:
+            pass
+        context.verify_mode = ssl.CERT_NONE  # like urequests, certificates aren't checked
+        return context.wrap_socket(sock, server_hostname=host)
+    return ssl.wrap_socket(sock, server_hostname=host)
+
+
+class HTTPError(OSError):
+    def __init__(self, status):
+        super().__init__("HTTP status " + str(status))
+        self.status = status
+
+
+class Response:
+    def __init__(self, client, status, length, chunked, close):
+        self.client = client
+        self.status = status
+        self.length = length  # body bytes left, None if not known
+        self.chunked = chunked
+        self.chunk_left = 0
+        self.will_close = close or (length is None and not chunked)
+        self.done = length == 0
+
+    # Read up to len(buf) body bytes into buf, 0 at the end of the body
+    def readinto(self, buf):
+        if self.done:
+            return 0
+        stream = self.client.stream
+        n = len(buf)
+        if self.chunked:
+            if not self.chunk_left:
+                line = stream.readline()
+                if not line:
+                    raise OSError("connection closed in chunked body")
+                self.chunk_left = int(line.split(b";")[0], 16)
+                if not self.chunk_left:
+                    # last chunk, skip the trailers
+                    while stream.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    self.done = True
+                    return 0
+            n = min(n, self.chunk_left)
+        elif self.length is not None:
+            n = min(n, self.length)
+        if n < len(buf):
+            buf = memoryview(buf)[:n]
+        got = stream.readinto(buf)
+        if not got:
+            if self.length is None and not self.chunked:
+                self.done = True  # body ends when the server closes
+                return 0
+            raise OSError("connection closed in body")
+        if self.chunked:
+            self.chunk_left -= got
+            if not self.chunk_left:
+                stream.readline()  # CRLF after the chunk
+        elif self.length is not None:
+            self.length -= got
+            self.done = not self.length
+        return got
+
+    # Whole (rest of the) body
+    def read(self):
+        if self.length is not None:
+            body = bytearray(self.length)
+            view = memoryview(body)
+            got = 0
+            while got < len(body):
+                got += self.readinto(view[got:])
+            return bytes(body)
+        parts = []
+        buf = bytearray(512)
+        while True:
+            n = self.readinto(buf)
+            if not n:
+                break
+            parts.append(bytes(buf[:n]))
+        return b"".join(parts)
+
+    def json(self):
+        return json.loads(self.read())
+
+    # Done with the response: skip what's left of the body so the connection
+    # can be used again, or close it when it can't be
+    def close(self):
+        if self.client.response is not self:
+            return
+        self.client.response = None
+        if self.will_close:
+            self.client.close()
+            return
+        try:
+            buf = bytearray(256)
+            while self.readinto(buf):
+                pass
+        except OSError:
+            self.client.close()
+
+
+class HTTPClient:
+    # base is scheme://host[:port], e.g. "https://data-live.flightradar24.com"
+    def __init__(self, base, timeout=10):
+        scheme, _, host = base.partition("://")
+        self.tls = scheme == "https"
+        port = 443 if self.tls else 80
+        if ":" in host:
+            host, port = host.split(":")
+            port = int(port)
+        self.host = host.rstrip("/")
+        self.port = port
+        self.timeout = timeout
+        self.addr = None  # cached DNS lookup
+        self.sock = None
+        self.stream = None
+        self.response = None
+        self.connects = 0
+
+    def connect(self):
+        if self.addr is None:
+            self.addr = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0][-1]
+        sock = socket.socket()
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.addr)
+            if self.tls:
+                sock = wrap_tls(sock, self.host)
+        except Exception:
+            sock.close()
+            self.addr = None  # maybe the address changed, look it up again next time
+            raise
+        self.sock = sock
+        try:
+            self.stream = sock.makefile("rwb")
+        except AttributeError:
+            self.stream = sock  # MicroPython sockets are streams already
+        self.connects += 1
+
+    def close(self):
+        self.response = None
+        if self.sock:
+            try:
+                if self.stream is not self.sock:
+                    self.stream.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = self.stream = None
+
+    def request(self, method, path, headers=None):
+        if self.response:
+            self.response.close()
+        head = method + " " + path + " HTTP/1.1\r\nHost: " + self.host + "\r\n"
+        if headers:
+            for name, value in headers.items():
+                head += name + ": " + value + "\r\n"
+        head = (head + "\r\n").encode()
+        # A kept connection may have been closed by the server while idle, then
+        # the request is sent again once on a new connection
+        for retry in (True, False):
+            fresh = self.sock is None
+            if fresh:
+                self.connect()
+            try:
+                self.stream.write(head)
+                if hasattr(self.stream, "flush"):
+                    self.stream.flush()
+                response = self.read_head()
+                break
+            except OSError:
+                self.close()
+                if fresh or not retry:
+                    raise
+        self.response = response
+        if not 200 <= response.status < 300:
+            response.close()  # skip the error body, the connection can be used again
+            raise HTTPError(response.status)
+        return response
+
+    def get(self, path, headers=None):
+        return self.request("GET", path, headers)
+
+    def read_head(self):
+        stream = self.stream
+        line = stream.readline()
+        if not line:
+            raise OSError("connection closed")
+        status = int(line.split(None, 2)[1])
+        length = None
+        chunked = False
+        close = line.startswith(b"HTTP/1.0")
+        while True:
+            line = stream.readline()
+            if not line or line == b"\r\n" or line == b"\n":
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = value == b"chunked"
+            elif name == b"connection":
+                close = value == b"close"
+        if chunked:
+            length = None
+        return Response(self, status, length, chunked, close)
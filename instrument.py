@@ -0,0 +1,163 @@
+# Timing and memory figures for each stage of the main loop
+#
+# main.py wraps its stages in start()/stop() when its _INSTRUMENT switch is on:
+#
+#   t = instrument.start()
+#   ...
+#   instrument.stop(instrument.FETCH, t)
+#
+# For every stage the recorder keeps the last, min, average and max time in
+# microseconds, plus the lowest gc.mem_free() and highest gc.mem_alloc() seen at
+# the end of any stage. Everything lives in arrays allocated here at import, so
+# recording doesn't allocate and can't itself set off a garbage collection. Min,
+# max and the counts start over after every log line, the average is a running
+# one (each new time counts for 1/8).
+#
+# log() prints one line, draw(oled) fills the display with the same figures.
+import gc
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+
+    def const(x):
+        return x
+
+
+try:
+    from time import ticks_us, ticks_ms, ticks_diff
+except ImportError:
+    from time import monotonic
+
+    def ticks_us():
+        return int(monotonic() * 1000000)
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+if hasattr(gc, "mem_free"):
+    mem_free = gc.mem_free
+    mem_alloc = gc.mem_alloc
+else:
+    # CPython has no fixed heap, what tracemalloc traces stands in for the
+    # allocated memory when it's running, free memory is unknown
+    import tracemalloc
+
+    def mem_free():
+        return 0
+
+    def mem_alloc():
+        return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+# Stages
+WIFI = const(0)  # checkConnection
+FETCH = const(1)  # sending a request until the response head is in
+JSON = const(2)  # reading and decoding the body
+PARSE = const(3)  # turning the fields into display lines
+SHOW = const(4)  # pushing the display buffer over SPI
+STAGES = ("wifi", "fetch", "json", "parse", "show")
+
+_AVG_SHIFT = const(3)
+
+count = array("i", [0] * len(STAGES))
+last = array("i", [0] * len(STAGES))
+low = array("i", [0] * len(STAGES))
+high = array("i", [0] * len(STAGES))
+avg = array("i", [0] * len(STAGES))
+# lowest free and highest allocated heap since boot
+memory = array("i", [0, 0])
+logged = array("i", [0])
+
+
+def reset():
+    for i in range(len(STAGES)):
+        count[i] = last[i] = low[i] = high[i] = avg[i] = 0
+    memory[0] = mem_free()
+    memory[1] = mem_alloc()
+    logged[0] = ticks_ms()
+
+
+def start():
+    return ticks_us()
+
+
+# Record a stage that began at t (from start())
+def stop(stage, t):
+    took = ticks_diff(ticks_us(), t)
+    last[stage] = took
+    if not count[stage] or took < low[stage]:
+        low[stage] = took
+    if took > high[stage]:
+        high[stage] = took
+    if avg[stage]:
+        avg[stage] += (took - avg[stage]) >> _AVG_SHIFT
+    else:
+        avg[stage] = took
+    count[stage] += 1
+    free = mem_free()
+    if free < memory[0]:
+        memory[0] = free
+    used = mem_alloc()
+    if used > memory[1]:
+        memory[1] = used
+
+
+# Record every call of a method without arguments as stage, e.g. wrap(oled, "show", SHOW)
+def wrap(obj, name, stage):
+    method = getattr(obj, name)
+
+    def timed():
+        t = ticks_us()
+        result = method()
+        stop(stage, t)
+        return result
+
+    setattr(obj, name, timed)
+
+
+def ms(us):
+    return str(us // 1000) + "." + str(us // 100 % 10)
+
+
+# "fetch 3x 412.5/530.1/702.3ms" for stages that ran since the last log line
+def line():
+    parts = []
+    for i in range(len(STAGES)):
+        if count[i]:
+            parts.append(
+                STAGES[i] + " " + str(count[i]) + "x " + ms(low[i]) + "/" + ms(avg[i]) + "/" + ms(high[i]) + "ms"
+            )
+    parts.append("free " + str(memory[0]) + " alloc " + str(memory[1]))
+    return ", ".join(parts)
+
+
+# Print the figures when period_ms has passed since the last time, and start
+# the min/max/counts over
+def log(period_ms=60000):
+    if ticks_diff(ticks_ms(), logged[0]) < period_ms:
+        return False
+    print("stages min/avg/max: " + line())
+    for i in range(len(STAGES)):
+        count[i] = low[i] = high[i] = 0
+    logged[0] = ticks_ms()
+    return True
+
+
+# Diagnostics screen: last and average time of each stage in ms, then memory
+def draw(oled):
+    oled.fill(0)
+    oled.text("stage  last  avg", 0, 0)
+    for i in range(len(STAGES)):
+        oled.text("%-5s%6d%5d" % (STAGES[i], last[i] // 1000, avg[i] // 1000), 0, 8 + i * 8)
+    oled.text("free " + str(memory[0]), 0, 48)
+    oled.text("peak " + str(memory[1]), 0, 56)
+    oled.show()
+
+
+reset()
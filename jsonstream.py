@@ -0,0 +1,320 @@
+# Streaming key-path extractor for JSON documents
+#
+# Reads a JSON document a chunk at a time and keeps only the values found at
+# the requested key paths. Every other subtree is scanned past without being
+# built, so peak memory is the read buffer plus the kept values no matter how
+# big the document is. Reading stops as soon as every requested path was seen.
+#
+# A path can hold ANY in place of a key or index, to visit every element of an
+# array (or every member of an object), e.g. ("trail", ANY, "lat"). Values found
+# that way aren't kept, they are handed to each(path, value) as they are read,
+# so an array of any length streams through. With such paths reading goes on
+# to the end of the document, or until each() returns True and every other path
+# was seen.
+try:
+    from micropython import const
+except ImportError:
+    const = lambda x: x
+
+# Parser states
+_VALUE = const(0)  # expecting a value
+_KEY = const(1)  # expecting an object key or "}"
+_COLON = const(2)  # expecting ":" after a key
+_NEXT = const(3)  # expecting "," or a closing bracket after a value
+_STRING = const(4)  # inside a string
+_LITERAL = const(5)  # inside a number, true, false or null
+_SKIP = const(6)  # inside an object or array nobody asked for
+_DONE = const(7)  # top level value finished
+
+# In a path, matches any key or index
+ANY = const(-1)
+
+# What the string being read is for
+_S_KEY = const(0)
+_S_KEEP = const(1)
+_S_DROP = const(2)
+
+_ESCAPES = {
+    ord("b"): 0x08,
+    ord("f"): 0x0C,
+    ord("n"): 0x0A,
+    ord("r"): 0x0D,
+    ord("t"): 0x09,
+}
+
+
+class KeyPathExtractor:
+    # paths is a sequence of key paths, each a tuple of object keys and array
+    # indexes, e.g. ("airport", "origin", "code", "iata") or ("trail", 0, "lat").
+    # Only scalar values are kept, a path ending on an object or array is skipped.
+    # Strings longer than max_str bytes are truncated.
+    def __init__(self, paths, max_str=96, each=None):
+        self.paths = paths
+        self.each = each
+        self.result = {}
+        self.found = 0
+        self.fixed = 0  # paths without ANY, the values kept in result
+        self.stopped = False  # each() has had enough
+        depth = 0
+        for p in paths:
+            depth = max(depth, len(p))
+            if ANY not in p:
+                self.fixed += 1
+        self._wild = self.fixed < len(paths)
+        self._path = [None] * depth
+        self._is_obj = bytearray(depth)
+        self._depth = 0
+        self._state = _VALUE
+        self._str = bytearray(max_str)
+        self._len = 0
+        self._target = _S_DROP
+        self._esc = 0  # 1 after a backslash, 2 to 5 while reading \uXXXX digits
+        self._uni = 0
+        self._keep = False
+        self._skip = 0  # bracket depth of the subtree being skipped
+        self._skip_str = False
+        self._skip_esc = False
+
+    @property
+    def done(self):
+        return self._state == _DONE or (self.found >= self.fixed and (self.stopped or not self._wild))
+
+    # Parse the first n bytes of buf (all of it if n is None)
+    def feed(self, buf, n=None):
+        if n is None:
+            n = len(buf)
+        i = 0
+        while i < n:
+            c = buf[i]
+            state = self._state
+
+            if state == _SKIP:
+                if self._skip_str:
+                    if self._skip_esc:
+                        self._skip_esc = False
+                    elif c == 0x5C:  # \
+                        self._skip_esc = True
+                    elif c == 0x22:  # "
+                        self._skip_str = False
+                elif c == 0x22:
+                    self._skip_str = True
+                elif c == 0x7B or c == 0x5B:  # { [
+                    self._skip += 1
+                elif c == 0x7D or c == 0x5D:  # } ]
+                    self._skip -= 1
+                    if not self._skip:
+                        self._value_done()
+
+            elif state == _STRING:
+                if self._esc == 0:
+                    if c == 0x22:
+                        self._string_done()
+                    elif c == 0x5C:
+                        self._esc = 1
+                    elif self._target != _S_DROP:
+                        self._append(c)
+                elif self._esc == 1:
+                    if c == 0x75:  # u
+                        self._esc = 2
+                        self._uni = 0
+                    else:
+                        self._esc = 0
+                        if self._target != _S_DROP:
+                            self._append(_ESCAPES.get(c, c))
+                else:
+                    self._uni = (self._uni << 4) | int(chr(c), 16)
+                    self._esc += 1
+                    if self._esc == 6:
+                        self._esc = 0
+                        if self._target != _S_DROP:
+                            if 0xD800 <= self._uni <= 0xDFFF:
+                                self._append(0x3F)  # ? for half a surrogate pair
+                            else:
+                                for b in chr(self._uni).encode():
+                                    self._append(b)
+
+            elif state == _LITERAL:
+                if c == 0x2C or c == 0x7D or c == 0x5D or c <= 0x20:  # , } ] space
+                    if self._keep:
+                        self._store(self._literal())
+                    self._value_done()
+                    continue  # the delimiter still has to be parsed
+                if self._keep:
+                    self._append(c)
+
+            elif c <= 0x20:
+                pass  # whitespace between tokens
+
+            elif state == _VALUE:
+                self._start_value(c)
+
+            elif state == _NEXT:
+                if c == 0x2C:
+                    d = self._depth - 1
+                    if self._is_obj[d]:
+                        self._state = _KEY
+                    else:
+                        self._path[d] += 1
+                        self._state = _VALUE
+                elif c == 0x7D or c == 0x5D:
+                    self._close()
+                else:
+                    raise ValueError("unexpected byte in JSON: " + chr(c))
+
+            elif state == _KEY:
+                if c == 0x22:
+                    self._begin_string(_S_KEY)
+                elif c == 0x7D:
+                    self._close()
+                else:
+                    raise ValueError("expected a key in JSON object")
+
+            elif state == _COLON:
+                if c != 0x3A:
+                    raise ValueError("expected : in JSON object")
+                self._state = _VALUE
+
+            i += 1
+
+    def _start_value(self, c):
+        d = self._depth
+        if c == 0x5D and d and not self._is_obj[d - 1]:
+            self._close()  # empty array
+            return
+        match = self._match()
+        if c == 0x7B or c == 0x5B:
+            if match & 1:
+                self._is_obj[d] = c == 0x7B
+                self._path[d] = 0
+                self._depth = d + 1
+                self._state = _KEY if c == 0x7B else _VALUE
+            else:
+                self._skip = 1
+                self._skip_str = False
+                self._skip_esc = False
+                self._state = _SKIP
+        elif c == 0x22:
+            self._begin_string(_S_KEEP if match & 2 else _S_DROP)
+        else:
+            self._keep = match & 2
+            self._len = 0
+            self._append(c)
+            self._state = _LITERAL
+
+    # 2 if the current path is one of the requested ones, plus 1 if it leads to
+    # one (a path can be the start of another)
+    def _match(self):
+        d = self._depth
+        path = self._path
+        found = 0
+        for p in self.paths:
+            if len(p) < d:
+                continue
+            i = 0
+            while i < d and (p[i] == path[i] or p[i] == ANY):
+                i += 1
+            if i == d:
+                found |= 2 if len(p) == d else 1
+                if found == 3:
+                    break
+        return found
+
+    def _begin_string(self, target):
+        self._target = target
+        self._len = 0
+        self._esc = 0
+        self._state = _STRING
+
+    def _string_done(self):
+        if self._target == _S_KEY:
+            self._path[self._depth - 1] = self._text()
+            self._state = _COLON
+        else:
+            if self._target == _S_KEEP:
+                self._store(self._text())
+            self._value_done()
+
+    def _append(self, c):
+        if self._len < len(self._str):
+            self._str[self._len] = c
+            self._len += 1
+
+    def _text(self):
+        n = self._len
+        buf = self._str
+        if n == len(buf):
+            # Truncated, don't leave half a UTF-8 character at the end
+            j = n - 1
+            while j > 0 and buf[j] & 0xC0 == 0x80:
+                j -= 1
+            lead = buf[j]
+            size = 1 if lead < 0x80 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+            if j + size > n:
+                n = j
+        return str(buf[:n], "utf-8")
+
+    def _literal(self):
+        s = self._text()
+        if s == "null":
+            return None
+        if s == "true":
+            return True
+        if s == "false":
+            return False
+        try:
+            return int(s)
+        except ValueError:
+            return float(s)
+
+    def _store(self, value):
+        d = self._depth
+        if not d:
+            return
+        path = self._path
+        if self._wild and self._any():
+            if self.each and not self.stopped and self.each(path, value):
+                self.stopped = True
+            return
+        node = self.result
+        for i in range(d - 1):
+            child = node.get(path[i])
+            if child is None:
+                child = node[path[i]] = {}
+            node = child
+        node[path[d - 1]] = value
+        self.found += 1
+
+    # Whether the current path was matched through an ANY
+    def _any(self):
+        d = self._depth
+        path = self._path
+        for p in self.paths:
+            if len(p) == d and ANY in p:
+                i = 0
+                while i < d and (p[i] == path[i] or p[i] == ANY):
+                    i += 1
+                if i == d:
+                    return True
+        return False
+
+    def _close(self):
+        self._depth -= 1
+        self._value_done()
+
+    def _value_done(self):
+        self._state = _NEXT if self._depth else _DONE
+
+
+# Read a JSON document from a stream (anything with readinto) and return a
+# sparse copy of it holding only the requested paths, e.g.
+# {"airport": {"origin": {"code": {"iata": "COK"}}}}
+# Values at paths with ANY go to each(path, value) instead.
+def extract(stream, paths, bufsize=256, max_str=96, each=None):
+    parser = KeyPathExtractor(paths, max_str, each)
+    buf = bytearray(bufsize)
+    while not parser.done:
+        n = stream.readinto(buf)
+        if not n:
+            break
+        parser.feed(buf, n)
+    return parser.result
@@ -0,0 +1,63 @@
+# On-flash name lookup tables (airports, airlines, aircraft types)
+#
+# A table is a sorted file of fixed width records, built by
+# setup/build-lookup-tables.py:
+#
+#   header:  b"LK", key width (1 byte), name width (1 byte), record count (uint32 LE)
+#   records: key padded with spaces to key width, name padded with spaces to name width
+#
+# Lookups binary search the file a record at a time, so a table costs a file
+# handle and one record buffer of RAM whatever its size.
+
+MAGIC = b"LK"
+HEADER_SIZE = 8
+
+
+class LookupTable:
+    def __init__(self, path):
+        self._f = open(path, "rb")
+        header = self._f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[:2] != MAGIC:
+            self._f.close()
+            raise ValueError("not a lookup table: " + path)
+        self.key_width = header[2]
+        self.name_width = header[3]
+        self.count = int.from_bytes(header[4:8], "little")
+        self._record = bytearray(self.key_width + self.name_width)
+
+    # Name stored for code, or None when the table doesn't have it
+    def get(self, code):
+        if not code:
+            return None
+        kw = self.key_width
+        key = code.encode()
+        if len(key) > kw:
+            return None
+        key += b" " * (kw - len(key))
+        record = self._record
+        size = len(record)
+        lo = 0
+        hi = self.count - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            self._f.seek(HEADER_SIZE + mid * size)
+            self._f.readinto(record)
+            found = bytes(record[:kw])
+            if found == key:
+                return str(record[kw:], "utf-8").rstrip()
+            if found < key:
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        return None
+
+    def close(self):
+        self._f.close()
+
+
+# Open a table if it has been copied to the board, None otherwise
+def open_table(path):
+    try:
+        return LookupTable(path)
+    except OSError:
+        return None
@@ -2,9 +2,32 @@ from machine import Pin, SPI
 from ssd1306 import SSD1306_SPI
 import framebuf
 from time import sleep
-from utime import sleep_ms
 import network  # handles connecting to WiFi
-import urequests  # handles making and servicing network requests
+from wifi import WiFi  # keeps the connection up
+from httpclient import HTTPClient  # makes network requests over one kept-alive connection
+import jsonstream  # pulls single fields out of a response without loading all of it
+import lookup  # airport, airline and aircraft names from tables on flash
+from marquee import Marquee
+from screentext import FlightView
+import assets  # images for the display, see setup/build-image-byte-array.py
+import tasks  # the poll, details and display tasks of the main loop
+from pollschedule import PollScheduler
+from flighttable import FlightTable, parse_home, box_centre, distance_elevation
+from deadreckon import DeadReckoner
+from detailscache import DetailsCache
+from prefetch import Prefetcher
+from minimap import MiniMap
+from zones import ZoneIndex, parse_zones, union_bounds
+import history  # log of the flights seen
+from tasks import asyncio, sleep_ms
+
+try:
+    from micropython import const
+except ImportError:
+
+    def const(x):
+        return x
+
 
 try:
     from code_secrets import secrets
@@ -15,23 +38,165 @@ except ImportError:
 # Time in seconds to wait between scrolling one line and the next
 PAUSE_BETWEEN_LINE_SCROLLING = 3
 
+# Longest line shown, in characters, a longer one is cut and ends in ".."
+LONG_LINE_CHARS = 96
+
+# On one core a flight details request stops everything on the display until it's
+# answered. Instead the display flies the plane across by itself meanwhile, it can
+# only go round in its 128 columns so it takes a picture as wide as the display
+# (plane-icon.bin). LOADING_PLANE_FRAMES is how many display frames it waits between
+# steps, one of 2, 3, 4, 5, 25, 64, 128 or 256.
+LOADING_PLANE = True
+LOADING_PLANE_FRAMES = 2
+
 # How often to query fr24 - quick enough to catch a plane flying over, not so often as to cause any issues, hopefully
+# Polls keep to this schedule while the display is scrolling
 QUERY_DELAY = 25
 
+# Plan each poll from the last one instead: poll again just after the flight shown
+# is expected to leave the box or another one to come closer than it, so a busy
+# sky gets polled more often, else after QUERY_DELAY. Back off up to MAX_QUERY_DELAY
+# while the box stays empty, but no longer than half the time a fast jet takes to
+# cross it (printed at startup), so it can't slip through unseen. Over a made-up
+# day in a 0.7 degree box (host/simulate_polling.py) this makes 10% fewer requests
+# than polling every 25 s, misses no more flights and shows the wrong one half as long.
+ADAPTIVE_POLLING = True
+MIN_QUERY_DELAY = 5
+MAX_QUERY_DELAY = 60
+
 # Area to search for flights, see secrets file
 # BOUNDS_BOX = "51.6,51.4,-0.3,-0.1"
-BOUNDS_BOX = secrets["bounds_box"]
 # area to search for flights: top latitude, bottom latitude, left longitude, right longitude (so this example is central London)
+# Or watch several areas at once: secrets["zones"], a list of named boxes or
+# polygons with a priority each and their own NEAREST_BY, altitude and ground
+# settings, see zones.py. The box around them all is searched with one request,
+# and the flight shown is the nearest in the highest priority zone that has one.
+# With a proxy only the box around them is used.
+ZONES = parse_zones(secrets["zones"]) if "zones" in secrets else None
+BOUNDS_BOX = union_bounds(ZONES) if ZONES else secrets["bounds_box"]
+
+# Where you are, secrets["home"] as "lat,lon" or "lat,lon,altitude in m", the middle
+# of the box if it isn't set. Of all the flights in the box the one closest to it is
+# shown, nearest along the ground or, with NEAREST_BY = "elevation", highest in the sky.
+HOME = parse_home(secrets["home"]) if "home" in secrets else box_centre(BOUNDS_BOX)
+NEAREST_BY = "distance"
+# How many flights to ask fr24 for, and which of them may be shown: altitudes in
+# feet, and whether planes on the ground count
+FLIGHT_LIMIT = 50
+MIN_ALTITUDE = 0
+MAX_ALTITUDE = 60000
+SHOW_ON_GROUND = False
+
+# Between polls, work out where the flight shown is now from its last position, track
+# and speed, and show its distance, bearing from HOME and time until it's closest
+# under the ID, updated every second
+LIVE_POSITION = True
+
+# After the lines, show a map of the box with home and the flight's track on it in the
+# right MAP_WIDTH pixels of the display, for twice PAUSE_BETWEEN_LINE_SCROLLING. The
+# track is the trail from the flight details, up to MAP_TRAIL_POINTS points of it,
+# when a details request is made for the flight anyway. When the lines came from the
+# name tables or the cache the track starts where the flight was first found and grows
+# with each poll, unless MAP_TRAIL_REQUEST asks for the trail, a request per new flight.
+# Not used with a proxy.
+MINI_MAP = True
+MAP_WIDTH = 56
+MAP_TRAIL_POINTS = 48
+MAP_TRAIL_REQUEST = False
 
 # URLs
-FLIGHT_SEARCH_HEAD = "https://data-live.flightradar24.com/zones/fcgi/feed.js?bounds="
-FLIGHT_SEARCH_TAIL = "&faa=1&satellite=1&mlat=1&flarm=1&adsb=1&gnd=0&air=1&vehicles=0&estimated=0&maxage=14400&gliders=0&stats=0&ems=1&limit=1"
-FLIGHT_SEARCH_URL = FLIGHT_SEARCH_HEAD + BOUNDS_BOX + FLIGHT_SEARCH_TAIL
+# All requests go to one host so its connection can be kept open between them,
+# secrets can point it somewhere else, like a local stand-in for testing
+FR24_URL = secrets.get("fr24_url", "https://data-live.flightradar24.com")
+FLIGHT_SEARCH_HEAD = "/zones/fcgi/feed.js?bounds="
+FLIGHT_SEARCH_TAIL = "&faa=1&satellite=1&mlat=1&flarm=1&adsb=1&air=1&vehicles=0&estimated=0&maxage=14400&gliders=0&stats=0&ems=1&limit="
+# planes on the ground are only asked for when they can be shown
+FEED_GROUND = SHOW_ON_GROUND or bool(ZONES and any(z.ground for z in ZONES))
+FLIGHT_SEARCH_URL = (
+    FLIGHT_SEARCH_HEAD + BOUNDS_BOX + "&gnd=" + ("1" if FEED_GROUND else "0") + FLIGHT_SEARCH_TAIL + str(FLIGHT_LIMIT)
+)
 # Used to get more flight details with a fr24 flight ID from the initial search
 FLIGHT_LONG_DETAILS_HEAD = (
-    # "https://data-live.flightradar24.com/clickhandler/?flight="
-    "https://data-live.flightradar24.com/clickhandler/?version=1.5&notrail=true&flight="
+    # "/clickhandler/?flight="
+    "/clickhandler/?version=1.5&notrail=true&flight="
 )
+# The same with the trail, for the mini-map
+FLIGHT_TRAIL_HEAD = "/clickhandler/?version=1.5&flight="
+
+# Time the WiFi check, requests, JSON decoding, parsing and display updates and keep
+# memory low-water marks, logged every INSTRUMENT_LOG_PERIOD seconds and shown on
+# the display while the sky is empty. Set to const(1) to switch on, at const(0)
+# MicroPython leaves all of it out of the compiled code.
+_INSTRUMENT = const(0)
+INSTRUMENT_LOG_PERIOD = 60
+if _INSTRUMENT:
+    import instrument
+
+# Ask a proxy on the LAN (proxy/server.py) instead of fr24, secrets["proxy_url"] like
+# "http://192.168.1.10:8024". It polls fr24 once for all the displays and answers
+# with just the nearest flight and the fields shown. With DUAL_CORE the request
+# waits at the proxy for something new, up to PROXY_WAIT seconds, so a new flight
+# shows as soon as the proxy sees it. A failed request is tried again after
+# PROXY_RETRY_DELAY seconds, doubling each time it fails again up to MAX_QUERY_DELAY.
+PROXY_URL = secrets.get("proxy_url")
+PROXY_WAIT = 20
+PROXY_RETRY_DELAY = 2
+
+# The access point (and with WIFI_REUSE_IP the address) of the last connection are
+# kept in WIFI_CACHE_FILE to reconnect faster. secrets["ifconfig"], a list of ip,
+# netmask, gateway and DNS server, sets a static address so DHCP is skipped.
+# At boot, wait up to WIFI_CONNECT_TIMEOUT seconds for the WiFi.
+WIFI_CACHE_FILE = "wifi.cache"
+WIFI_REUSE_IP = False
+WIFI_CONNECT_TIMEOUT = 30
+
+# Poll and load flight details on the second core so the display never stalls on the network
+DUAL_CORE = False
+
+# Build the display lines from the search result and the name tables on flash instead of
+# asking fr24 for the flight details. Build the tables with setup/build-lookup-tables.py
+# and copy them to the board next to main.py. A flight with a code the tables don't
+# have, or any flight while the tables aren't there, still has its details requested.
+OFFLINE_LOOKUP = True
+AIRPORTS_TABLE = "airports.tbl"
+AIRLINES_TABLE = "airlines.tbl"
+AIRCRAFT_TABLE = "aircraft.tbl"
+
+# Remember the display lines of recent flights, for when a flight comes back into the
+# box or two take turns being the nearest: up to DETAILS_CACHE_BYTES of them, each for
+# DETAILS_CACHE_TTL seconds. A flight that's back under a new fr24 ID is recognised by
+# its registration and route. They are saved to DETAILS_CACHE_FILE to survive a
+# reboot, at most every DETAILS_CACHE_SAVE_PERIOD seconds to spare the flash, None
+# keeps them in RAM only.
+DETAILS_CACHE_BYTES = 4096
+DETAILS_CACHE_TTL = 3 * 3600
+DETAILS_CACHE_FILE = "details.cache"
+DETAILS_CACHE_SAVE_PERIOD = 1800
+
+# While a flight is shown, load the display lines of the PREFETCH_FLIGHTS next nearest
+# in the background, so the display can switch to one of them without waiting for
+# its details. A request blocks until it's answered, so one runs at a time: on
+# one core in the PAUSE_BETWEEN_LINE_SCROLLING pauses, while the page stands still
+# and if it's expected to be done before the pause is, with DUAL_CORE between polls.
+# Not used with a proxy, it sends the details of the flight it picked.
+PREFETCH_FLIGHTS = 3
+
+# Log every flight shown to the HISTORY_FILE folder on flash, about HISTORY_SIZE
+# records (32 bytes each), the oldest deleted a flash sector's worth at a time
+# when it's full. Records are added in one write per sector, or once the oldest
+# has waited HISTORY_FLUSH_PERIOD seconds. None for no log.
+HISTORY_FILE = "history"
+HISTORY_SIZE = 2048
+HISTORY_FLUSH_PERIOD = 900
+
+# Fields of a flight row in the search result
+ROW_AIRCRAFT_CODE = 8
+ROW_REGISTRATION = 9
+ROW_ORIGIN = 11
+ROW_DESTINATION = 12
+ROW_NUMBER = 13
+ROW_CALLSIGN = 16
+ROW_AIRLINE = 18
 
 # Request headers
 request_headers = {
@@ -40,46 +205,217 @@ request_headers = {
     "accept": "application/json",
 }
 
+# The only fields parse_details_json reads from the flight details, everything else
+# (images, flight history, trail...) is skipped while the response streams in
+DETAILS_PATHS = (
+    ("identification", "number", "default"),
+    ("identification", "callsign"),
+    ("aircraft", "model", "code"),
+    ("aircraft", "model", "text"),
+    ("airline", "name"),
+    ("airport", "origin", "name"),
+    ("airport", "origin", "code", "iata"),
+    ("airport", "destination", "name"),
+    ("airport", "destination", "code", "iata"),
+)
+# The trail points, streamed into the mini-map one at a time
+TRAIL_PATHS = (
+    ("trail", jsonstream.ANY, "lat"),
+    ("trail", jsonstream.ANY, "lng"),
+)
+
 
-# Look for flights overhead
+# Look for flights overhead and pick the one closest to HOME, flight_row keeps its
+# search result row, flight_distance how far away it is in m and flight_count how
+# many flights the search returned. ranked_flights are the ones that may be shown,
+# nearest first by ranked_by, None if the request failed.
 def get_flights():
+    global flight_row, flight_count, flight_distance, flight_zone, ranked_flights, ranked_by
+    flight_count = 0
+    ranked_flights = None
     try:
-        response = urequests.get(url=FLIGHT_SEARCH_URL, headers=request_headers).json()
+        if _INSTRUMENT:
+            t = instrument.start()
+        reply = fr24.get(FLIGHT_SEARCH_URL, request_headers)
+        if _INSTRUMENT:
+            instrument.stop(instrument.FETCH, t)
+            t = instrument.start()
+        try:
+            flight_count = flights.read(reply)  # straight into the table, no rows decoded
+        finally:
+            reply.close()
+        if _INSTRUMENT:
+            instrument.stop(instrument.JSON, t)
     except Exception as e:
+        fr24.close()
         print("Error getting a flight")
         print(e.__class__.__name__ + "----------------ERROR---------------")
         print(e)
-        checkConnection()
+        network_error(e)
         return False
-    if len(response) == 3:
-        # print ("Flight found.")
-        for flight_id, flight_info in response.items():
-            # the JSON has three main fields, we want the one that's a flight ID
-            if not (flight_id == "version" or flight_id == "full_count"):
-                if len(flight_info) > 13:
-                    return flight_id
+    zone = None
+    n = PREFETCH_FLIGHTS + 1
+    if ADAPTIVE_POLLING:
+        n = max(n, flights.count)  # the scheduler looks at them all
+    if zone_index:
+        # the nearest in the first zone that has any, highest priority first
+        zone_index.route(flights)
+        for zone in zone_index.zones:
+            ranked = flights.ranked(
+                HOME, zone.by, zone.min_alt, zone.max_alt, zone.ground, n, zone_index.masks, zone.bit
+            )
+            if ranked:
+                break
     else:
+        ranked = flights.ranked(HOME, NEAREST_BY, MIN_ALTITUDE, MAX_ALTITUDE, SHOW_ON_GROUND, n)
+    ranked_flights = ranked
+    ranked_by = zone.by if zone else NEAREST_BY
+    if prefetching():
+        prefetcher.plan(
+            [(flights.ids[j], flights.row(j)) for j in ranked[1 : PREFETCH_FLIGHTS + 1]],
+            flights.ids[ranked[0]] if ranked else None,
+        )
+    if not ranked:
+        return False
+    i = ranked[0]
+    flight_row = flights.row(i)
+    distance, elevation = flights.position(i, HOME)
+    flight_distance = distance
+    if zone:
+        flight_zone = (flights.ids[i], zone)
+    if zone or flight_count > 1:
+        print(
+            ("In " + zone.name + ", nearest of " if zone else "Nearest of ")
+            + str(flight_count)
+            + " flights: "
+            + str(round(distance / 1000, 1))
+            + " km away, "
+            + str(round(elevation))
+            + " degrees up"
+        )
+    return flights.ids[i]
+
+
+# get_flights, asking the proxy, which also sends the flight's details along
+def get_flights_from_proxy():
+    global flight_row, flight_count, flight_distance, proxy_version, proxy_details, proxy_failures, ranked_flights
+    flight_count = 0
+    ranked_flights = None
+    path = PROXY_PATH + "&since=" + str(proxy_version) + "&wait=" + str(PROXY_WAIT if DUAL_CORE else 0)
+    try:
+        if _INSTRUMENT:
+            t = instrument.start()
+        reply = proxy.get(path)
+        if _INSTRUMENT:
+            instrument.stop(instrument.FETCH, t)
+            t = instrument.start()
+        try:
+            answer = reply.json()
+        finally:
+            reply.close()
+        if _INSTRUMENT:
+            instrument.stop(instrument.JSON, t)
+    except Exception as e:
+        proxy.close()
+        print("Error asking the proxy")
+        print(e.__class__.__name__ + "----------------ERROR---------------")
+        print(e)
+        network_error(e)
+        proxy_failures += 1
+        return False
+    proxy_failures = 0
+    proxy_version = answer["v"]
+    flight_count = answer["n"]
+    flight_id = answer["id"]
+    # the flight it picked is all the scheduler gets to see
+    flights.load({flight_id: answer["row"]} if flight_id else {})
+    ranked_flights = [0] if flight_id else []
+    if not flight_id:
         return False
+    flight_row = answer["row"]
+    proxy_details = (flight_id, answer.get("details"))
+    flight_distance = distance_elevation(HOME, flight_row[1], flight_row[2], (flight_row[4] or 0) * 0.3048)[0]
+    return flight_id
+
 
+# Seconds until the next long poll of the proxy: straight away after an answer,
+# backing off from PROXY_RETRY_DELAY while it can't be reached
+def proxy_delay():
+    if not proxy_failures:
+        return 0
+    return min(PROXY_RETRY_DELAY << min(proxy_failures - 1, 8), MAX_QUERY_DELAY)
 
-# Take the flight ID we found with a search, and load details about it
-def get_flight_details(fn):
+
+# Take the flight ID we found with a search, and load details about it, with trail
+# set its trail goes to the mini-map on the way
+def get_flight_details(fn, trail=False):
     # Get the URL response one chunk at a time
     try:
-        response = urequests.get(
-            url=FLIGHT_LONG_DETAILS_HEAD + fn, headers=request_headers
-        ).json()
+        if _INSTRUMENT:
+            t = instrument.start()
+        if trail:
+            trail_map.start(fn)
+            response = fr24.get(FLIGHT_TRAIL_HEAD + fn, request_headers)
+        else:
+            response = fr24.get(FLIGHT_LONG_DETAILS_HEAD + fn, request_headers)
+        if _INSTRUMENT:
+            instrument.stop(instrument.FETCH, t)
+            t = instrument.start()
+        try:
+            if trail:
+                details = jsonstream.extract(response, DETAILS_PATHS + TRAIL_PATHS, each=trail_map.point)
+            else:
+                details = jsonstream.extract(response, DETAILS_PATHS)
+        finally:
+            response.close()
+        if _INSTRUMENT:
+            instrument.stop(instrument.JSON, t)
     # Handle occasional URL fetching errors
     except Exception as e:
+        fr24.close()
         print("Error getting a flight details")
         print(e.__class__.__name__ + "----------------ERROR---------------")
         print(e)
-        checkConnection()
+        network_error(e)
+        return False
+    if trail:
+        show_map(trail_map)
+    if _INSTRUMENT:
+        t = instrument.start()
+        lines = parse_details_json(details)
+        instrument.stop(instrument.PARSE, t)
+        return lines
+    return parse_details_json(details)
+
+
+# Just the trail of a flight, for the mini-map
+def get_flight_trail(fn):
+    trail_map.start(fn)
+    try:
+        response = fr24.get(FLIGHT_TRAIL_HEAD + fn, request_headers)
+        try:
+            jsonstream.extract(response, TRAIL_PATHS, each=trail_map.point)
+        finally:
+            response.close()
+    except Exception as e:
+        fr24.close()
+        print("Error getting a flight trail")
+        print(e.__class__.__name__ + "----------------ERROR---------------")
+        print(e)
+        network_error(e)
         return False
-    return parse_details_json(response)
+    show_map(trail_map)
+    return True
+
 
+# A trail loaded on the network core goes to the map on the display in one copy,
+# see minimap.py. On one core it was loaded into that map already.
+def show_map(loaded):
+    if loaded is not minimap:
+        minimap.take(loaded)
 
-# Look at the byte array that fetch_details saved into and extract any fields we want
+
+# Look at the fields get_flight_details kept and turn them into display lines
 def parse_details_json(long_json):
     try:
         # Some available values from the JSON. Put the details URL and a flight ID in your browser and have a look for more.
@@ -128,8 +464,6 @@ def parse_details_json(long_json):
         # Set up to 6 of the values above as text for display_flights to put on the screen
         # Short strings get placed on screen, then longer ones scroll over each in sequence
 
-        global line1_short, line1_long, line2_short, line2_long, line3_short, line3_long
-
         if flight_number:
             line1_short = flight_number
         else:
@@ -165,192 +499,487 @@ def parse_details_json(long_json):
         print(e)
         return False
 
-    return True
-
+    return (line1_short, line1_long, line2_short, line2_long, line3_short, line3_long)
 
-# Populate the lines, then scroll longer versions of the text
-def display_flight(oled):
-    global flight_id, line1_short, line1_long, line2_short, line2_long, line3_short, line3_long, line1, line2, line3
 
-    line1 = line1_short
-    line2 = line2_short
-    line3 = line3_short
-    display_details(oled, flight_id, line1, line2, line3)
-    sleep(PAUSE_BETWEEN_LINE_SCROLLING)
+# Fill in the same fields parse_details_json reads, using the search result row and
+# the name tables. False when a table doesn't have one of the codes, the details
+# request has the names then.
+def parse_feed_row(row):
+    if not (airports and airlines and aircraft):
+        return False
+    try:
+        origin = row[ROW_ORIGIN]
+        destination = row[ROW_DESTINATION]
+        aircraft_code = row[ROW_AIRCRAFT_CODE]
+        aircraft_name = table_name(aircraft, aircraft_code)
+        airline_name = table_name(airlines, row[ROW_AIRLINE])
+        origin_name = table_name(airports, origin)
+        destination_name = table_name(airports, destination)
+        if aircraft_name is None or airline_name is None or origin_name is None or destination_name is None:
+            return False
+        details = {
+            "identification": {
+                "number": {"default": row[ROW_NUMBER]},
+                "callsign": row[ROW_CALLSIGN],
+            },
+            "aircraft": {"model": {"code": aircraft_code, "text": aircraft_name}},
+            "airline": {"name": airline_name},
+            "airport": {
+                "origin": {"name": origin_name, "code": {"iata": origin}},
+                "destination": {"name": destination_name, "code": {"iata": destination}},
+            },
+        }
+    except IndexError:
+        return False
+    return parse_details_json(details)
+
+
+# Name for code from a table, "" for no code, None when the table doesn't have it
+def table_name(table, code):
+    if not code:
+        return ""
+    return table.get(code)
+
+
+# Populate the lines, then scroll longer versions of the text. Everything is
+# drawn from the buffers in view, filled once by render(), so none of this
+# allocates: no strings are built while the display runs.
+async def display_flight(oled):
+    pause = int(PAUSE_BETWEEN_LINE_SCROLLING * 1000)
+    # the short lines, each line long in turn, the short lines again
+    for page in range(5):
+        long_line = page - 1 if 0 < page < 4 else -1
+        draw_details(oled, long_line)
+        if long_line >= 0 and view.long[long_line].n > 16:
+            await scroll(oled, long_line)
+        await still(pause)
+
+    if mini_map and minimap.flight_id == view.flight_id and (not view_zone or view_zone.map):
+        draw_map_page(oled)
+        minimap.visible = True
+        await still(pause * 2)
+        minimap.visible = False
+
+
+# A pause with the page standing still, prefetches on one core can have it.
+# Not a coroutine itself, uasyncio's sleep_ms() reuses one object, this mustn't add one.
+def still(ms):
+    if prefetching() and not DUAL_CORE:
+        return prefetcher.pause(ms)
+    return sleep_ms(ms)
+
+
+# The ID, the live position and the three short lines, or line long_line long
+def draw_details(oled, long_line=-1):
+    oled.fill(0)
+    view.title.draw(oled, 0, 0)
+    if LIVE_POSITION and reckoner.fix and reckoner.fix[0] == view.flight_id:
+        reckoner.visible = True
+        reckoner.write(view.live)
+        view.live.draw(oled, 0, 8)
+    for i in range(3):
+        if i == long_line:
+            view.long[i].draw(oled, 0, 16 * (i + 1))
+        else:
+            view.short[i].draw(oled, 0, 16 * (i + 1))
+    oled.show()
 
-    line1 = line1_long
-    display_details(oled, flight_id, line1, line2, line3)
-    sleep(PAUSE_BETWEEN_LINE_SCROLLING)
-    line1 = line1_short
 
-    line2 = line2_long
-    display_details(oled, flight_id, line1, line2, line3)
-    sleep(PAUSE_BETWEEN_LINE_SCROLLING)
-    line2 = line2_short
+# The short lines on the left, the map on the right
+def draw_map_page(oled):
+    oled.fill(0)
+    view.short[0].draw(oled, 0, 0)
+    view.short[1].draw(oled, 0, 16)
+    view.short[2].draw(oled, 0, 32)
+    draw_map(oled)
+    oled.show()
 
-    line3 = line3_long
-    display_details(oled, flight_id, line1, line2, line3)
-    sleep(PAUSE_BETWEEN_LINE_SCROLLING)
-    line3 = line3_short
 
-    display_details(oled, flight_id, line1, line2, line3)
-    sleep(PAUSE_BETWEEN_LINE_SCROLLING)
+# The map with the flight where the live position has it, or at its last position
+def draw_map(oled):
+    if LIVE_POSITION and reckoner.fix and reckoner.fix[0] == minimap.flight_id:
+        reckoner.locate()
+        minimap.draw(oled, 128 - MAP_WIDTH, 0, reckoner.east, reckoner.north)
+    else:
+        minimap.draw(oled, 128 - MAP_WIDTH, 0)
+
+
+# Scroll long line i across the display
+async def scroll(oled, i):
+    y = 16 * (i + 1)
+    # the line is rendered once, each frame just moves it along
+    strip = marquee.strip(i, view.long[i])
+    for step in range(160 + strip.text_width):
+        scroll_frame(oled, strip, step, y)
+        await sleep_ms(10)
+    oled.fill_rect(0, y, 128, 16, 0)
+    view.long[i].draw(oled, 0, y)
+    oled.show()
 
 
-def display_details(oled, flight_id, line1, line2, line3):
-    oled.fill(0)
-    oled.text("ID: " + flight_id, 0, 0)
-    oled.text(line1, 0, 16)
-    oled.text(line2, 0, 16 * 2)
-    oled.text(line3, 0, 16 * 3)
+def scroll_frame(oled, strip, step, y):
+    oled.fill_rect(0, y, 128, 16, 0)
+    oled.blit(strip, 128 - step, y)
     oled.show()
-    if len(line1) > 16:
-        scroll(oled, line1, 0, 16)
-    if len(line2) > 16:
-        scroll(oled, line2, 0, 16 * 2)
-    if len(line3) > 16:
-        scroll(oled, line3, 0, 16 * 3)
-
-
-def scroll(oled, line, x, y):
-    for i in range(160 + len(line) * 8):
-        oled.fill_rect(x, y, 128, 16, 0)
-        oled.text(line, 128 - x - i, y)
-        oled.show()
-        sleep_ms(10)
-    oled.fill_rect(x, y, 128, 16, 0)
-    oled.text(line, x, y)
+
+
+# The live position line under the ID
+def draw_live(oled):
+    reckoner.write(view.live)
+    oled.fill_rect(0, 8, 128, 8, 0)
+    view.live.draw(oled, 0, 8)
     oled.show()
 
 
+# Blit an image from assets, or nothing when it isn't on flash (see assets.py)
+def blit_image(oled, name, x, y):
+    image = assets.load(name)
+    if image is not None:
+        oled.blit(image, x, y)
+    return image
+
+
 def display_logo(oled):
     oled.text("Booting up ^", 0, 16 * 2)
     oled.show()
     # Display the Raspberry Pi logo on the OLED
-    buffer = bytearray(
-        b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00|?\x00\x01\x86@\x80\x01\x01\x80\x80\x01\x11\x88\x80\x01\x05\xa0\x80\x00\x83\xc1\x00\x00C\xe3\x00\x00~\xfc\x00\x00L'\x00\x00\x9c\x11\x00\x00\xbf\xfd\x00\x00\xe1\x87\x00\x01\xc1\x83\x80\x02A\x82@\x02A\x82@\x02\xc1\xc2@\x02\xf6>\xc0\x01\xfc=\x80\x01\x18\x18\x80\x01\x88\x10\x80\x00\x8c!\x00\x00\x87\xf1\x00\x00\x7f\xf6\x00\x008\x1c\x00\x00\x0c \x00\x00\x03\xc0\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
-    )
-    fb = framebuf.FrameBuffer(buffer, 32, 32, framebuf.MONO_HLSB)
-
-    oled.blit(fb, 96, 15)
+    blit_image(oled, "logo", 96, 15)
     oled.show()
+    assets.drop("logo")
 
 
 def display_pikachu(oled):
-    # Display the Raspberry Pi logo on the OLED
-    buffer = bytearray(
-        b"\x00\x00\x01\x80\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x03\xe0\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x03\xf0\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\xfc\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xfe\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xf8\x80\x00\x00\x00\x00\x00\x00\x00\x01\xe0\x00\x00\x00\x00\x00x@\x00\x00\x00\x00\x00\x00\x00\x1f\xe0\x00\x00\x00\x00\x008\x10\x00\x00\x00\x00\x00\x00\x00\xff\xc0\x00\x00\x00\x00\x008\x0c\x00\x00\x00\x00\x00\x00\x03\xff\x80\x00\x00\x00\x00\x00\x18\x02\x00\x00\x00\x00\x00\x00\x1c\x7f\x80\x00\x00\x00\x00\x00\x0c\x01\x80\x00\x00\x00\x00\x00`\x7f\x00\x00\x00\x00\x00\x00\x0c\x00\xc0\x00\x00\x00\x00\x01\x80~\x00\x00\x00\x00\x00\x00\x04\x000\x00\x00\x00\x00\x0e\x00|\x00\x00\x00\x00\x00\x00\x06\x00\x18\x00\x00\x00\x008\x00\xfc\x00\x00\x00\x00\x00\x00\x03\x00\x06\x00\x00\x00\x00\xe0\x00\xf8\x00\x00\x00\x00\x00\x00\x01\x00\x03\x00\x00\x00\x03\x80\x00\xf0\x00\x00\x00\x00\x00\x00\x01\x80\x00\x80\x00\x00\x0c\x00\x00\xe0\x00\x00\x00\x00\x00\x00\x00\xc0\x00`\x00\x000\x00\x01\xc0\x00\x00\x00\x00\x00\x00\x00\xc0\x00?\xff\xff\xe0\x00\x01\x80\x00\x00\x00\x00\x00\x00\x00`\x00\x10\x00\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x000\x00\x00\x00\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\x00\x00\x18\x00\x00\x00\x00\x00\x00\x0c\x00\x00\x00\x00\x00\x00\x00\x00\x0c\x00\x00\x00\x00\x00\x00\x18\x00\x00\x00\x00\x00\x00\x00\x00\x0c\x00\x00\x00\x00\x00\x00 \x00\x00\x00\x00\x00\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\xc0\x00\x00\x00\x00\x00\x00\x00\x00\x03 \x00\x00\x00\x00\x01\x80\x00\x00\x00\x00\x00\x00\x00\x00\x01\xc0\x00\x00\x00\x00C\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x80\x00\x00\x00\x00&\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x80\x00\x00\x00\x00\x18\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x18\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x03\x80\x0c\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x03\xe0\x00\x05\xc0\x04\x00\x00\x00\x00\x00\x00\x00\x00\x00\x02\x04p\x00\x08\xe0\x04\x00\x00\x00\x00\x00\x00\x00\x00\x00\x02\x04p\x00\x08\xe0\x06\x00\x00\x00\x00\x00\x00\x00\x00\x00\x02\x06\xf0\x00\r\xe0\x02\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x03\xf0\x00\x07\xe0\x02\x00\x00\x00\x00\x00\x00\x00\x00\x00\x04\x03\xf0\x00\x07\xe0\x02\x00\x00\x00\x00\x00\x00\x00\x00\x00\x04\x01\xe0\x00\x01\xc0\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x0c\x00\x00\xf0\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00\x00\xf0\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x0f\xc0\x000\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x1f\xe0\x00\x00\x00\x0f\x81\x80\x00\x00\x00\x00\x00\x00\x00\x00\x1f\xf0\x00\x00\x00\x1f\xc0\x80\x00\x00\x00\x00\x00\x00\x00\x00\x1f\xf0\x00\x00\x00\x1f\xe0\x80\x00\x00\x00\x00\x00\x00\x00\x00\x1f\xf0\x00\x00\x00\x1f\xe0\x80\x00\x00\x00\x00\x00\x00\x00\x00?\xf0\x01\xfe\x00\x1f\xe0\xc0\x00\x00\x00\x00\x00\x00\x00\x007\xe0\x03\xf3\x80\x1f\xe0\xc0\x00\x00\x00\x00\x00\x00\x00\x00#\xc0\x03\xc1\x80\x1f\xc0@\x00\x00\x00\x00\x00\x00\x00\x000\x00\x03\x80\x80\x0f\xc0@\x00\x00\x00\x00\x00\x00\x00\x00\x10\x00\x03\x00\xc0\x07\x00@\x00\x00\x00\x00\x00\x00\x00\x00\x10\x00\x03\x00\x80\x00\x00@\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00\x01\x81\x80\x00\x00`\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00\x01\xc7\x80\x00\x00 \x00\x00\x00\x00\x00\x00\x00\x00\x04\x00\x00\x7f\x00\x00\x00 \x00\x00\x00\x00\x00\x00\x00\x00\x02\x00\x00\x00\x00\x00\x00 \x00\x00\x00\x00\x00\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00 \x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x000\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x10\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x10\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x10\x00\x00\x00\x00\x00\x00\x00\x00\x02\x00\x00\x00\x00\x00\x00\x10\x00\x00\x00\x00\x00\x00\x00\x00\x02\x00\x00\x00\x00\x00\x00\x10\x00\x00\x00\x00\x00\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\x18\x00\x00\x00\x00"
-    )
-    fb = framebuf.FrameBuffer(buffer, 128, 64, framebuf.MONO_HLSB)
-
     oled.invert(0)
-    oled.blit(fb, 0, 0)
+    blit_image(oled, "pikachu", 0, 0)
     oled.show()
 
 
-def display_plane(oled):
-    # open image, put your image here
-    with open("plane-icon.pbm", "rb") as f:
-        f.readline()  # number
-        f.readline()  # Creator
-        f.readline()  # Dimensions
-        data = bytearray(f.read())
-
-    fb = framebuf.FrameBuffer(data, 128, 64, framebuf.MONO_HLSB)
+async def display_plane(oled):
+    # put your image here, loaded once and kept for the next flight
+    fb = assets.load("plane-icon")
+    if fb is None:
+        return  # no animation without the image
 
     oled.fill(0)
     for i in range(0, 112 * 2):
         # oled.invert(0)
         oled.blit(fb, 128 - i, 0)
         oled.show()
-        sleep_ms(6)
+        await sleep_ms(6)
 
 
+# Wait for the WiFi, at boot and when it's down on the second core
 def checkConnection():
-    global wlan, oled
-    display_pikachu(oled)
-    # Fill in your network name (ssid) and password here:
+    if wifi.connected():
+        return True
+    if _INSTRUMENT:
+        t = instrument.start()
+    if not DUAL_CORE:
+        # the other core owns the display
+        display_pikachu(oled)
     print("Check and reconnect WiFi")
-    attempts = 10
-    attempt = 1
-    while (wlan.isconnected() == False) and attempt < attempts:
-        print("Connect attempt " + str(attempt) + " of " + str(attempts))
-        try:
-            print("Attempt WiFi connect...")
-            wlan.connect(secrets["ssid"], secrets["password"])
-        except Exception as e:
-            print(e.__class__.__name__ + "----------------ERROR---------------")
-            print(e)
-        attempt += 1
-    if wlan.isconnected() == True:
+    connected = wifi.wait(WIFI_CONNECT_TIMEOUT * 1000)
+    if connected:
         print(f"Successfully connected. Status: {wlan.status()}")
     else:
-        print(f"Failed to connect. Status: {wlan.status()}")
+        print(f"Not connected yet. Status: {wlan.status()}")
+    print(wifi.report())
+    if _INSTRUMENT:
+        instrument.stop(instrument.WIFI, t)
+    return connected
+
+
+# A request failed: only a lost link means reconnecting, a DNS, TLS or server
+# problem with the WiFi up leaves the connection alone
+def network_error(e):
+    kind = wifi.failed(e)
+    print("Request failed: " + kind)
+    if kind == "link" and not DUAL_CORE:
+        display_pikachu(oled)
+
+
+# Poller task: the flight found and its search result row, None if there isn't one
+def poll():
+    global last_found
+    wifi.step()
+    if not wifi.connected() and DUAL_CORE:
+        checkConnection()  # this core can wait for it
+    if not wifi.connected():
+        # reconnecting, keep showing what's on the display
+        return last_found
+    flight_id = get_flights_from_proxy() if PROXY_URL else get_flights()
+    if ADAPTIVE_POLLING and not (PROXY_URL and DUAL_CORE):  # else the proxy sets the pace
+        if ranked_flights is None:
+            scheduler.retry()
+        else:
+            scheduler.update(flights, ranked_flights, flights.newest(), ranked_by)
+        print(scheduler.report())
+    if cache.save():
+        print(cache.report())
+        if prefetching():
+            print(prefetcher.report())
+    if _INSTRUMENT:
+        instrument.log(INSTRUMENT_LOG_PERIOD * 1000)
+    if history_log:
+        if flight_id:
+            history_log.closer(flight_id, flight_distance)
+        history_log.tick()
+    if flight_id:
+        if LIVE_POSITION:
+            reckoner.update(flight_id, flight_row)
+        if mini_map and flight_id == minimap.flight_id:
+            minimap.add(flight_row[1], flight_row[2])
+        last_found = (flight_id, flight_row)
+    else:
+        last_found = None
+    return last_found
+
+
+# Fetcher task: display lines for a new flight, from the cache if it was seen lately
+def details(flight_id, row):
+    if history_log:
+        history_log.add(flight_id, row, flight_distance)
+    alias = flight_alias(row)
+    lines = cache.get(flight_id, alias)
+    if lines and prefetching() and prefetcher.shown(flight_id):
+        print("New flight " + flight_id + " found, details prefetched")
+    elif lines:
+        print("Flight " + flight_id + " seen before, details from the cache")
+        print(cache.report())
+    else:
+        print("New flight " + flight_id + " found, loading details")
+        lines = load_details(flight_id, row, mini_map)
+        if lines:
+            cache.put(flight_id, lines, alias)
+    if lines:
+        show_trail(flight_id, row)
+    return lines
+
+
+# Put a new flight on the mini-map, its trail is there already if loading its details
+# drew it, else it's asked for with MAP_TRAIL_REQUEST or starts from here
+def show_trail(flight_id, row):
+    if not mini_map:
+        return
+    if minimap.flight_id != flight_id and not (MAP_TRAIL_REQUEST and get_flight_trail(flight_id)):
+        trail_map.start(flight_id)
+        show_map(trail_map)
+    minimap.add(row[1], row[2])
+
+
+# Prefetcher: lines for a flight that may be shown next, while the WiFi is up.
+# No loading plane, the page that's up stays.
+def prefetch_details(flight_id, row):
+    if not wifi.connected():
+        return False
+    return parse_feed_row(row) or get_flight_details(flight_id)
+
+
+def store_prefetched(flight_id, row, lines):
+    cache.put(flight_id, lines, flight_alias(row))
+
+
+def prefetched(flight_id, row):
+    return cache.has(flight_id, flight_alias(row))
+
+
+def prefetching():
+    return PREFETCH_FLIGHTS and not PROXY_URL
+
+
+# Registration and route, the same flight under another fr24 ID has the same ones
+def flight_alias(row):
+    try:
+        if row[ROW_REGISTRATION]:
+            return row[ROW_REGISTRATION] + " " + row[ROW_ORIGIN] + "-" + row[ROW_DESTINATION]
+    except (IndexError, TypeError):
+        pass
+    return None
+
+
+# Display lines from the name tables if they know the flight, otherwise from the
+# flight details, or what the proxy sent. trail loads the flight's trail into the
+# mini-map with the details, if they have to be asked for.
+def load_details(flight_id, row, trail=False):
+    if PROXY_URL:
+        if proxy_details and proxy_details[0] == flight_id and proxy_details[1]:
+            return parse_details_json(proxy_details[1])
+        return False
+    if _INSTRUMENT:
+        t = instrument.start()
+        lines = parse_feed_row(row)
+        if lines:
+            instrument.stop(instrument.PARSE, t)
+            return lines
+        return fetch_details(flight_id, trail)
+    return parse_feed_row(row) or fetch_details(flight_id, trail)
+
+
+# get_flight_details, with the plane going round the display while it waits on one core
+def fetch_details(flight_id, trail):
+    if not (LOADING_PLANE and not DUAL_CORE and loading_plane()):
+        return get_flight_details(flight_id, trail)
+    try:
+        return get_flight_details(flight_id, trail)
+    finally:
+        oled.hw_scroll_stop()  # back to what was on the display
+
+
+# Start the plane picture scrolling in the display RAM, False without a picture
+# that can go there as it is
+def loading_plane():
+    image = assets.load("plane-icon")
+    if image is None or image.width != 128 or image.height != 64 or image.format != framebuf.MONO_VLSB:
+        return False
+    oled.hw_scroll_picture(image.buffer, 0, 7, LOADING_PLANE_FRAMES)
+    return True
+
+
+# Renderer task: show a flight, or blank the display when a flight is no longer found
+async def render(flight, new):
+    global view_zone
+    reckoner.visible = False
+    minimap.visible = False
+    if not flight:
+        reckoner.clear()
+        if _INSTRUMENT:
+            print("No flights found, show the stage timings")
+            instrument.draw(oled)
+            return
+        print("No flights found, clear display")
+        oled.fill(0)
+        oled.show()
+        return
+    flight_id, lines = flight
+    zone = flight_zone[1] if flight_zone[0] == flight_id else None
+    if flight_id != view.flight_id or zone is not view_zone:
+        view_zone = zone
+        view.load(flight_id, lines, zone.label if zone else None)
+        marquee.reset(flight_id)
+    if new:
+        print("Showing new flight " + flight_id)
+        await display_plane(oled)
+    else:
+        print("Same flight found, so keep showing it")
+    await display_flight(oled)
+
+
+# Keeps the live position line under the flight ID, and the flight on the mini-map,
+# up to date. Skipped while the display is scrolling a line by itself, updating
+# the display would stop it.
+async def live_position():
+    while True:
+        await sleep_ms(1000)
+        if reckoner.visible and reckoner.fix and not oled.scrolling:
+            draw_live(oled)
+        elif minimap.visible and reckoner.fix:
+            draw_map(oled)
+            oled.show()
 
 
-# Blank the display when a flight is no longer found
-def clear_flight():
-    global line1, line2, line3
-    line1 = line2 = line3 = ""
+# The main loop: poll, details and display tasks, plus the live position line
+def main_loop(period):
+    run = tasks.run_dual if DUAL_CORE else tasks.run
+    others = (live_position(),) if LIVE_POSITION else ()
+    if not DUAL_CORE:
+        others += (wifi.run(),)  # on two cores poll() looks after the WiFi
+    if DUAL_CORE:
+        # the network core prefetches between polls
+        return run(poll, details, render, period, others=others, idle=prefetcher.work if prefetching() else None)
+    return run(poll, details, render, period, others=others)
 
 
 # Connect to network
 wlan = network.WLAN(network.STA_IF)
 wlan.active(True)
-
-# text strings to go in the lines
-line1_short = ""
-line1_long = ""
-line2_short = ""
-line2_long = ""
-line3_short = ""
-line3_long = ""
-
-line1 = ""
-line2 = ""
-line3 = ""
+wifi = WiFi(wlan, secrets["ssid"], secrets["password"], WIFI_CACHE_FILE, secrets.get("ifconfig"), WIFI_REUSE_IP)
+last_found = None  # what the last poll found
+fr24 = HTTPClient(FR24_URL)
+if PROXY_URL:
+    proxy = HTTPClient(PROXY_URL, PROXY_WAIT + 10)
+    PROXY_PATH = (
+        "/flight?bounds="
+        + BOUNDS_BOX
+        + "&home="
+        + ",".join(str(v) for v in HOME)
+        + "&by="
+        + NEAREST_BY
+        + "&min_alt="
+        + str(MIN_ALTITUDE)
+        + "&max_alt="
+        + str(MAX_ALTITUDE)
+        + "&ground="
+        + ("1" if SHOW_ON_GROUND else "0")
+        + "&limit="
+        + str(FLIGHT_LIMIT)
+    )
+proxy_version = -1  # version of the proxy's answer we have
+proxy_failures = 0  # requests to the proxy failed in a row
+proxy_details = None  # (flight_id, detail fields) from the proxy
+
+# Name tables, None when they haven't been copied to the board
+if OFFLINE_LOOKUP:
+    airports = lookup.open_table(AIRPORTS_TABLE)
+    airlines = lookup.open_table(AIRLINES_TABLE)
+    aircraft = lookup.open_table(AIRCRAFT_TABLE)
+else:
+    airports = airlines = aircraft = None
+flights = FlightTable(FLIGHT_LIMIT)
+flight_row = None
+flight_count = 0
+flight_distance = 0
+ranked_flights = None
+ranked_by = NEAREST_BY
+# With ZONES, the grid that puts flights in them, and the zone of the flight found
+if ZONES:
+    for zone in ZONES:
+        zone.defaults(NEAREST_BY, MIN_ALTITUDE, MAX_ALTITUDE, SHOW_ON_GROUND)
+    zone_index = ZoneIndex(ZONES, FLIGHT_LIMIT)
+else:
+    zone_index = None
+flight_zone = (None, None)  # (flight_id, zone)
+view_zone = None  # the zone of the flight on screen
+reckoner = DeadReckoner(HOME)
+mini_map = MINI_MAP and not PROXY_URL
+minimap = MiniMap(HOME, BOUNDS_BOX, MAP_WIDTH, 64, MAP_TRAIL_POINTS, [z.polygon for z in ZONES] if ZONES else ())
+# trails load into a map of their own on the network core, where the display core can't see them half drawn
+if mini_map and DUAL_CORE:
+    trail_map = MiniMap(HOME, BOUNDS_BOX, MAP_WIDTH, 64, MAP_TRAIL_POINTS, [z.polygon for z in ZONES] if ZONES else ())
+else:
+    trail_map = minimap
+cache = DetailsCache(DETAILS_CACHE_BYTES, DETAILS_CACHE_TTL, DETAILS_CACHE_FILE, DETAILS_CACHE_SAVE_PERIOD)
+cache.load()
+prefetcher = Prefetcher(prefetch_details, store_prefetched, prefetched, PREFETCH_FLIGHTS)
+history_log = history.open_history(HISTORY_FILE, HISTORY_SIZE, HISTORY_FLUSH_PERIOD) if HISTORY_FILE else None
+scheduler = PollScheduler(BOUNDS_BOX, HOME, QUERY_DELAY, MIN_QUERY_DELAY, MAX_QUERY_DELAY)
+# What's shown of the flight on screen, and its long lines rendered for scrolling
+view = FlightView(LONG_LINE_CHARS)
+marquee = Marquee(3, LONG_LINE_CHARS)
 
 spi = SPI(0, 100000, mosi=Pin(19), sck=Pin(18))
 # oled = SSD1306_SPI(WIDTH, HEIGHT, spi, dc,rst, cs) use GPIO PIN NUMBERS
 oled = SSD1306_SPI(128, 64, spi, Pin(17), Pin(20), Pin(16))
+if _INSTRUMENT:
+    instrument.wrap(oled, "show", instrument.SHOW)
 
-oled.fill(0)
-display_logo(oled)
-sleep(2)
+if __name__ == "__main__":
+    oled.fill(0)
+    display_logo(oled)
+    sleep(2)
 
-checkConnection()
-last_flight = ""
+    checkConnection()
 
-while True:
     try:
-        flight_id = get_flights()
-
-        if flight_id:
-            if flight_id == last_flight:
-                print("Same flight found, so keep showing it")
-                display_flight(oled)
-            else:
-                print("New flight " + flight_id + " found, clear display")
-                clear_flight()
-                if get_flight_details(flight_id):
-                    display_plane(oled)
-                    display_flight(oled)
-                else:
-                    print("error loading details, skip displaying this flight")
-
-                last_flight = flight_id
-        else:
-            print("No flights found, clear display")
-            clear_flight()
-            oled.fill(0)
-            oled.show()
-
-        print("Going to sleep for a while...")
-        sleep(5)
-        for i in range(0, QUERY_DELAY, +5):
-            sleep(5)
+        period = scheduler.next_delay if ADAPTIVE_POLLING else QUERY_DELAY
+        if ADAPTIVE_POLLING:
+            print(scheduler.limit())
+        if PROXY_URL and DUAL_CORE:
+            period = proxy_delay  # the proxy holds each request until there's news
+        asyncio.run(main_loop(period))
     except KeyboardInterrupt as ke:
         print(ke.__class__.__name__ + "-------------FORCE-TERMINATING-------------")
+        if history_log:
+            history_log.close()
         oled.fill(0)
         oled.show()
-        break
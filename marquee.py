@@ -0,0 +1,51 @@
+# Pre-rendered marquee strips for lines too long for the display
+#
+# Each long line is rasterized once into its own MONO_VLSB buffer, the same
+# format as the display, so a scroll frame is a single blit of the strip
+# instead of drawing every glyph of the line again. The strips are allocated
+# up front at their full capacity and drawn over when the flight changes.
+import framebuf
+
+
+class Strip(framebuf.FrameBuffer):
+    # room for `chars` characters. width/height are the whole strip's, so
+    # SSD1306.blit marks all the columns the blit writes, text_width is how much
+    # of it the text covers.
+    def __init__(self, chars):
+        self.width = chars * 8
+        self.height = 8
+        self.text_width = 0
+        self.buffer = bytearray(chars * 8)  # one byte per 8 pixel column
+        super().__init__(self.buffer, chars * 8, 8, framebuf.MONO_VLSB)
+
+    # Draw a line over it, a str or a screentext.TextLine
+    def set(self, line):
+        self.fill(0)
+        if isinstance(line, str):
+            self.text(line, 0, 0)
+            self.text_width = min(len(line) * 8, self.width)
+        else:
+            line.draw(self, 0, 0, self.width)
+            self.text_width = min(line.n * 8, self.width)
+
+
+# Strips for the flight on screen, one per display line, redrawn when it changes
+class Marquee:
+    def __init__(self, lines=3, chars=96):
+        self.key = None
+        self.strips = tuple(Strip(chars) for _ in range(lines))
+        self.drawn = bytearray(lines)  # 1 once a strip has the current flight's line
+
+    def reset(self, key):
+        if key != self.key:
+            self.key = key
+            for i in range(len(self.drawn)):
+                self.drawn[i] = 0
+
+    # The strip of display line i, showing text
+    def strip(self, i, text):
+        strip = self.strips[i]
+        if not self.drawn[i]:
+            strip.set(text)
+            self.drawn[i] = 1
+        return strip
@@ -0,0 +1,161 @@
+# A small map of the search box with the shown flight's track on it
+#
+# The map lives in its own framebuffer, a corner's worth of the display, that
+# the renderer blits over the display. It gets the box edges and home when a
+# flight starts, then one line per position: the trail points as they stream
+# in from the flight details (newest first, see point()), and each new position
+# a poll brings. Nothing is ever redrawn, and no trail point is kept besides the
+# last one, so the trail costs the same few hundred bytes however long it is.
+#
+# Positions go to metres east and north of home the same way deadreckon.py does
+# it and from there to pixels with one multiply and shift, all in integers. A
+# point that lands within a pixel of the last one drawn is skipped, that's the
+# downsampling, and a trail stops after max_points points or when it leaves
+# the box: older points wouldn't be on the map. Zones (see zones.py) are drawn
+# as outlines with the box.
+#
+# With DUAL_CORE the network core changes the map while the display core draws
+# it. A trail streams into a second map nobody draws, take() then copies it over
+# the shown one; take(), add() and draw() hold the map's lock, only for a copy
+# or a line, never for a request.
+import math
+
+import _thread
+
+from assets import Image
+from deadreckon import UDEG_M
+
+SHIFT = 16  # fixed point pixels per metre
+
+
+class MiniMap:
+    # home is (lat, lon, altitude), bounds the BOUNDS_BOX string
+    # "top,bottom,left,right", width by height pixels, outlines polygons of
+    # (lat, lon) corners to draw
+    def __init__(self, home, bounds, width=56, height=64, max_points=48, outlines=()):
+        self.width = width
+        self.height = height
+        self.max_points = max_points
+        self.buffer = bytearray((height + 7) // 8 * width)
+        self.fb = Image(self.buffer, width, height)  # blit sends only the map's columns
+        self.home_lat = int(home[0] * 1000000)
+        self.home_lon = int(home[1] * 1000000)
+        self.lon_scale = int(math.cos(math.radians(home[0])) * 16384 + 0.5)
+        top, bottom, left, right = (float(v) for v in bounds.split(","))
+        # box edges in metres from home
+        self.east0, self.north0 = self.metres(top, left)
+        self.east1, self.north1 = self.metres(bottom, right)
+        box_w = self.east1 - self.east0
+        box_h = self.north0 - self.north1
+        # the same scale both ways, the box in the middle
+        self.scale = min(((width - 1) << SHIFT) // box_w, ((height - 1) << SHIFT) // box_h)
+        self.x0 = (width - 1 - (box_w * self.scale >> SHIFT)) // 2
+        self.y0 = (height - 1 - (box_h * self.scale >> SHIFT)) // 2
+        # the outlines' corners in pixels, worked out once
+        self.outlines = [[self.pixel(*self.metres(lat, lon)) for lat, lon in o] for o in outlines]
+        self.flight_id = None
+        self.head = None  # (x, y) of the newest position
+        self.last = None  # (x, y) of the last trail point drawn
+        self.points = 0
+        self._lat = 0
+        self.visible = False  # the display is showing the map
+        self.lock = _thread.allocate_lock()
+
+    # (east, north) in m from home of a position
+    def metres(self, lat, lon):
+        north = (int(lat * 1000000) - self.home_lat) * UDEG_M // 10000
+        east = ((int(lon * 1000000) - self.home_lon) * UDEG_M // 10000) * self.lon_scale >> 14
+        return east, north
+
+    def inside(self, east, north):
+        return self.east0 <= east <= self.east1 and self.north1 <= north <= self.north0
+
+    # Pixel of a point east, north m from home, None when it's outside the box
+    def pixel(self, east, north):
+        if not self.inside(east, north):
+            return None
+        return (
+            self.x0 + ((east - self.east0) * self.scale >> SHIFT),
+            self.y0 + ((self.north0 - north) * self.scale >> SHIFT),
+        )
+
+    # A new flight: clear the map, draw the box and home
+    def start(self, flight_id):
+        fb = self.fb
+        fb.fill(0)
+        x0, y0 = self.pixel(self.east0, self.north0)
+        x1, y1 = self.pixel(self.east1, self.north1)
+        fb.rect(x0, y0, x1 - x0 + 1, y1 - y0 + 1, 1)
+        for corners in self.outlines:
+            last = corners[-1]
+            for xy in corners:
+                if last and xy:
+                    fb.line(last[0], last[1], xy[0], xy[1], 1)
+                last = xy
+        home = self.pixel(0, 0)
+        if home:
+            x, y = home
+            fb.hline(x - 2, y, 5, 1)
+            fb.vline(x, y - 2, 5, 1)
+        self.flight_id = flight_id
+        self.head = None
+        self.last = None
+        self.points = 0
+
+    # jsonstream each() for ("trail", ANY, "lat") and ("trail", ANY, "lng"), fr24
+    # sends lat before lng in each point. True stops the trail.
+    def point(self, path, value):
+        if path[2] == "lat":
+            self._lat = value
+            return False
+        xy = self.pixel(*self.metres(self._lat, value))
+        if not xy:
+            return self.last is not None  # it left the box
+        last = self.last
+        if last is None:
+            self.head = xy
+        elif abs(xy[0] - last[0]) <= 1 and abs(xy[1] - last[1]) <= 1:
+            return False
+        else:
+            self.fb.line(last[0], last[1], xy[0], xy[1], 1)
+        self.last = xy
+        self.points += 1
+        return self.points >= self.max_points
+
+    # Copy the map other loaded, for the same box and size
+    def take(self, other):
+        with self.lock:
+            self.buffer[:] = other.buffer
+            self.flight_id = other.flight_id
+            self.head = other.head
+            self.last = other.last
+            self.points = other.points
+
+    # A new position from a poll, drawn on from the newest one
+    def add(self, lat, lon):
+        xy = self.pixel(*self.metres(lat, lon))
+        if not xy:
+            return
+        with self.lock:
+            head = self.head
+            if head:
+                self.fb.line(head[0], head[1], xy[0], xy[1], 1)
+            else:
+                self.fb.pixel(xy[0], xy[1], 1)
+            self.head = xy
+            if self.last is None:
+                self.last = xy
+
+    # Put the map at x, y on the display, with the flight at east, north m from
+    # home (the newest position if None). Allocates nothing.
+    def draw(self, oled, x, y, east=None, north=None):
+        with self.lock:
+            oled.blit(self.fb, x, y)
+            head = self.head
+        if east is None:
+            if head:
+                oled.fill_rect(x + head[0] - 1, y + head[1] - 1, 3, 3, 1)
+        elif self.inside(east, north):
+            x += self.x0 + ((east - self.east0) * self.scale >> SHIFT)
+            y += self.y0 + ((self.north0 - north) * self.scale >> SHIFT)
+            oled.fill_rect(x - 1, y - 1, 3, 3, 1)
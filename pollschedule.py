@@ -0,0 +1,170 @@
+# Adaptive poll scheduling
+#
+# Instead of polling fr24 every QUERY_DELAY seconds no matter what, the next poll
+# is planned from every flight the last one saw, each moved on along its track at
+# its ground speed from the time of its row:
+#  - poll again just after the flight shown is predicted to leave the box, or
+#    just after another flight that may be shown is predicted to come closer to
+#    home than it (when the nearest is by distance), whichever comes first. A
+#    busy sky has more flights to come closer, so it's polled more often.
+#  - otherwise after the base delay, a new flight can turn up at any time
+#  - empty box: the delay doubles each empty poll, up to max_delay. A flight that
+#    crosses the box in less time than that can be missed while it's empty, so
+#    max_delay is cut to half the time a fast_speed jet takes to cross the box
+#    the short way, but not below the base delay. limit() says if it was cut.
+import math
+
+# Degrees of latitude per second at one knot
+KNOT_DEG_S = 1852 / 3600 / 111320
+
+
+# bounds is the BOUNDS_BOX string "top,bottom,left,right"
+def parse_bounds(bounds):
+    top, bottom, left, right = (float(v) for v in bounds.split(","))
+    return top, bottom, left, right
+
+
+# Seconds until a flight at lat, lon leaves the box, None if it isn't moving
+def time_to_exit(lat, lon, track, speed, box):
+    top, bottom, left, right = box
+    if not speed:
+        return None
+    track = math.radians(track)
+    v_lat = speed * KNOT_DEG_S * math.cos(track)
+    v_lon = speed * KNOT_DEG_S * math.sin(track) / max(math.cos(math.radians(lat)), 0.01)
+    t = 1e9
+    if v_lat > 0:
+        t = min(t, (top - lat) / v_lat)
+    elif v_lat < 0:
+        t = min(t, (bottom - lat) / v_lat)
+    if v_lon > 0:
+        t = min(t, (right - lon) / v_lon)
+    elif v_lon < 0:
+        t = min(t, (left - lon) / v_lon)
+    return max(t, 0)
+
+
+# Smallest t > 0 where a*t*t + b*t + c = 0, None if there's none
+def first_root(a, b, c):
+    if abs(a) < 1e-18:
+        if b < 0:
+            return -c / b
+        return None
+    disc = b * b - 4 * a * c
+    if disc < 0:
+        return None
+    disc = math.sqrt(disc)
+    first = None
+    for t in ((-b - disc) / (2 * a), (-b + disc) / (2 * a)):
+        if t > 0 and (first is None or t < first):
+            first = t
+    return first
+
+
+class PollScheduler:
+    # home is (lat, lon, altitude), bounds the BOUNDS_BOX string
+    def __init__(self, bounds, home, base_delay, min_delay=5, max_delay=240, fast_speed=480):
+        self.box = parse_bounds(bounds)
+        self.home_lat = home[0]
+        self.home_lon = home[1]
+        self.shrink = math.cos(math.radians(home[0]))
+        self.base_delay = base_delay
+        self.min_delay = min_delay
+        top, bottom, left, right = self.box
+        narrowest = min(top - bottom, (right - left) * self.shrink)
+        self.crossing_time = narrowest / (fast_speed * KNOT_DEG_S)
+        self.max_delay = max(min(max_delay, int(self.crossing_time / 2)), base_delay)
+        self.delay = base_delay
+        self.reason = "start"
+        self.empty_polls = 0
+
+    # Flight i of a FlightTable now seconds since the epoch: where it is and where it's
+    # going, as (x, y, vx, vy) in degrees of latitude east and north of home, per
+    # second for the speed
+    def motion(self, flights, i, now):
+        track = math.radians(flights.track[i])
+        speed = flights.speed[i] * KNOT_DEG_S
+        vx = speed * math.sin(track)
+        vy = speed * math.cos(track)
+        age = now - flights.time[i] if now and flights.time[i] else 0
+        x = (flights.lon[i] - self.home_lon) * self.shrink + vx * age
+        y = flights.lat[i] - self.home_lat + vy * age
+        return x, y, vx, vy
+
+    # Seconds until flight i leaves the box
+    def exit_time(self, flights, i, now):
+        x, y, vx, vy = self.motion(flights, i, now)
+        return time_to_exit(
+            self.home_lat + y, self.home_lon + x / self.shrink, flights.track[i], flights.speed[i], self.box
+        )
+
+    # Plan the next poll from the last one: the flights it found, the ones that may
+    # be shown, nearest first (ranked[0] is shown), and the time of the newest row
+    # in seconds since the epoch, fr24's clock. by is how the nearest was picked.
+    # Returns the delay in seconds.
+    def update(self, flights, ranked, now, by="distance"):
+        if not flights.count:
+            self.empty_polls += 1
+            delay = min(self.base_delay * 2 ** (self.empty_polls - 1), self.max_delay)
+            self.reason = "empty x" + str(self.empty_polls)
+        else:
+            self.empty_polls = 0
+            delay = self.base_delay
+            self.reason = "base"
+            if ranked:
+                shown = ranked[0]
+                exit_in = self.exit_time(flights, shown, now)
+                if exit_in is not None and exit_in + 1 < delay:
+                    delay = exit_in + 1
+                    self.reason = "exits in " + str(int(exit_in)) + "s"
+                if by == "distance":
+                    closer = self.closer_time(flights, ranked, now, delay - 1)
+                    if closer is not None:
+                        delay = closer + 1
+                        self.reason = "closer in " + str(int(closer)) + "s"
+        self.delay = max(self.min_delay, int(delay))
+        return self.delay
+
+    # The last request failed, try again after the base delay
+    def retry(self):
+        self.delay = self.base_delay
+        self.reason = "request failed"
+        return self.delay
+
+    # Seconds until one of ranked[1:] comes closer to home than ranked[0], the first
+    # before limit and while it's still in the box, None if none does
+    def closer_time(self, flights, ranked, now, limit):
+        x, y, vx, vy = self.motion(flights, ranked[0], now)
+        p2 = x * x + y * y
+        v2 = vx * vx + vy * vy
+        pv = x * vx + y * vy
+        first = None
+        for j in ranked[1:]:
+            jx, jy, jvx, jvy = self.motion(flights, j, now)
+            # |j(t)|^2 - |shown(t)|^2, a quadratic in t, positive now
+            t = first_root(
+                jvx * jvx + jvy * jvy - v2, 2 * (jx * jvx + jy * jvy - pv), jx * jx + jy * jy - p2
+            )
+            if t is None or t >= limit or (first is not None and t >= first):
+                continue
+            exit_in = self.exit_time(flights, j, now)
+            if exit_in is None or t < exit_in:
+                first = t
+        return first
+
+    # For the poller, which asks before every wait
+    def next_delay(self):
+        return self.delay
+
+    # What the schedule does while the box is empty, for the log at startup
+    def limit(self):
+        return (
+            "Empty box polls back off to "
+            + str(self.max_delay)
+            + "s, a fast jet crosses the box in "
+            + str(int(self.crossing_time))
+            + "s"
+        )
+
+    def report(self):
+        return "Next poll in " + str(self.delay) + "s (" + self.reason + ")"
@@ -0,0 +1,118 @@
+# Loads the display lines of the flights likely to be shown next, before they are
+#
+# Each poll ranks the flights in the box by how close they are to home. The one
+# shown gets its details the usual way, the next few are handed to plan(), and
+# the prefetcher loads their lines in the background with fetch(flight_id, row)
+# and hands them to store(flight_id, row, lines), so when one of them becomes
+# the nearest its lines are already in the details cache.
+#
+# A flight that drops out of the next plan is cancelled: if it's still waiting
+# it's never fetched, if its fetch is already running (a request can't be
+# stopped halfway) the lines are thrown away instead of stored.
+#
+# A fetch blocks until its request is done, so one runs at a time, and only where
+# it holds nothing up:
+#  - on the second core of DUAL_CORE, work(ms) fetches one flight after the other
+#    in the time between two polls, while the display runs on the first core
+#  - on one core, pause(ms) is a pause in the display's animation (the page stands
+#    still anyway). It starts a fetch only if fetches lately took less than what's
+#    left of the pause, then sleeps the rest.
+from time import sleep
+
+from tasks import sleep_ms, ticks_diff, ticks_ms
+
+
+class Prefetcher:
+    # fetch(flight_id, row) returns lines or False, local(flight_id, row) says if a
+    # flight's lines are already at hand. fetch_ms is what a fetch is expected to
+    # take until one was timed.
+    def __init__(self, fetch, store, local, size=3, fetch_ms=2000):
+        self.fetch = fetch
+        self.store = store
+        self.local = local
+        self.size = size
+        self.fetch_ms = fetch_ms
+        self.min_fetch_ms = fetch_ms // 4  # a quick one from the name tables doesn't count for all
+        self.waiting = []  # (flight_id, row) to fetch, most likely next first
+        self.planned = ()  # flight IDs of the last plan
+        self.ready = set()  # flight IDs stored and not shown yet
+        # metrics
+        self.fetched = 0
+        self.used = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    # The flights to have ready, most likely next first, as (flight_id, row), and
+    # the flight about to be shown
+    def plan(self, candidates, nearest=None):
+        candidates = candidates[: self.size]
+        planned = tuple(c[0] for c in candidates)
+        for flight_id, row in self.waiting:
+            if flight_id not in planned:
+                self.cancelled += 1
+        for flight_id in list(self.ready):
+            if flight_id not in planned and flight_id != nearest:
+                self.ready.discard(flight_id)  # it left the box
+        self.planned = planned
+        self.waiting = [c for c in candidates if c[0] not in self.ready and not self.local(c[0], c[1])]
+
+    # A flight is being shown, True if its lines came from a prefetch
+    def shown(self, flight_id):
+        if flight_id not in self.ready:
+            return False
+        self.ready.discard(flight_id)
+        self.used += 1
+        return True
+
+    # Fetch the first waiting flight, False when there's nothing to do
+    def step(self):
+        if not self.waiting:
+            return False
+        flight_id, row = self.waiting.pop(0)
+        start = ticks_ms()
+        lines = self.fetch(flight_id, row)
+        took = ticks_diff(ticks_ms(), start)
+        # the slowest lately, slowly forgotten
+        self.fetch_ms = max(took, self.min_fetch_ms, (3 * self.fetch_ms + took) // 4)
+        if not lines:
+            self.failed += 1
+        elif flight_id not in self.planned:
+            self.cancelled += 1  # it left while the request ran
+        else:
+            self.fetched += 1
+            self.ready.add(flight_id)
+            self.store(flight_id, row, lines)
+        return True
+
+    # Blocking: fetch for up to ms, then sleep what's left of it
+    def work(self, ms):
+        start = ticks_ms()
+        while ticks_diff(ticks_ms(), start) < ms and self.step():
+            pass
+        left = ms - ticks_diff(ticks_ms(), start)
+        if left > 0:
+            sleep(left / 1000)
+
+    # A pause of ms in the display on one core: fetch while one fits in it
+    async def pause(self, ms):
+        start = ticks_ms()
+        while self.waiting and ms - ticks_diff(ticks_ms(), start) >= self.fetch_ms:
+            self.step()
+        left = ms - ticks_diff(ticks_ms(), start)
+        if left > 0:
+            await sleep_ms(left)
+
+    def report(self):
+        return (
+            "Prefetch: "
+            + str(self.fetched)
+            + " fetched, "
+            + str(self.used)
+            + " shown, "
+            + str(self.cancelled)
+            + " cancelled, "
+            + str(self.failed)
+            + " failed, "
+            + str(len(self.waiting))
+            + " waiting"
+        )
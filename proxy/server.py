@@ -0,0 +1,274 @@
+# LAN proxy for several displays in one place, runs on any computer with Python 3
+#
+# Each display asks the proxy instead of fr24. The proxy polls the feed once per
+# area (every --interval seconds, for as long as some display asks about it),
+# looks up the details of each flight once, and answers every display with one
+# small JSON object: the flight nearest to that display's home, its feed row and
+# just the detail fields main.py uses, instead of a 25 KB details document.
+#
+#   GET /flight?bounds=13.3,12.6,77.3,78.0&home=13.1,77.6,900&since=41&wait=20
+#
+#   {"v": 42, "n": 3, "id": "30c44fdc", "row": [...], "details": {...}}
+#   {"v": 43, "n": 0, "id": null}
+#
+# v is the area's version, it goes up whenever a poll brings something new. With
+# since set to the version a display already has, the request waits (long poll)
+# up to wait seconds for the next one, so displays hear about a new flight as
+# soon as the proxy does. The other options match main.py's settings: by
+# (distance or elevation), min_alt, max_alt, ground (1 to include flights on
+# the ground) and limit.
+#
+#   python proxy/server.py --port 8024
+#   python proxy/server.py --upstream http://127.0.0.1:8000   # a stand-in, see host/
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import jsonstream  # noqa: E402
+from flighttable import FlightTable, box_centre, parse_home  # noqa: E402
+
+UPSTREAM = "https://data-live.flightradar24.com"
+FLIGHT_SEARCH_HEAD = "/zones/fcgi/feed.js?bounds="
+FLIGHT_SEARCH_TAIL = "&faa=1&satellite=1&mlat=1&flarm=1&adsb=1&gnd=1&air=1&vehicles=0&estimated=0&maxage=14400&gliders=0&stats=0&ems=1&limit="
+FLIGHT_LONG_DETAILS_HEAD = "/clickhandler/?version=1.5&notrail=true&flight="
+request_headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0",
+    "cache-control": "no-store, no-cache, must-revalidate, post-check=0, pre-check=0",
+    "accept": "application/json",
+}
+# Same as main.DETAILS_PATHS, the fields parse_details_json reads
+DETAILS_PATHS = (
+    ("identification", "number", "default"),
+    ("identification", "callsign"),
+    ("aircraft", "model", "code"),
+    ("aircraft", "model", "text"),
+    ("airline", "name"),
+    ("airport", "origin", "name"),
+    ("airport", "origin", "code", "iata"),
+    ("airport", "destination", "name"),
+    ("airport", "destination", "code", "iata"),
+)
+FEED_LIMIT = 100
+AREA_IDLE = 300  # s without a display asking before an area isn't polled any more
+DETAILS_TTL = 3 * 3600
+
+
+class Area:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.version = 0
+        self.feed = None  # last decoded feed response
+        self.body = None  # and its raw bytes, to tell if anything changed
+        self.polled = 0
+        self.asked = time.monotonic()
+        self.changed = threading.Condition()
+        self.polling = threading.Lock()
+
+
+class Proxy:
+    def __init__(self, upstream=UPSTREAM, interval=10):
+        self.upstream = upstream.rstrip("/")
+        self.interval = interval
+        self.areas = {}
+        self.details = {}  # flight_id: (fields, time fetched)
+        self.pruned = time.monotonic()  # when old details were last dropped
+        self.lock = threading.Lock()
+        self.details_lock = threading.Lock()  # one details request at a time, so none is made twice
+        self.upstream_requests = 0
+        self.device_requests = 0
+        self.bytes_served = 0
+        self.server = None
+        self.running = False
+
+    def fetch(self, path):
+        request = urllib.request.Request(self.upstream + path, headers=request_headers)
+        with self.lock:
+            self.upstream_requests += 1
+        with urllib.request.urlopen(request, timeout=15) as response:
+            return response.read()
+
+    # first: only if the area hasn't been polled yet, for displays asking at the same time
+    def poll_area(self, area, first=False):
+        with area.polling:
+            if first and area.polled:
+                return
+            try:
+                body = self.fetch(FLIGHT_SEARCH_HEAD + area.bounds + FLIGHT_SEARCH_TAIL + str(FEED_LIMIT))
+                feed = json.loads(body)
+            except (OSError, ValueError) as e:
+                print("Feed for " + area.bounds + " failed: " + str(e))
+                return
+            finally:
+                area.polled = time.monotonic()
+        with area.changed:
+            if body != area.body:
+                area.body = body
+                area.feed = feed
+                area.version += 1
+                area.changed.notify_all()
+
+    # The detail fields main.py needs for a flight, looked up once
+    def flight_details(self, flight_id):
+        with self.details_lock:
+            cached = self.details.get(flight_id)
+            if cached and time.monotonic() - cached[1] < DETAILS_TTL:
+                return cached[0]
+            try:
+                body = self.fetch(FLIGHT_LONG_DETAILS_HEAD + flight_id)
+            except OSError as e:
+                print("Details for " + flight_id + " failed: " + str(e))
+                return None
+            fields = jsonstream.extract(io.BytesIO(body), DETAILS_PATHS)
+            self.details[flight_id] = (fields, time.monotonic())
+            return fields
+
+    def area(self, bounds):
+        with self.lock:
+            area = self.areas.get(bounds)
+            if area is None:
+                area = self.areas[bounds] = Area(bounds)
+            area.asked = time.monotonic()
+        if not area.polled:
+            self.poll_area(area, first=True)
+        return area
+
+    # Poll every area displays still ask about, drop the others
+    def poll_loop(self):
+        while self.running:
+            now = time.monotonic()
+            with self.lock:
+                for bounds in [b for b, a in self.areas.items() if now - a.asked > AREA_IDLE]:
+                    del self.areas[bounds]
+                due = [a for a in self.areas.values() if now - a.polled >= self.interval]
+            for area in due:
+                self.poll_area(area)
+            if now - self.pruned >= 60:
+                self.prune_details(now)
+            time.sleep(0.2)
+
+    # Forget the details that are past DETAILS_TTL, they'd be fetched again anyway.
+    # Skipped while a details request holds the lock, polling mustn't wait on it.
+    def prune_details(self, now):
+        if not self.details_lock.acquire(False):
+            return
+        try:
+            for flight_id in [k for k, v in self.details.items() if now - v[1] >= DETAILS_TTL]:
+                del self.details[flight_id]
+            self.pruned = now
+        finally:
+            self.details_lock.release()
+
+    # The answer for one display, options are the query string values
+    def answer(self, options):
+        bounds = options["bounds"]
+        area = self.area(bounds)
+        since = int(options.get("since", -1))
+        wait = min(float(options.get("wait", 0)), 60)
+        with area.changed:
+            if area.version == since and wait > 0:
+                area.changed.wait(wait)
+            version = area.version
+            feed = area.feed or {}
+        home = parse_home(options["home"]) if "home" in options else box_centre(bounds)
+        table = FlightTable(int(options.get("limit", FEED_LIMIT)))
+        count = table.load(feed)
+        i = table.nearest(
+            home,
+            options.get("by", "distance"),
+            int(options.get("min_alt", 0)),
+            int(options.get("max_alt", 100000)),
+            options.get("ground") == "1",
+        )
+        if i < 0:
+            return {"v": version, "n": count, "id": None}
+        flight_id = table.ids[i]
+        return {
+            "v": version,
+            "n": count,
+            "id": flight_id,
+            "row": feed[flight_id],
+            "details": self.flight_details(flight_id),
+        }
+
+    def start(self, host="127.0.0.1", port=0):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                options = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path != "/flight" or "bounds" not in options:
+                    self.send_error(404)
+                    return
+                try:
+                    body = json.dumps(proxy.answer(options), separators=(",", ":")).encode()
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with proxy.lock:
+                    proxy.device_requests += 1
+                    proxy.bytes_served += len(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.running = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.poll_loop, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:" + str(self.server.server_port)
+
+    def stop(self):
+        self.running = False
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8024)
+    parser.add_argument("--upstream", default=UPSTREAM)
+    parser.add_argument("--interval", type=float, default=10, help="seconds between feed polls of an area")
+    args = parser.parse_args()
+    proxy = Proxy(args.upstream, args.interval).start(args.host, args.port)
+    print("Serving on port " + str(proxy.server.server_port) + ", upstream " + proxy.upstream)
+    try:
+        while True:
+            time.sleep(60)
+            print(
+                str(len(proxy.areas))
+                + " areas, "
+                + str(proxy.upstream_requests)
+                + " upstream requests, "
+                + str(proxy.device_requests)
+                + " display requests, "
+                + str(proxy.bytes_served)
+                + " bytes served"
+            )
+    except KeyboardInterrupt:
+        proxy.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Display text in buffers allocated once
+#
+# framebuf.text() wants a str, and building one for each thing drawn ("ID: " +
+# flight_id, the live position line...) leaves garbage behind on every frame,
+# which the GC then stops a scroll to collect. A TextLine keeps its characters
+# in a bytearray of fixed capacity instead and draws them one at a time from
+# CHARS, one-character strings made at import. Text is copied in when the
+# flight changes, numbers are written digit by digit, and drawing allocates
+# nothing.
+#
+# Text longer than the capacity is cut, ending in "..". Anything but printable
+# ASCII shows as "?", the display font has nothing else, and a character of
+# several UTF-8 bytes is one "?".
+
+CHARS = tuple(chr(c) if 32 <= c < 127 else "?" for c in range(128))
+
+
+class TextLine:
+    __slots__ = ("buf", "n", "capacity")
+
+    def __init__(self, capacity=16):
+        self.buf = bytearray(capacity)
+        self.n = 0
+        self.capacity = capacity
+
+    def clear(self):
+        self.n = 0
+
+    def set(self, s):
+        self.n = 0
+        self.add(s)
+
+    # Add a str (which is encoded, so only when the flight changes) or bytes
+    def add(self, s):
+        if not s:
+            return
+        if isinstance(s, str):
+            s = s.encode()
+        buf = self.buf
+        n = self.n
+        capacity = self.capacity
+        for i in range(len(s)):
+            c = s[i]
+            if 0x80 <= c < 0xC0:
+                continue  # the rest of a UTF-8 character
+            if n == capacity:
+                buf[capacity - 2] = buf[capacity - 1] = 0x2E  # ..
+                break
+            buf[n] = c if c < 0x80 else 0x3F
+            n += 1
+        self.n = n
+
+    # Add a whole number, zero padded to `digits`
+    def number(self, value, digits=1):
+        if value < 0:
+            self.add(b"-")
+            value = -value
+        count = 1
+        scale = 10
+        while scale <= value:
+            scale *= 10
+            count += 1
+        if count < digits:
+            count = digits
+        buf = self.buf
+        n = self.n
+        if n + count > self.capacity:
+            # doesn't fit, cut like text
+            buf[self.capacity - 2] = buf[self.capacity - 1] = 0x2E
+            self.n = self.capacity
+            return
+        for i in range(count):
+            buf[n + count - 1 - i] = 0x30 + value % 10
+            value //= 10
+        self.n = n + count
+
+    # Draw at x, y, characters past `right` are left out
+    def draw(self, fb, x, y, right=128):
+        buf = self.buf
+        for i in range(self.n):
+            if x >= right:
+                break
+            if x > -8:
+                fb.text(CHARS[buf[i]], x, y)
+            x += 8
+
+
+# What the display shows of the current flight, filled once per flight
+class FlightView:
+    __slots__ = ("flight_id", "title", "short", "long", "live")
+
+    def __init__(self, long_chars=96):
+        self.flight_id = None
+        self.title = TextLine(16)  # "ID: " or the zone's label, and the fr24 flight ID
+        self.short = (TextLine(16), TextLine(16), TextLine(16))
+        self.long = (TextLine(long_chars), TextLine(long_chars), TextLine(long_chars))
+        self.live = TextLine(16)  # the live position line
+
+    # Copy in the lines of a flight, as parse_details_json makes them:
+    # (line1 short, line1 long, line2 short, line2 long, line3 short, line3 long),
+    # and the title starting with label instead of "ID:"
+    def load(self, flight_id, lines, label=None):
+        self.flight_id = flight_id
+        self.title.set(label or b"ID:")
+        self.title.add(b" ")
+        self.title.add(flight_id)
+        for i in range(3):
+            self.short[i].set(lines[2 * i])
+            self.long[i].set(lines[2 * i + 1])
+        self.live.clear()
@@ -1,7 +1,102 @@
-# open image, put your image here
-with open("assets/pickachu.pbm", "rb") as f:
-    f.readline()  # number
-    f.readline()  # Creator
-    f.readline()  # Dimensions
-    data = bytearray(f.read())
-    print(data)
+# Compile the PBM images in assets/ for the display, copy the .bin files to the board
+#
+# The display buffer is MONO_VLSB (each byte is a column of 8 pixels), PBM is
+# MONO_HLSB (each byte is a row of 8 pixels). Converting once here means assets.py
+# can load an image straight into a buffer that blits without any conversion.
+# A .bin is a 6 byte header, b"MV" then width and height as 16 bit little endian
+# numbers, followed by the MONO_VLSB pixels, height rounded up to whole pages.
+#
+#   python setup/build-image-byte-array.py                # assets/*.pbm -> assets/*.bin
+#   python setup/build-image-byte-array.py --module images.py
+#
+# --module writes the images into a Python module instead, to freeze into the
+# firmware so they are read from flash without going through the filesystem.
+import argparse
+import glob
+import os
+import struct
+
+MAGIC = b"MV"
+
+
+# (width, height, rows of bytes) of a binary (P4) PBM
+def read_pbm(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    fields = []
+    pos = 0
+    while len(fields) < 3:
+        while data[pos : pos + 1].isspace():
+            pos += 1
+        if data[pos : pos + 1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        end = pos
+        while not data[end : end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    if fields[0] != b"P4":
+        raise ValueError(path + " is not a binary PBM (P4)")
+    width = int(fields[1])
+    height = int(fields[2])
+    pixels = data[pos + 1 :]
+    row = (width + 7) // 8
+    if len(pixels) < row * height:
+        raise ValueError(path + " is shorter than its size says")
+    return width, height, pixels[: row * height]
+
+
+def to_vlsb(width, height, pixels):
+    row = (width + 7) // 8
+    pages = (height + 7) // 8
+    out = bytearray(width * pages)
+    for y in range(height):
+        bit = 1 << (y & 7)
+        base = (y >> 3) * width
+        for x in range(width):
+            if pixels[y * row + (x >> 3)] & (0x80 >> (x & 7)):
+                out[base + x] |= bit
+    return bytes(out)
+
+
+def write_bin(path, width, height, vlsb):
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<HH", width, height))
+        f.write(vlsb)
+
+
+def write_module(path, images):
+    with open(path, "w") as f:
+        f.write("# Made by setup/build-image-byte-array.py, name: (width, height, MONO_VLSB pixels)\n")
+        f.write("IMAGES = {\n")
+        for name, (width, height, vlsb) in sorted(images.items()):
+            f.write("    %r: (%d, %d, %r),\n" % (name, width, height, vlsb))
+        f.write("}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pbm", nargs="*", help="images to compile (default: assets/*.pbm)")
+    parser.add_argument("--out", default="assets", help="folder for the .bin files")
+    parser.add_argument("--module", help="write one Python module with all images instead")
+    args = parser.parse_args()
+
+    images = {}
+    for path in args.pbm or sorted(glob.glob(os.path.join("assets", "*.pbm"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        width, height, pixels = read_pbm(path)
+        images[name] = (width, height, to_vlsb(width, height, pixels))
+
+    if args.module:
+        write_module(args.module, images)
+        print("Wrote " + str(len(images)) + " images to " + args.module)
+        return
+    os.makedirs(args.out, exist_ok=True)
+    for name, (width, height, vlsb) in sorted(images.items()):
+        path = os.path.join(args.out, name + ".bin")
+        write_bin(path, width, height, vlsb)
+        print("Wrote " + path + " (" + str(width) + "x" + str(height) + ", " + str(6 + len(vlsb)) + " bytes)")
+
+
+main()
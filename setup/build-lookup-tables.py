@@ -0,0 +1,96 @@
+# Build the name lookup tables used by lookup.py, copy the .tbl files to the board next
+# to main.py, where main.py opens them
+#
+# Names come from saved clickhandler responses (like the ones in data/) and/or
+# CSV files with "code,name" rows, e.g.
+#
+#   python setup/build-lookup-tables.py --json data/*.json --airports airports.csv
+import argparse
+import csv
+import json
+import os
+import struct
+
+# table: (file name, key width, name width)
+TABLES = {
+    "airports": ("airports.tbl", 3, 40),  # IATA code
+    "airlines": ("airlines.tbl", 3, 32),  # ICAO code
+    "aircraft": ("aircraft.tbl", 4, 32),  # ICAO type designator
+}
+
+
+def airport_name(name):
+    # Same shortening main.py does for names from the details response
+    return name.replace(" Airport", "")
+
+
+def harvest_json(path, names):
+    with open(path, "rb") as f:
+        details = json.load(f)
+    if "identification" not in details:
+        return  # a feed response, nothing to learn from it
+    airline = details.get("airline") or {}
+    icao = (airline.get("code") or {}).get("icao")
+    if icao and airline.get("name"):
+        names["airlines"][icao] = airline["name"]
+    model = (details.get("aircraft") or {}).get("model") or {}
+    if model.get("code") and model.get("text"):
+        names["aircraft"][model["code"]] = model["text"]
+    for airport in ((details.get("airport") or {}).values()):
+        if not airport:
+            continue
+        iata = (airport.get("code") or {}).get("iata")
+        if iata and airport.get("name"):
+            names["airports"][iata] = airport_name(airport["name"])
+
+
+def read_csv(path, table, names):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            name = row[1].strip()
+            if table == "airports":
+                name = airport_name(name)
+            names[table][row[0].strip().upper()] = name
+
+
+def fit(text, width):
+    # Pad to width, cutting on a character boundary if it's too long
+    data = text.encode("utf-8")
+    while len(data) > width:
+        text = text[:-1]
+        data = text.encode("utf-8")
+    return data + b" " * (width - len(data))
+
+
+def write_table(path, key_width, name_width, entries):
+    records = sorted(
+        (fit(code, key_width), fit(name, name_width))
+        for code, name in entries.items()
+        if len(code.encode("utf-8")) <= key_width
+    )
+    with open(path, "wb") as f:
+        f.write(b"LK" + struct.pack("<BBI", key_width, name_width, len(records)))
+        for key, name in records:
+            f.write(key + name)
+    print(path + ": " + str(len(records)) + " records")
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--json", nargs="*", default=[], help="saved clickhandler responses")
+parser.add_argument("--airports", help="CSV of IATA code,airport name")
+parser.add_argument("--airlines", help="CSV of ICAO code,airline name")
+parser.add_argument("--aircraft", help="CSV of type designator,aircraft name")
+parser.add_argument("--out", default=".", help="output folder, the tables go on the board next to main.py")
+args = parser.parse_args()
+
+names = {table: {} for table in TABLES}
+for path in args.json:
+    harvest_json(path, names)
+for table in TABLES:
+    if getattr(args, table):
+        read_csv(getattr(args, table), table, names)
+
+for table, (file_name, key_width, name_width) in TABLES.items():
+    write_table(os.path.join(args.out, file_name), key_width, name_width, names[table])
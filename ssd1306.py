@@ -19,8 +19,17 @@ SET_DISP_CLK_DIV = const(0xD5)
 SET_PRECHARGE = const(0xD9)
 SET_VCOM_DESEL = const(0xDB)
 SET_CHARGE_PUMP = const(0x8D)
+SET_HSCROLL_RIGHT = const(0x26)
+SET_HSCROLL_LEFT = const(0x27)
+SET_SCROLL_OFF = const(0x2E)
+SET_SCROLL_ON = const(0x2F)
 
+# Frames between hardware scroll steps, and the interval code the controller wants for it
+SCROLL_INTERVALS = {2: 7, 3: 4, 4: 5, 5: 0, 25: 6, 64: 1, 128: 2, 256: 3}
 
+
+# The drawing methods are wrapped to keep track of the area they touched, show()
+# then only sends the pages and columns that changed since the last show().
 class SSD1306(framebuf.FrameBuffer):
     def __init__(self, width, height, external_vcc):
         self.width = width
@@ -28,11 +37,93 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self.view = memoryview(self.buffer)
+        self.views = {}  # slices of view that show() sent, to send again without allocating
+        self.window = bytearray(6)  # column/page address commands for show()
+        self.scroll_cmds = bytearray(9)
+        self.scrolling = False
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
+        self.clear_dirty()
         self.init_display()
 
+    # Flag an area as changed, the whole display when no size is given
+    def mark_dirty(self, x=0, y=0, w=None, h=None):
+        if w is None:
+            w = self.width
+            h = self.height
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width) - 1
+        y0 = max(y, 0)
+        y1 = min(y + h, self.height) - 1
+        if x0 > x1 or y0 > y1:
+            return
+        if self.dirty_x0 > self.dirty_x1:
+            self.dirty_x0 = x0
+            self.dirty_x1 = x1
+            self.dirty_p0 = y0 >> 3
+            self.dirty_p1 = y1 >> 3
+        else:
+            self.dirty_x0 = min(self.dirty_x0, x0)
+            self.dirty_x1 = max(self.dirty_x1, x1)
+            self.dirty_p0 = min(self.dirty_p0, y0 >> 3)
+            self.dirty_p1 = max(self.dirty_p1, y1 >> 3)
+
+    def clear_dirty(self):
+        self.dirty_x0 = self.dirty_p0 = 0
+        self.dirty_x1 = self.dirty_p1 = -1
+
+    def fill(self, c):
+        super().fill(c)
+        self.mark_dirty()
+
+    def pixel(self, x, y, *c):
+        if c:
+            self.mark_dirty(x, y, 1, 1)
+        return super().pixel(x, y, *c)
+
+    def hline(self, x, y, w, c):
+        super().hline(x, y, w, c)
+        self.mark_dirty(x, y, w, 1)
+
+    def vline(self, x, y, h, c):
+        super().vline(x, y, h, c)
+        self.mark_dirty(x, y, 1, h)
+
+    def line(self, x1, y1, x2, y2, c):
+        super().line(x1, y1, x2, y2, c)
+        self.mark_dirty(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+
+    def rect(self, x, y, w, h, c):
+        super().rect(x, y, w, h, c)
+        self.mark_dirty(x, y, w, h)
+
+    def fill_rect(self, x, y, w, h, c):
+        super().fill_rect(x, y, w, h, c)
+        self.mark_dirty(x, y, w, h)
+
+    def text(self, s, x, y, c=1):
+        super().text(s, x, y, c)
+        self.mark_dirty(x, y, len(s) * 8, 8)
+
+    def scroll(self, xstep, ystep):
+        super().scroll(xstep, ystep)
+        self.mark_dirty()
+
+    # Only the blitted area is sent if the source has width and height
+    # attributes, plain FrameBuffers don't so the whole display is marked.
+    # No *args, passing them on would allocate on every frame. No palette either,
+    # the v1.19.1 firmware in setup/ doesn't take one.
+    def blit(self, fbuf, x, y, key=-1):
+        super().blit(fbuf, x, y, key)
+        w = getattr(fbuf, "width", None)
+        h = getattr(fbuf, "height", None)
+        if w is None or h is None:
+            self.mark_dirty()
+        else:
+            self.mark_dirty(x, y, w, h)
+
     def init_display(self):
-        for cmd in (
+        init = (
             SET_DISP | 0x00,  # off
             # address setting
             SET_MEM_ADDR,
@@ -62,9 +153,9 @@ class SSD1306(framebuf.FrameBuffer):
             # charge pump
             SET_CHARGE_PUMP,
             0x10 if self.external_vcc else 0x14,
-            SET_DISP | 0x01,
-        ):  # on
-            self.write_cmd(cmd)
+            SET_DISP | 0x01,  # on
+        )
+        self.write_cmds(bytes(init))
         self.fill(0)
         self.show()
 
@@ -75,26 +166,100 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_DISP | 0x01)
 
     def contrast(self, contrast):
-        self.write_cmd(SET_CONTRAST)
-        self.write_cmd(contrast)
+        self.write_cmds(bytes((SET_CONTRAST, contrast)))
 
     def invert(self, invert):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
+    # Let the controller rotate pages start_page to end_page on its own, one column
+    # every `frames` frames (2, 3, 4, 5, 25, 64, 128 or 256). It keeps going while
+    # the CPU does something else, until hw_scroll_stop() or the next show().
+    def hw_scroll(self, start_page, end_page, frames=2, left=True):
+        self.show()
+        self.start_scroll(start_page, end_page, frames, left)
+
+    # Put buf, a full width MONO_VLSB picture of pages start_page to end_page,
+    # straight into the display RAM and rotate it there like hw_scroll(). The
+    # framebuffer is left alone, the next show() or hw_scroll_stop() puts it back
+    # on the display. A picture as wide as the display rotates without a seam.
+    def hw_scroll_picture(self, buf, start_page, end_page, frames=2, left=True):
+        if self.scrolling:
+            self.write_cmd(SET_SCROLL_OFF)
+        self.set_window(0, self.width - 1, start_page, end_page)
+        self.write_data(buf)
+        self.start_scroll(start_page, end_page, frames, left)
+
+    def start_scroll(self, start_page, end_page, frames, left):
+        cmds = self.scroll_cmds
+        cmds[0] = SET_SCROLL_OFF  # parameters can only be changed while stopped
+        cmds[1] = SET_HSCROLL_LEFT if left else SET_HSCROLL_RIGHT
+        cmds[2] = 0x00
+        cmds[3] = start_page
+        cmds[4] = SCROLL_INTERVALS[frames]
+        cmds[5] = end_page
+        cmds[6] = 0x00
+        cmds[7] = 0xFF
+        cmds[8] = SET_SCROLL_ON
+        self.write_cmds(cmds)
+        self.scrolling = True
+
+    # The scroll moved the display RAM around, so it is rewritten from the framebuffer
+    def hw_scroll_stop(self):
+        if not self.scrolling:
+            return
+        self.write_cmd(SET_SCROLL_OFF)
+        self.scrolling = False
+        self.mark_dirty()
+        self.show()
+
+    # Send the changed pages/columns to the display, nothing if nothing changed
     def show(self):
-        x0 = 0
-        x1 = self.width - 1
+        if self.scrolling:
+            # writing to the display RAM while it scrolls garbles it
+            self.hw_scroll_stop()
+            return
+        x0 = self.dirty_x0
+        x1 = self.dirty_x1
+        p0 = self.dirty_p0
+        p1 = self.dirty_p1
+        if x0 > x1:
+            return
+        self.clear_dirty()
+        self.set_window(x0, x1, p0, p1)
+        w = self.width
+        if x0 == 0 and x1 == w - 1:
+            # full width rows are one contiguous run of the buffer
+            self.write_data(self.slice(p0 * w, (p1 + 1) * w))
+        else:
+            # the display moves on to the next page of the window by itself
+            for page in range(p0, p1 + 1):
+                self.write_data(self.slice(page * w + x0, page * w + x1 + 1))
+
+    # The columns and pages the next data goes to
+    def set_window(self, x0, x1, p0, p1):
+        offset = 0
         if self.width == 64:
             # displays with width of 64 pixels are shifted by 32
-            x0 += 32
-            x1 += 32
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+            offset = 32
+        window = self.window
+        window[0] = SET_COL_ADDR
+        window[1] = x0 + offset
+        window[2] = x1 + offset
+        window[3] = SET_PAGE_ADDR
+        window[4] = p0
+        window[5] = p1
+        self.write_cmds(window)
+
+    # view[start:end], made once for each of the first 48 windows sent. A scroll
+    # or a text update sends the same few windows frame after frame.
+    def slice(self, start, end):
+        key = start << 11 | end
+        view = self.views.get(key)
+        if view is None:
+            view = self.view[start:end]
+            if len(self.views) < 48:
+                self.views[key] = view
+        return view
 
 
 class SSD1306_I2C(SSD1306):
@@ -103,6 +268,7 @@ class SSD1306_I2C(SSD1306):
         self.addr = addr
         self.temp = bytearray(2)
         self.write_list = [b"\x40", None]  # Co=0, D/C#=1
+        self.cmd_list = [b"\x00", None]  # Co=0, D/C#=0
         super().__init__(width, height, external_vcc)
 
     def write_cmd(self, cmd):
@@ -110,6 +276,11 @@ class SSD1306_I2C(SSD1306):
         self.temp[1] = cmd
         self.i2c.writeto(self.addr, self.temp)
 
+    # Several commands in one transfer
+    def write_cmds(self, cmds):
+        self.cmd_list[1] = cmds
+        self.i2c.writevto(self.addr, self.cmd_list)
+
     def write_data(self, buf):
         self.write_list[1] = buf
         self.i2c.writevto(self.addr, self.write_list)
@@ -118,6 +289,9 @@ class SSD1306_I2C(SSD1306):
 class SSD1306_SPI(SSD1306):
     def __init__(self, width, height, spi, dc, res, cs, external_vcc=False):
         self.rate = 10 * 1024 * 1024
+        # The bus is set up once here, the display is expected to have it to itself
+        spi.init(baudrate=self.rate, polarity=0, phase=0)
+        self.cmd = bytearray(1)
         dc.init(dc.OUT, value=0)
         res.init(res.OUT, value=0)
         cs.init(cs.OUT, value=1)
@@ -135,15 +309,18 @@ class SSD1306_SPI(SSD1306):
         super().__init__(width, height, external_vcc)
 
     def write_cmd(self, cmd):
-        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
+        self.cmd[0] = cmd
+        self.write_cmds(self.cmd)
+
+    # Several commands in one CS low transaction
+    def write_cmds(self, cmds):
         self.cs(1)
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([cmd]))
+        self.spi.write(cmds)
         self.cs(1)
 
     def write_data(self, buf):
-        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
         self.cs(1)
         self.dc(1)
         self.cs(0)
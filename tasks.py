@@ -0,0 +1,222 @@
+# Cooperative tasks for the main loop
+#
+# A poller asks fr24 for flights on a fixed schedule, a fetcher turns new flights
+# into display lines and a renderer animates them. They pass flights along through
+# small queues, so polling stays on schedule while the display is busy scrolling.
+# Nothing here touches hardware, the work itself is passed in by main.py.
+#
+# run_dual() is the two core version: polling and details run on the second
+# core with _thread and hand flights to the renderer through a RingBuffer.
+# There idle(ms), when given, has the time between polls for other work.
+import _thread
+from time import sleep
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from time import monotonic
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+if hasattr(asyncio, "sleep_ms"):
+    sleep_ms = asyncio.sleep_ms
+else:
+
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+
+# Small FIFO between tasks. put() never blocks, when the queue is full the
+# oldest item is dropped since only the latest state of the sky matters.
+class Queue:
+    def __init__(self, size=4):
+        self.size = size
+        self.items = []
+        self.event = asyncio.Event()
+
+    def put(self, item):
+        if len(self.items) >= self.size:
+            self.items.pop(0)
+        self.items.append(item)
+        self.event.set()
+
+    def empty(self):
+        return not self.items
+
+    def get_nowait(self):
+        return self.items.pop(0)
+
+    async def get(self):
+        while not self.items:
+            self.event.clear()
+            await self.event.wait()
+        return self.items.pop(0)
+
+
+# Queue between the two cores. The slots are allocated up front and reused, so
+# put() and get_nowait() don't allocate, the lock keeps the cores from seeing a
+# half updated buffer. Like Queue, put() drops the oldest item when it's full.
+class RingBuffer:
+    def __init__(self, size=4):
+        self.slots = [None] * size
+        self.size = size
+        self.head = 0  # next slot to read
+        self.count = 0
+        self.lock = _thread.allocate_lock()
+
+    def put(self, item):
+        with self.lock:
+            if self.count == self.size:
+                self.head = (self.head + 1) % self.size
+                self.count -= 1
+            self.slots[(self.head + self.count) % self.size] = item
+            self.count += 1
+
+    def empty(self):
+        return not self.count
+
+    def get_nowait(self):
+        with self.lock:
+            if not self.count:
+                raise IndexError("empty ring buffer")
+            item = self.slots[self.head]
+            self.slots[self.head] = None
+            self.head = (self.head + 1) % self.size
+            self.count -= 1
+        return item
+
+    # The other core can't wake an asyncio task, so this checks every poll_ms
+    async def get(self, poll_ms=20):
+        while not self.count:
+            await sleep_ms(poll_ms)
+        return self.get_nowait()
+
+
+# Keeps the flight being shown and turns poll results into what the renderer
+# gets: (flight_id, lines), None for an empty sky, or False when a new flight's
+# details couldn't be loaded (it's tried again on the next poll)
+class FlightTracker:
+    def __init__(self, details):
+        self.details = details
+        self.flight = None
+
+    def update(self, found):
+        if not found:
+            self.flight = None
+            return None
+        flight_id, row = found
+        if not self.flight or flight_id != self.flight[0]:
+            lines = self.details(flight_id, row)
+            if not lines:
+                print("error loading details, skip displaying this flight")
+                return False
+            self.flight = (flight_id, lines)
+        return self.flight
+
+
+# An unexpected error in poll() or details() is logged and the task carries on,
+# one bad response or flash error mustn't leave the renderer waiting forever
+def log_error(task, e):
+    print(task + " failed, " + e.__class__.__name__ + ": " + str(e))
+
+
+# Milliseconds until the next poll, period is a number or a function returning one
+def wait_ms(period, start):
+    if callable(period):
+        period = period()
+    return max(period * 1000 - ticks_diff(ticks_ms(), start), 0)
+
+
+# Call poll() every `period` seconds and queue what it returns,
+# (flight_id, row) for a flight or None for an empty sky
+async def poller(poll, sightings, period):
+    while True:
+        start = ticks_ms()
+        try:
+            sightings.put(poll())
+        except Exception as e:
+            log_error("poll", e)
+        await sleep_ms(wait_ms(period, start))
+
+
+# Load display lines for flights the poller found with details(flight_id, row),
+# queues (flight_id, lines) for the renderer, or None when there's no flight
+async def fetcher(sightings, details, flights):
+    tracker = FlightTracker(details)
+    while True:
+        found = await sightings.get()
+        try:
+            flight = tracker.update(found)
+        except Exception as e:
+            log_error("details", e)
+            continue
+        if flight is not False:
+            flights.put(flight)
+
+
+# Hand the newest queued flight to render(flight, new), older ones it
+# didn't get to while it was busy are skipped. A flight is only new when it
+# isn't the last one shown, an empty poll in between doesn't make it new again.
+async def renderer(flights, render):
+    showing = None
+    while True:
+        flight = await flights.get()
+        while not flights.empty():
+            flight = flights.get_nowait()
+        flight_id = flight[0] if flight else None
+        await render(flight, flight_id is not None and flight_id != showing)
+        if flight_id is not None:
+            showing = flight_id
+
+
+# others are more coroutines to run next to the renderer
+async def run(poll, details, render, period, queue_size=4, others=()):
+    sightings = Queue(queue_size)
+    flights = Queue(queue_size)
+    asyncio.create_task(poller(poll, sightings, period))
+    asyncio.create_task(fetcher(sightings, details, flights))
+    for coro in others:
+        asyncio.create_task(coro)
+    await renderer(flights, render)
+
+
+# Second core of run_dual(): poll, load details and queue flights, all blocking
+def network_worker(poll, details, flights, period, idle=None):
+    tracker = FlightTracker(details)
+    while True:
+        start = ticks_ms()
+        flight = False
+        try:
+            found = poll()
+        except Exception as e:
+            log_error("poll", e)
+        else:
+            try:
+                flight = tracker.update(found)
+            except Exception as e:
+                log_error("details", e)
+        if flight is not False:
+            flights.put(flight)
+        if idle:
+            idle(wait_ms(period, start))
+        else:
+            sleep(wait_ms(period, start) / 1000)
+
+
+# Network and parsing on the second core, the renderer keeps this one to itself
+async def run_dual(poll, details, render, period, ring_size=4, others=(), idle=None):
+    flights = RingBuffer(ring_size)
+    _thread.start_new_thread(network_worker, (poll, details, flights, period, idle))
+    for coro in others:
+        asyncio.create_task(coro)
+    await renderer(flights, render)
@@ -0,0 +1,302 @@
+# Keeps the WiFi connection up, without blocking and without hammering the radio
+#
+# WiFi.step() moves a small state machine along and returns straight away:
+#
+#   DOWN -> CONNECTING -> UP
+#              |  ^
+#              v  |
+#            BACKOFF      the wait doubles after every failed attempt, up to max_backoff
+#
+# CONNECTING waits for wlan.status() to reach STAT_GOT_IP or a failure status,
+# or for connect_timeout to pass. After a successful connect the access point's
+# BSSID (and the DHCP address, with reuse_ip) is saved to cache_path,
+# so the next connect can go straight to that access point. The BSSID comes from
+# wlan.config("bssid") where the firmware has it; otherwise from a scan, which
+# blocks for a second or two, so it's left to a step scan_after ms later, once
+# the requests that were waiting for the link have gone out. If that fails the
+# next attempt does a normal connect. After reset_after failures in a row the
+# radio is switched off and on again.
+#
+# Requests fail for other reasons than the WiFi. failed(e) tells them apart: with
+# the link still up a DNS, TLS or timeout error is only counted, only a lost link
+# starts a reconnect.
+import json
+from binascii import hexlify, unhexlify
+
+try:
+    from time import ticks_ms, ticks_diff, sleep_ms
+except ImportError:
+    from time import monotonic, sleep
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(ms):
+        sleep(ms / 1000)
+
+
+import network
+
+DOWN = 0
+CONNECTING = 1
+UP = 2
+BACKOFF = 3
+STATES = ("down", "connecting", "up", "backoff")
+
+
+# What kind of error a failed request hit: "dns", "tls", "timeout" or "other"
+def classify(e):
+    code = e.args[0] if isinstance(e, OSError) and e.args else None
+    if code in (-2, -3, -202):  # getaddrinfo: no such name / try again, lwIP
+        return "dns"
+    if isinstance(code, int) and code <= -0x1000:  # mbedtls error codes
+        return "tls"
+    if code in (110, 116, "timed out") or type(e).__name__ == "TimeoutError":
+        return "timeout"
+    if "SSL" in type(e).__name__:
+        return "tls"
+    return "other"
+
+
+class WiFi:
+    def __init__(
+        self,
+        wlan,
+        ssid,
+        password,
+        cache_path=None,
+        static=None,
+        reuse_ip=False,
+        connect_timeout=15000,
+        min_backoff=1000,
+        max_backoff=60000,
+        reset_after=4,
+        scan_after=30000,
+    ):
+        self.wlan = wlan
+        self.ssid = ssid
+        self.password = password
+        self.cache_path = cache_path
+        self.static = tuple(static) if static else None  # ifconfig to use instead of DHCP
+        self.reuse_ip = reuse_ip
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+        self.scan_after = scan_after
+        self.scan_at = None  # when to scan for the BSSID, None if it's known
+        self.state = DOWN
+        self.since = ticks_ms()  # when the current state began
+        self.backoff = 0
+        self.failures = 0  # in a row
+        self.cached = False  # the current attempt uses the cache
+        self.cache = {}
+        self.load()
+        # metrics
+        self.connects = 0
+        self.failed_attempts = 0
+        self.link_losses = 0
+        self.resets = 0
+        self.errors = {}  # failed requests with the link up, by kind
+        self.latency = 0  # ms from losing the link (or boot) to the last connect
+        self.latency_max = 0
+        self.latency_total = 0
+        self.down_since = self.since
+
+    def load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as f:
+                self.cache = json.load(f)
+        except (OSError, ValueError):
+            self.cache = {}
+
+    def save(self, cache):
+        if cache == self.cache:
+            return  # spare the flash
+        self.cache = cache
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "w") as f:
+                json.dump(cache, f)
+        except OSError as e:
+            print("Can't save the WiFi cache: " + str(e))
+
+    def connected(self):
+        return self.state == UP
+
+    def set_state(self, state, now):
+        self.state = state
+        self.since = now
+
+    def start(self, now):
+        wlan = self.wlan
+        if not wlan.active():
+            wlan.active(True)
+        # the cache is only tried first, an attempt after a failure goes without it
+        bssid = ip = None
+        if not self.failures:
+            bssid = self.cache.get("bssid")
+            ip = self.reuse_ip and self.cache.get("ifconfig")
+        self.cached = bool(bssid or ip)
+        ip = self.static or ip
+        if ip:
+            wlan.ifconfig(tuple(ip))
+        try:
+            if bssid:
+                wlan.connect(self.ssid, self.password, bssid=unhexlify(bssid))
+            else:
+                wlan.connect(self.ssid, self.password)
+        except OSError as e:
+            print("WiFi connect failed: " + str(e))
+            self.fail(now)
+            return
+        self.set_state(CONNECTING, now)
+
+    def fail(self, now):
+        self.failures += 1
+        self.failed_attempts += 1
+        reset = self.reset_after and self.failures % self.reset_after == 0
+        if self.cached and self.cache.get("ifconfig") and not self.static:
+            reset = True  # the radio only goes back to DHCP when it restarts
+        if reset:
+            print("WiFi keeps failing, restarting the radio")
+            self.resets += 1
+            self.wlan.active(False)
+            self.wlan.active(True)
+        self.backoff = min(self.min_backoff << (self.failures - 1), self.max_backoff)
+        self.set_state(BACKOFF, now)
+
+    def up(self, now):
+        self.failures = 0
+        self.connects += 1
+        self.latency = ticks_diff(now, self.down_since)
+        self.latency_max = max(self.latency_max, self.latency)
+        self.latency_total += self.latency
+        self.set_state(UP, now)
+        print("WiFi connected in " + str(self.latency) + " ms, " + self.wlan.ifconfig()[0])
+        cache = {}
+        self.scan_at = None
+        if self.cache.get("bssid") and self.cached:
+            cache = dict(self.cache)  # it worked, nothing new to learn
+        else:
+            bssid = self.bssid()
+            if bssid:
+                cache = {"bssid": hexlify(bssid).decode()}
+            else:
+                self.scan_at = now + self.scan_after
+        if self.reuse_ip:
+            cache["ifconfig"] = list(self.wlan.ifconfig())
+        self.save(cache)
+
+    # The access point we're connected to as the firmware reports it, None if it doesn't
+    def bssid(self):
+        try:
+            bssid = self.wlan.config("bssid")
+        except (OSError, ValueError, TypeError):
+            return None
+        return bssid if bssid and len(bssid) == 6 else None
+
+    # Learn the BSSID from a scan, for firmware that doesn't report it
+    def learn(self):
+        self.scan_at = None
+        for ap in self.scan():
+            cache = dict(self.cache)
+            cache["bssid"] = hexlify(ap[1]).decode()
+            self.save(cache)
+            break
+
+    # Access points with our SSID, strongest first
+    def scan(self):
+        try:
+            found = [ap for ap in self.wlan.scan() if ap[0] == self.ssid.encode()]
+        except (OSError, AttributeError):
+            return []
+        found.sort(key=lambda ap: -ap[3])
+        return found
+
+    # Move the state machine along, returns the state
+    def step(self, now=None):
+        if now is None:
+            now = ticks_ms()
+        state = self.state
+        if state == UP:
+            if not self.wlan.isconnected():
+                print("WiFi link lost")
+                self.link_losses += 1
+                self.down_since = now
+                self.start(now)
+            elif self.scan_at is not None and ticks_diff(now, self.scan_at) >= 0:
+                self.learn()
+        elif state == CONNECTING:
+            status = self.wlan.status()
+            if status == network.STAT_GOT_IP:
+                self.up(now)
+            elif status < 0 or ticks_diff(now, self.since) > self.connect_timeout:
+                print("WiFi connect failed, status " + str(status))
+                self.fail(now)
+        elif state == BACKOFF:
+            if ticks_diff(now, self.since) >= self.backoff:
+                self.start(now)
+        else:
+            if self.wlan.isconnected():
+                self.up(now)
+            else:
+                self.start(now)
+        return self.state
+
+    # A request failed with e: returns its kind, "link" when the WiFi itself is
+    # down, in which case step() reconnects
+    def failed(self, e):
+        if self.wlan.isconnected():
+            kind = classify(e)
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+            return kind
+        if self.state == UP:
+            self.step()
+        return "link"
+
+    # Step until connected or timeout_ms have passed, for code that can block
+    def wait(self, timeout_ms=30000, poll_ms=100):
+        start = ticks_ms()
+        while self.step() != UP and ticks_diff(ticks_ms(), start) < timeout_ms:
+            sleep_ms(poll_ms)
+        return self.state == UP
+
+    # Keep stepping, as an asyncio task
+    async def run(self, poll_ms=250):
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        while True:
+            self.step()
+            await asyncio.sleep(poll_ms / 1000)
+
+    def report(self):
+        average = self.latency_total // self.connects if self.connects else 0
+        return (
+            "WiFi "
+            + STATES[self.state]
+            + ": "
+            + str(self.connects)
+            + " connects, "
+            + str(self.failed_attempts)
+            + " failed, "
+            + str(self.link_losses)
+            + " links lost, "
+            + str(self.resets)
+            + " radio restarts, latency "
+            + str(self.latency)
+            + " ms (avg "
+            + str(average)
+            + ", max "
+            + str(self.latency_max)
+            + "), request errors "
+            + str(self.errors)
+        )
@@ -0,0 +1,186 @@
+# Several areas to watch with one feed request
+#
+# Each zone is a box (a BOUNDS_BOX string) or a polygon of [lat, lon] corners,
+# with a name and its own settings, from secrets["zones"]:
+#
+#   {"name": "Approach", "box": "13.3,12.6,77.3,78.0", "priority": 1},
+#   {"name": "Roof", "polygon": [[13.02, 77.58], [13.02, 77.62], [12.98, 77.6]],
+#    "priority": 2, "max_alt": 10000, "label": "ROOF"}
+#
+# The feed is asked for the box around all of them, and each flight found is
+# put in its zones here. A grid over that box is worked out once: for each cell,
+# the zones that cover all of it and the zones whose edge may cross it. A flight
+# in a cell some zone covers is in it without any more work, only for a cell on
+# a zone's edge is the flight's position tested against the polygon.
+#
+# The zone with the highest priority that has a flight in it is the one shown.
+# A zone can set by, min_alt, max_alt and ground the way main.py's NEAREST_BY,
+# MIN_ALTITUDE, MAX_ALTITUDE and SHOW_ON_GROUND do (those are used for the ones
+# it leaves out, see defaults()), label to show on the display in place of
+# "ID:", and "map": false to skip the mini-map for it.
+from array import array
+
+MAX_ZONES = 32  # one bit each in a mask
+
+
+class Zone:
+    # config is one entry of secrets["zones"], index its place in the list
+    def __init__(self, config, index):
+        self.name = config.get("name", "zone " + str(index + 1))
+        if "polygon" in config:
+            self.polygon = [(float(p[0]), float(p[1])) for p in config["polygon"]]
+        else:
+            top, bottom, left, right = (float(v) for v in config["box"].split(","))
+            self.polygon = [(top, left), (top, right), (bottom, right), (bottom, left)]
+        self.bit = 1 << index
+        self.priority = config.get("priority", 0)
+        self.by = config.get("by")
+        self.min_alt = config.get("min_alt")
+        self.max_alt = config.get("max_alt")
+        self.ground = config.get("ground")
+        self.label = config.get("label")
+        self.map = config.get("map", True)
+        lats = [p[0] for p in self.polygon]
+        lons = [p[1] for p in self.polygon]
+        self.top = max(lats)
+        self.bottom = min(lats)
+        self.left = min(lons)
+        self.right = max(lons)
+
+    # Fill in the settings the config left out
+    def defaults(self, by="distance", min_alt=0, max_alt=100000, ground=False):
+        if self.by is None:
+            self.by = by
+        if self.min_alt is None:
+            self.min_alt = min_alt
+        if self.max_alt is None:
+            self.max_alt = max_alt
+        if self.ground is None:
+            self.ground = ground
+
+    # Whether lat, lon is inside the polygon, by counting the edges a line due
+    # east of it crosses
+    def contains(self, lat, lon):
+        if lat > self.top or lat < self.bottom or lon < self.left or lon > self.right:
+            return False
+        polygon = self.polygon
+        inside = False
+        lat1, lon1 = polygon[-1]
+        for lat2, lon2 in polygon:
+            if (lat2 > lat) != (lat1 > lat):
+                if lon < lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1):
+                    inside = not inside
+            lat1 = lat2
+            lon1 = lon2
+        return inside
+
+    # Whether one of the polygon's edges goes through the box
+    def crosses(self, top, bottom, left, right):
+        polygon = self.polygon
+        lat1, lon1 = polygon[-1]
+        for lat2, lon2 in polygon:
+            if clips(top, bottom, left, right, lat1, lon1, lat2, lon2):
+                return True
+            lat1 = lat2
+            lon1 = lon2
+        return False
+
+
+# Whether the line from lat1, lon1 to lat2, lon2 has some part in the box
+# (Liang-Barsky clipping)
+def clips(top, bottom, left, right, lat1, lon1, lat2, lon2):
+    d_lat = lat2 - lat1
+    d_lon = lon2 - lon1
+    start = 0.0
+    end = 1.0
+    for p, q in ((-d_lon, lon1 - left), (d_lon, right - lon1), (-d_lat, lat1 - bottom), (d_lat, top - lat1)):
+        if p == 0:
+            if q < 0:
+                return False  # parallel to this side and outside it
+        else:
+            t = q / p
+            if p < 0:
+                start = max(start, t)
+            else:
+                end = min(end, t)
+            if start > end:
+                return False
+    return True
+
+
+# The zones from secrets["zones"]
+def parse_zones(configs):
+    if len(configs) > MAX_ZONES:
+        raise ValueError("at most " + str(MAX_ZONES) + " zones")
+    return [Zone(c, i) for i, c in enumerate(configs)]
+
+
+# The BOUNDS_BOX string of the box around all the zones
+def union_bounds(zones):
+    return ",".join(
+        str(v)
+        for v in (
+            max(z.top for z in zones),
+            min(z.bottom for z in zones),
+            min(z.left for z in zones),
+            max(z.right for z in zones),
+        )
+    )
+
+
+class ZoneIndex:
+    # size is the number of flights a FlightTable holds, grid the cells per side
+    def __init__(self, zones, size=100, grid=16):
+        self.zones = sorted(zones, key=lambda z: -z.priority)  # highest priority first
+        self.grid = grid
+        self.top, self.bottom, self.left, self.right = (float(v) for v in union_bounds(zones).split(","))
+        self.cell_lat = (self.top - self.bottom) / grid
+        self.cell_lon = (self.right - self.left) / grid
+        self.full = array("I", [0] * (grid * grid))  # zones covering all of a cell
+        self.edge = array("I", [0] * (grid * grid))  # zones covering part of it, maybe
+        self.masks = array("I", [0] * size)  # the zones of each flight in the table
+        for zone in zones:
+            for row in range(grid):
+                for col in range(grid):
+                    self._index(zone, row, col)
+
+    def _index(self, zone, row, col):
+        top = self.top - row * self.cell_lat
+        bottom = top - self.cell_lat
+        left = self.left + col * self.cell_lon
+        right = left + self.cell_lon
+        if bottom > zone.top or top < zone.bottom or left > zone.right or right < zone.left:
+            return
+        cell = row * self.grid + col
+        if zone.crosses(top, bottom, left, right):
+            self.edge[cell] |= zone.bit
+        elif zone.contains((top + bottom) / 2, (left + right) / 2):
+            # no edge goes through it, so all of it is in the zone
+            self.full[cell] |= zone.bit
+
+    # The zones lat, lon is in, as a mask of their bits
+    def lookup(self, lat, lon):
+        row = int((self.top - lat) / self.cell_lat)
+        col = int((lon - self.left) / self.cell_lon)
+        if row < 0 or col < 0 or row >= self.grid or col >= self.grid:
+            # on the far edges, or outside
+            if lat < self.bottom or lat > self.top or lon < self.left or lon > self.right:
+                return 0
+            row = min(max(row, 0), self.grid - 1)
+            col = min(max(col, 0), self.grid - 1)
+        cell = row * self.grid + col
+        mask = self.full[cell]
+        edge = self.edge[cell]
+        if edge:
+            for zone in self.zones:
+                if edge & zone.bit and zone.contains(lat, lon):
+                    mask |= zone.bit
+        return mask
+
+    # Work out the zones of every flight in a FlightTable, into masks
+    def route(self, table):
+        masks = self.masks
+        lat = table.lat
+        lon = table.lon
+        for i in range(table.count):
+            masks[i] = self.lookup(lat[i], lon[i])